@@ -0,0 +1,293 @@
+"""Benchmark the graph, search, geometry and rendering hot paths.
+
+Every stage runs on synthetic polylines of increasing length; the ORS
+stage fetches its route from a local stub server (see ``stub_ors``), so no
+network access or API key is needed::
+
+    python -m benchmarks.run -o bench.json
+    python -m benchmarks.run --compare bench.json   # flag regressions
+    python -m benchmarks.run --fixture route.geojson   # serve another response
+
+The ORS stage runs once, on the directions response in ``--fixture``
+(``fixtures/ors_directions.geojson`` by default); ``--no-fixture`` runs it
+on each synthetic size instead. The map stages time the pages the app
+renders (see ``navigator.maps``).
+
+For each stage and vertex count the best of ``--repeat`` timed runs is
+reported, plus the peak traced allocation of one extra run.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+
+# The package reads its configuration at import time: keep the route cache
+# in memory so runs do not share results through the SQLite file
+os.environ["NAVIGATOR_ROUTE_CACHE_DB"] = ""
+
+from navigator.geometry import build_route_lods, haversine_distance, segment_lengths  # noqa: E402
+from navigator.graph import build_graph_from_coords, shortest_path_search  # noqa: E402
+from navigator.maps import render_path_map, render_route_map, render_trace_map  # noqa: E402
+from navigator.trace_view import adjacency_rows, playback_frames, step_view  # noqa: E402
+
+from .stub_ors import StubORS, directions_geojson  # noqa: E402
+
+DEFAULT_SIZES = (10, 100, 1000, 10_000, 100_000)
+# Stages whose per-vertex cost makes the largest sizes impractically slow
+STAGE_MAX_VERTICES = {"haversine_scalar": 10_000}
+# Steps materialized by the trace replay stage
+REPLAY_STEPS = 100
+# Directions response served by the ORS stage unless --no-fixture
+DEFAULT_FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "ors_directions.geojson")
+
+
+def synthetic_polyline(n: int, seed: int = 0, origin: Tuple[float, float] = (12.97, 77.59)) -> List[Tuple[float, float]]:
+    """Deterministic random-walk road of ``n`` (lat, lon) vertices ~10-30 m apart."""
+    rng = np.random.default_rng(seed)
+    heading = np.cumsum(rng.normal(0.0, 0.3, n))
+    step_deg = rng.uniform(10.0, 30.0, n) / 111_000.0
+    lat = origin[0] + np.cumsum(step_deg * np.cos(heading))
+    lon = origin[1] + np.cumsum(step_deg * np.sin(heading) / np.cos(np.radians(origin[0])))
+    return list(zip(lat.tolist(), lon.tolist()))
+
+
+# Each stage is a setup(coords) -> run() factory; only run() is measured.
+
+def _stage_haversine_kernel(coords):
+    return lambda: segment_lengths(coords)
+
+
+def _stage_haversine_scalar(coords):
+    return lambda: [haversine_distance(a, b) for a, b in zip(coords, coords[1:])]
+
+
+def _stage_build_graph(coords):
+    return lambda: build_graph_from_coords(coords)
+
+
+def _stage_dijkstra_trace(coords):
+    nodes, graph = build_graph_from_coords(coords)
+    return lambda: shortest_path_search(graph, 0, len(nodes) - 1, "dijkstra", nodes)
+
+
+def _stage_astar(coords):
+    nodes, graph = build_graph_from_coords(coords)
+    return lambda: shortest_path_search(graph, 0, len(nodes) - 1, "astar", nodes, record=False)
+
+
+def _stage_trace_replay(coords):
+    nodes, graph = build_graph_from_coords(coords)
+    trace = shortest_path_search(graph, 0, len(nodes) - 1, "dijkstra", nodes)
+    steps = np.linspace(0, len(trace) - 1, min(REPLAY_STEPS, len(trace))).astype(int).tolist()
+    return lambda: [trace[i] for i in steps]
+
+
+def _stage_step_view(coords):
+    # windowed state and adjacency rows of the step-by-step view
+    nodes, graph = build_graph_from_coords(coords)
+    trace = shortest_path_search(graph, 0, len(nodes) - 1, "dijkstra", nodes)
+    steps = np.linspace(0, len(trace) - 1, min(REPLAY_STEPS, len(trace))).astype(int).tolist()
+    return lambda: [step_view(graph, trace, i) for i in steps]
+
+
+def _stage_trace_frames(coords):
+    # data sent once to the client-side step player of the trace map
+    nodes, graph = build_graph_from_coords(coords)
+    trace = shortest_path_search(graph, 0, len(nodes) - 1, "dijkstra", nodes)
+    return lambda: json.dumps(playback_frames(nodes, graph, trace), separators=(",", ":"))
+
+
+def _stage_adjacency_rows(coords):
+    # the adjacency-list table of the step-by-step view
+    nodes, graph = build_graph_from_coords(coords)
+    return lambda: adjacency_rows(graph, range(graph.n))
+
+
+def _stage_simplify_lods(coords):
+    return lambda: build_route_lods(coords)
+
+
+def _stage_folium_route_map(coords):
+    # the levels are cached by the app, only the page is rebuilt
+    levels = build_route_lods(coords)
+    return lambda: render_route_map(coords[0], coords[-1], [levels])
+
+
+def _stage_folium_trace_map(coords):
+    nodes, graph = build_graph_from_coords(coords)
+    trace = shortest_path_search(graph, 0, len(nodes) - 1, "dijkstra", nodes)
+    return lambda: render_trace_map(nodes, graph, trace)
+
+
+def _stage_folium_path_map(coords):
+    nodes, graph = build_graph_from_coords(coords)
+    trace = shortest_path_search(graph, 0, len(nodes) - 1, "dijkstra", nodes)
+    levels = build_route_lods(coords)
+    path = [nodes[u] for u in trace.path]
+    return lambda: render_path_map(levels, path)
+
+
+def fixture_polyline(fixture: Dict) -> List[Tuple[float, float]]:
+    """(lat, lon) vertices of the first route of a directions response."""
+    return [(lat, lon) for lon, lat in fixture["features"][0]["geometry"]["coordinates"]]
+
+
+def _stage_ors_roundtrip(coords, stub: StubORS = None, fixture: Dict = None):
+    from navigator.routing import get_route, get_route_cache
+
+    # a recorded response is served as is; coords are its own vertices
+    stub.directions = fixture or directions_geojson(coords)
+
+    def run():
+        get_route_cache().clear()
+        return get_route(coords[0], coords[-1], "driving-car", alternatives=False)
+    return run
+
+
+STAGES: Dict[str, Callable] = {
+    "haversine_kernel": _stage_haversine_kernel,
+    "haversine_scalar": _stage_haversine_scalar,
+    "build_graph": _stage_build_graph,
+    "dijkstra_trace": _stage_dijkstra_trace,
+    "astar": _stage_astar,
+    "trace_replay": _stage_trace_replay,
+    "step_view": _stage_step_view,
+    "trace_frames": _stage_trace_frames,
+    "adjacency_rows": _stage_adjacency_rows,
+    "simplify_lods": _stage_simplify_lods,
+    "folium_route_map": _stage_folium_route_map,
+    "folium_trace_map": _stage_folium_trace_map,
+    "folium_path_map": _stage_folium_path_map,
+    "ors_roundtrip": _stage_ors_roundtrip,
+}
+
+
+def measure(run: Callable, repeat: int) -> Tuple[float, int]:
+    """Best wall time of ``repeat`` runs and peak traced bytes of one more."""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - started)
+    tracemalloc.start()
+    try:
+        run()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return best, peak
+
+
+def run_suite(stages: List[str], sizes: List[int], repeat: int, latency: float, seed: int,
+              log=print, fixture: Dict = None) -> Dict:
+    results = []
+
+    def record(name, n, run):
+        seconds, peak = measure(run, repeat)
+        results.append({"stage": name, "vertices": n, "seconds": seconds, "peak_bytes": peak})
+        log(f"{name:>18} {n:>7} vertices  {seconds * 1000:10.2f} ms  {peak / 1024:10.1f} KiB")
+
+    with StubORS(latency=latency) as stub:
+        if "ors_roundtrip" in stages:
+            import openrouteservice
+            from navigator.ors import ORSClient, set_client
+            # no quota: the stub is local and the sweep sends many requests
+            set_client(ORSClient(openrouteservice.Client(key="stub", base_url=stub.base_url), limits={}))
+        for n in sizes:
+            coords = synthetic_polyline(n, seed)
+            for name in stages:
+                if n > STAGE_MAX_VERTICES.get(name, n):
+                    continue
+                if name == "ors_roundtrip":
+                    if fixture is None:
+                        record(name, n, _stage_ors_roundtrip(coords, stub))
+                    continue
+                record(name, n, STAGES[name](coords))
+        if fixture is not None and "ors_roundtrip" in stages:
+            coords = fixture_polyline(fixture)
+            record("ors_roundtrip", len(coords), _stage_ors_roundtrip(coords, stub, fixture))
+    return {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "platform": platform.platform(),
+            "repeat": repeat,
+            "seed": seed,
+            "stub_latency_s": latency,
+            "fixture": fixture is not None,
+        },
+        "results": results,
+    }
+
+
+def compare(current: Dict, baseline: Dict, threshold: float, min_seconds: float) -> List[Dict]:
+    """Stages that got slower (or allocate more) than ``baseline`` by more than ``threshold``.
+
+    Time differences below ``min_seconds`` are treated as noise.
+    """
+    base = {(r["stage"], r["vertices"]): r for r in baseline["results"]}
+    regressions = []
+    for row in current["results"]:
+        old = base.get((row["stage"], row["vertices"]))
+        if old is None:
+            continue
+        for metric, floor in (("seconds", min_seconds), ("peak_bytes", 64 * 1024)):
+            before, after = old[metric], row[metric]
+            if after - before > floor and after > before * (1 + threshold):
+                regressions.append({"stage": row["stage"], "vertices": row["vertices"], "metric": metric,
+                                    "baseline": before, "current": after,
+                                    "ratio": after / before if before else float("inf")})
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run", description=__doc__.split("\n")[0])
+    parser.add_argument("-o", "--output", help="write results to this JSON file")
+    parser.add_argument("--compare", metavar="BASELINE", help="flag regressions against a saved result file")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="relative slowdown or memory growth counted as a regression (default 0.25)")
+    parser.add_argument("--min-seconds", type=float, default=0.002,
+                        help="ignore time differences smaller than this (default 0.002)")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    parser.add_argument("--stages", nargs="+", choices=sorted(STAGES), default=list(STAGES))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.0, help="stub ORS latency per request (seconds)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--fixture", default=DEFAULT_FIXTURE,
+                        help="ORS directions GeoJSON served in the ors_roundtrip stage (default: %(default)s)")
+    parser.add_argument("--no-fixture", action="store_true",
+                        help="run the ors_roundtrip stage on each synthetic size instead of the fixture")
+    args = parser.parse_args(argv)
+
+    fixture = None
+    if not args.no_fixture:
+        with open(args.fixture, encoding="utf-8") as f:
+            fixture = json.load(f)
+    current = run_suite(args.stages, sorted(args.sizes), args.repeat, args.latency, args.seed,
+                        fixture=fixture)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2)
+    if not args.compare:
+        return 0
+    with open(args.compare, encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = compare(current, baseline, args.threshold, args.min_seconds)
+    for r in regressions:
+        print(f"REGRESSION {r['stage']} @ {r['vertices']} vertices: {r['metric']} "
+              f"{r['baseline']:.6g} -> {r['current']:.6g} (x{r['ratio']:.2f})")
+    if not regressions:
+        print(f"No regressions against {args.compare}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+"""Local stand-in for the OpenRouteService HTTP API.
+
+Serves canned directions and geocoding responses on localhost with an
+injectable per-request latency, so the client, routing and parsing layers
+can be measured without network access or an API key.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Tuple
+
+
+def directions_geojson(latlon: List[Tuple[float, float]], speed_mps: float = 12.0) -> Dict:
+    """ORS-shaped directions response following a (lat, lon) polyline."""
+    from navigator.geometry import segment_lengths
+
+    seg = segment_lengths(latlon) if len(latlon) > 1 else []
+    distance = float(sum(seg))
+    half = len(latlon) // 2
+    steps = [
+        {"instruction": "Head north", "name": "", "type": 11, "way_points": [0, half],
+         "distance": float(sum(seg[:half])), "duration": float(sum(seg[:half])) / speed_mps},
+        {"instruction": "Arrive at your destination", "name": "", "type": 10,
+         "way_points": [half, len(latlon) - 1],
+         "distance": float(sum(seg[half:])), "duration": float(sum(seg[half:])) / speed_mps},
+    ]
+    summary = {"distance": distance, "duration": distance / speed_mps}
+    return {
+        "type": "FeatureCollection",
+        "features": [{
+            "type": "Feature",
+            "geometry": {"type": "LineString", "coordinates": [[lon, lat] for lat, lon in latlon]},
+            "properties": {"segments": [dict(summary, steps=steps)], "summary": summary,
+                           "way_points": [0, len(latlon) - 1]},
+        }],
+        "metadata": {"service": "routing", "engine": {"version": "stub"}},
+    }
+
+
+class StubORS:
+    """Threaded HTTP server answering ORS directions and Pelias requests.
+
+    ``directions`` and ``geocode`` hold the JSON bodies served (replace them
+    between runs). ``directions`` may also be a callable taking the parsed
+    request body and returning the body to serve or a ``(status, body)``
+    pair, so each request can be answered (or delayed) on its own. Every
+    request sleeps ``latency`` seconds first. Use as a context manager;
+    ``base_url`` is the value for ``ORS_BASE_URL``.
+    """
+
+    def __init__(self, directions=None, geocode: Dict = None, latency: float = 0.0):
+        self.directions = directions or directions_geojson([(12.97, 77.59), (12.98, 77.60)])
+        self.geocode = geocode or {"type": "FeatureCollection", "features": [{
+            "type": "Feature", "geometry": {"type": "Point", "coordinates": [77.59, 12.97]},
+            "properties": {"label": "Stub Place"},
+        }]}
+        self.latency = latency
+        self.requests = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _reply(self, body, request: Dict = None) -> None:
+                stub.requests += 1
+                if stub.latency:
+                    time.sleep(stub.latency)
+                status = 200
+                if callable(body):
+                    body = body(request)
+                if isinstance(body, tuple):
+                    status, body = body
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                if self.path.startswith("/geocode/"):
+                    self._reply(stub.geocode)
+                else:
+                    self.send_error(404)
+
+            def do_POST(self):
+                raw = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                if self.path.startswith("/v2/directions/"):
+                    self._reply(stub.directions, json.loads(raw or b"{}"))
+                else:
+                    self.send_error(404)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StubORS":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="stub-ors", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve canned ORS responses on localhost.")
+    parser.add_argument("--fixture", help="recorded ORS directions GeoJSON to serve")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds to sleep per request")
+    args = parser.parse_args()
+    directions = None
+    if args.fixture:
+        with open(args.fixture, encoding="utf-8") as f:
+            directions = json.load(f)
+    with StubORS(directions, latency=args.latency) as stub:
+        print(f"ORS_BASE_URL={stub.base_url}", flush=True)
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,71 @@
+"""Headless routing, geocoding and shortest-path core of the navigator app.
+
+Nothing here imports Streamlit, and only ``navigator.maps`` (the folium map
+pages) imports folium, so the package can back the web front-end
+(``pro1.py``), the batch CLI (``python -m navigator``) or other scripts. Submodules are imported on first attribute access, so e.g.
+``from navigator import format_distance`` does not load numpy or the ORS
+client.
+"""
+import importlib
+
+_EXPORTS = {
+    "TTLCache": "cache",
+    "encode_polyline": "export",
+    "write_features": "export",
+    "directions_table": "formatting",
+    "format_distance": "formatting",
+    "format_duration": "formatting",
+    "autocomplete": "geocoding",
+    "PlaceIndex": "geocoding",
+    "get_geocode_cache": "geocoding",
+    "get_place_index": "geocoding",
+    "build_route_lods": "geometry",
+    "dedupe_routes": "geometry",
+    "haversine_distance": "geometry",
+    "simplify_polyline": "geometry",
+    "AlgorithmTrace": "graph",
+    "SparseGraph": "graph",
+    "build_graph_from_coords": "graph",
+    "build_route_graph": "graph",
+    "build_route_search": "graph",
+    "dijkstra_trace": "graph",
+    "search_route_graph": "graph",
+    "shortest_path_search": "graph",
+    "RoadNetwork": "local_engine",
+    "get_road_network": "local_engine",
+    "render_path_map": "maps",
+    "render_route_map": "maps",
+    "render_trace_map": "maps",
+    "distance_matrix": "matrix",
+    "optimize_trip": "matrix",
+    "ORSClient": "ors",
+    "RateLimitExceeded": "ors",
+    "get_client": "ors",
+    "RoutingError": "routing",
+    "fetch_routes": "routing",
+    "get_route": "routing",
+    "get_route_cache": "routing",
+    "route_between": "routing",
+    "ArtifactStore": "store",
+    "CompactRoute": "store",
+    "get_artifact_store": "store",
+    "adjacency_page": "trace_view",
+    "path_rows": "trace_view",
+    "playback_frames": "trace_view",
+    "step_view": "trace_view",
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
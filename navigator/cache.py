@@ -0,0 +1,167 @@
+"""Thread-safe LRU/TTL cache shared by the geocoding and routing layers."""
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Tuple
+
+from . import metrics
+from .store import content_key
+
+# Cache hits whose access time is buffered before it is written to SQLite
+ACCESS_FLUSH_BATCH = 64
+
+
+class TTLCache:
+    """Thread-safe LRU cache with per-entry expiry.
+
+    Entries are evicted least-recently-used first once ``max_entries`` is
+    exceeded, and ignored once older than ``ttl_seconds``. With a ``db_path``
+    every entry is also written to a SQLite table (values must be
+    JSON-serialisable), so the cache survives restarts. The table's access
+    times, used to trim it, are written in batches of ``ACCESS_FLUSH_BATCH``
+    hits (or with the next ``set`` or ``close``) rather than on every hit.
+
+    With a ``store`` (an ``ArtifactStore``) the in-memory entries live in
+    the store instead: they are charged to its byte budget and evicted with
+    its other artifacts, and ``max_entries`` only bounds the table.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, db_path: str = None, table: str = "cache",
+                 store=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.table = table
+        self._data: "OrderedDict[str, Tuple[float, object]]" = OrderedDict()
+        self._artifacts = store
+        # bumped by clear() so entries already in the store are no longer found
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._db = None
+        # key -> latest access time not yet written to the table, and the
+        # number of hits since the last write
+        self._accessed: Dict[str, float] = {}
+        self._pending_hits = 0
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._db.execute(f"DELETE FROM {table} WHERE expires < ?", (time.time(),))
+            self._db.commit()
+
+    def get(self, key: str, default=None):
+        now = time.time()
+        with self._lock:
+            entry = self._memory_get(key)
+            if entry is not None and entry[0] < now:
+                self._data.pop(key, None)
+                entry = None
+            if entry is None and self._db is not None:
+                row = self._db.execute(
+                    f"SELECT value, expires FROM {self.table} WHERE key = ? AND expires >= ?", (key, now)
+                ).fetchone()
+                if row is not None:
+                    entry = (row[1], json.loads(row[0]))
+                    self._store(key, entry)
+            if entry is None:
+                self.misses += 1
+                metrics.count("cache_misses", cache=self.table)
+                return default
+            if self._db is not None:
+                self._accessed[key] = now
+                self._pending_hits += 1
+                if self._pending_hits >= ACCESS_FLUSH_BATCH:
+                    self._flush_accessed()
+                    self._db.commit()
+            self.hits += 1
+            metrics.count("cache_hits", cache=self.table)
+            return entry[1]
+
+    def set(self, key: str, value) -> None:
+        now = time.time()
+        entry = (now + self.ttl_seconds, value)
+        with self._lock:
+            self._store(key, entry)
+            if self._db is not None:
+                self._accessed.pop(key, None)
+                self._flush_accessed()
+                self._db.execute(
+                    f"INSERT OR REPLACE INTO {self.table} (key, value, expires, accessed) VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(value), entry[0], now),
+                )
+                # keep the on-disk table bounded too, dropping least recently used rows
+                self._db.execute(
+                    f"DELETE FROM {self.table} WHERE key IN (SELECT key FROM {self.table} "
+                    "ORDER BY accessed DESC LIMIT -1 OFFSET ?)", (self.max_entries,)
+                )
+                self._db.commit()
+
+    def _flush_accessed(self) -> None:
+        # caller holds the lock and commits
+        if self._accessed:
+            self._db.executemany(f"UPDATE {self.table} SET accessed = ? WHERE key = ?",
+                                 [(t, k) for k, t in self._accessed.items()])
+            self._accessed.clear()
+        self._pending_hits = 0
+
+    def _memory_key(self, key: str) -> str:
+        return content_key(self.table, self._generation, key)
+
+    def _memory_get(self, key: str):
+        # caller holds the lock
+        if self._artifacts is not None:
+            return self._artifacts.get(self._memory_key(key))
+        entry = self._data.get(key)
+        if entry is not None:
+            self._data.move_to_end(key)
+        return entry
+
+    def _store(self, key: str, entry) -> None:
+        # caller holds the lock
+        if self._artifacts is not None:
+            self._artifacts.put(self._memory_key(key), entry)
+            return
+        self._data[key] = entry
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def close(self) -> None:
+        """Write buffered access times and close the table."""
+        with self._lock:
+            if self._db is not None:
+                self._flush_accessed()
+                self._db.commit()
+                self._db.close()
+                self._db = None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._generation += 1
+            self._accessed.clear()
+            self._pending_hits = 0
+            if self._db is not None:
+                self._db.execute(f"DELETE FROM {self.table}")
+                self._db.commit()
+
+    def stats(self) -> Dict:
+        """Hit/miss counters and current size (``None`` when the entries are
+        kept in a store, which counts their evictions)."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "size": len(self._data) if self._artifacts is None else None,
+                "max_entries": self.max_entries,
+            }
@@ -0,0 +1,153 @@
+"""Batch routing from the command line.
+
+Reads origin/destination pairs from a CSV file and writes one JSON object
+per pair to a JSONL file (or stdout) as soon as it is routed::
+
+    python -m navigator trips.csv -o routes.jsonl --workers 8
+
+Each row gives either coordinates (``origin_lat``, ``origin_lon``,
+``dest_lat``, ``dest_lon``) or place names (``origin``, ``destination``)
+that are geocoded with the first suggestion. Optional ``id`` and
+``profile`` columns are passed through / override ``--profile``.
+
+``--format`` switches the output from per-row records to one of the
+route export formats (GeoJSON, GeoJSON Lines, encoded polylines or
+GeoParquet, see ``navigator.export``); an output name ending in ``.gz``
+is gzip-compressed. Either way rows are written as they are routed.
+"""
+import argparse
+import csv
+import gzip
+import json
+import sys
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, Tuple
+
+from . import metrics
+from .export import EXPORT_FORMATS, write_features
+from .geocoding import autocomplete
+from .routing import ROUTING_BACKENDS, get_route
+
+PROFILES = ("driving-car", "cycling-regular", "foot-walking")
+
+
+def _resolve(row: Dict, prefix: str, name_column: str) -> Tuple[float, float]:
+    lat, lon = row.get(f"{prefix}_lat"), row.get(f"{prefix}_lon")
+    if lat not in (None, "") and lon not in (None, ""):
+        return float(lat), float(lon)
+    name = (row.get(name_column) or "").strip()
+    if not name:
+        raise ValueError(f"missing {prefix}_lat/{prefix}_lon or {name_column}")
+    suggestions = autocomplete(name, max_results=1)
+    if not suggestions:
+        raise ValueError(f"no place found for {name!r}")
+    return suggestions[0]["lat"], suggestions[0]["lon"]
+
+
+def route_row(row: Dict, line: int, args: argparse.Namespace) -> Dict:
+    """Route one CSV row into a JSON-serializable record."""
+    record = {"id": row.get("id") or line, "profile": row.get("profile") or args.profile}
+    try:
+        origin = _resolve(row, "origin", "origin")
+        dest = _resolve(row, "dest", "destination")
+        record["origin"], record["destination"] = list(origin), list(dest)
+        features = get_route(origin, dest, record["profile"], args.alternatives, backend=args.backend)
+    except Exception as e:
+        record["error"] = str(e) or type(e).__name__
+        return record
+    routes = []
+    for feat in features:
+        summary = feat["properties"]["segments"][0]
+        route = {"distance_m": summary["distance"], "duration_s": summary["duration"]}
+        if args.geometry:
+            route["geometry"] = feat["geometry"]
+        routes.append(route)
+    record["routes"] = routes
+    return record
+
+
+def route_rows(rows: Iterator[Dict], args: argparse.Namespace) -> Iterator[Dict]:
+    """Route rows on ``args.workers`` threads, yielding records in input order.
+
+    At most a few rows per worker are in flight, so the input is streamed
+    rather than read up front.
+    """
+    window = max(1, args.workers) * 4
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=max(1, args.workers), thread_name_prefix="batch") as pool:
+        for line, row in enumerate(rows, start=2):  # line 1 is the header
+            pending.append(pool.submit(route_row, row, line, args))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def record_features(record: Dict) -> Iterator[Dict]:
+    """The routes of one record as export features (none if it failed)."""
+    for i, route in enumerate(record.get("routes", [])):
+        props = {"kind": "route", "id": record["id"], "profile": record["profile"], "route_index": i,
+                 "distance_m": route["distance_m"], "duration_s": route["duration_s"]}
+        yield {"type": "Feature", "geometry": route["geometry"], "properties": props}
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m navigator",
+                                     description="Route origin/destination pairs from a CSV file to JSONL.")
+    parser.add_argument("input", help="CSV file with a header row ('-' for stdin)")
+    parser.add_argument("-o", "--output", default="-",
+                        help="output file, gzip-compressed if it ends in .gz (default: stdout)")
+    parser.add_argument("--format", default="records", choices=["records"] + list(EXPORT_FORMATS),
+                        help="JSON line per row (records, the default) or a route export format")
+    parser.add_argument("--profile", default="driving-car", choices=PROFILES,
+                        help="travel profile for rows without a profile column")
+    parser.add_argument("--backend", default="ors", choices=sorted(ROUTING_BACKENDS))
+    parser.add_argument("--alternatives", action="store_true", help="also request alternative routes")
+    parser.add_argument("--workers", type=int, default=4, help="rows routed concurrently")
+    parser.add_argument("--geometry", action="store_true",
+                        help="include each route's GeoJSON geometry in records (always on for export formats)")
+    parser.add_argument("--metrics", metavar="PATH",
+                        help="record stage timings and counters and write them to PATH "
+                             "(Prometheus text if it ends in .prom, else JSON lines)")
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.format != "records":
+        args.geometry = True
+    if args.metrics:
+        metrics.enable()
+    source = sys.stdin if args.input == "-" else open(args.input, newline="", encoding="utf-8")
+    raw = sys.stdout.buffer if args.output == "-" else open(args.output, "wb")
+    sink = gzip.GzipFile(fileobj=raw, mode="wb") if args.output.endswith(".gz") else raw
+    failed = 0
+    try:
+        records = route_rows(csv.DictReader(source), args)
+        if args.format == "records":
+            for record in records:
+                failed += "error" in record
+                sink.write((json.dumps(record) + "\n").encode())
+                if sink is raw:  # a gzip stream is flushed only at the end
+                    sink.flush()
+        else:
+            def features():
+                nonlocal failed
+                for record in records:
+                    failed += "error" in record
+                    yield from record_features(record)
+            write_features(features(), sink, args.format)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if sink is not raw:
+            sink.close()
+        if raw is not sys.stdout.buffer:
+            raw.close()
+        if args.metrics:
+            with open(args.metrics, "w", encoding="utf-8") as f:
+                f.write(metrics.to_prometheus() if args.metrics.endswith(".prom") else metrics.to_jsonl())
+    if failed:
+        print(f"{failed} row(s) could not be routed", file=sys.stderr)
+    return 1 if failed else 0
@@ -0,0 +1,94 @@
+"""Service endpoints, cache settings and data file locations.
+
+Values that depend on the deployment can be overridden with environment
+variables; everything else is a plain module constant.
+"""
+import os
+
+# Directory holding pro1.py; default data and cache files live next to it
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+API_KEY = os.environ.get(
+    "ORS_API_KEY",
+    "eyJvcmciOiI1YjNjZTM1OTc4NTExMTAwMDFjZjYyNDgiLCJpZCI6Ijg3YTI4ODI2YTc0OTRjODNiM2JkYTYzMDYxMGQxMWRjIiwiaCI6Im11cm11cjY0In0=",
+)
+# Point at a local stub server (e.g. for tests) by setting ORS_BASE_URL
+ORS_BASE_URL = os.environ.get("ORS_BASE_URL", "https://api.openrouteservice.org")
+# Per-request timeout (seconds) for directions calls
+ROUTE_REQUEST_TIMEOUT = 20.0
+
+# Client-side quotas per ORS endpoint group as (requests per minute, requests
+# per day); the defaults are the free plan's. Requests over the minute quota
+# wait for a token; a request that would wait longer than ORS_MAX_QUEUE_WAIT
+# seconds (e.g. once the daily quota is spent) fails instead.
+ORS_RATE_LIMITS = {
+    "directions": (40, 2000),
+    "geocode": (100, 1000),
+    "matrix": (40, 500),
+}
+ORS_MAX_QUEUE_WAIT = 10.0
+# HTTP keep-alive connections kept open to the ORS host
+ORS_POOL_SIZE = 16
+# Retries for throttled (429), unavailable or timed-out requests, with
+# full-jitter exponential backoff starting at ORS_RETRY_BASE_DELAY seconds
+ORS_MAX_RETRIES = 3
+ORS_RETRY_BASE_DELAY = 0.5
+
+# Geocoding cache: shared by every session of this server process
+GEOCODE_CACHE_MAX_ENTRIES = 2048
+GEOCODE_CACHE_TTL_SECONDS = 24 * 3600
+# Optional SQLite file so cached suggestions survive restarts (unset = memory only)
+GEOCODE_CACHE_DB = os.environ.get("NAVIGATOR_GEOCODE_CACHE_DB")
+
+# Offline gazetteer (CSV with name/label, lat, lon columns, or GeoJSON points)
+# answered locally before falling back to Pelias
+GAZETTEER_PATH = os.environ.get("NAVIGATOR_GAZETTEER", os.path.join(PROJECT_DIR, "gazetteer.csv"))
+# Local suggestions are used only if the best one scores at least this (0-100)
+GAZETTEER_MIN_SCORE = 85.0
+# Extra score for places near the map centre, halving every this many km
+GAZETTEER_BIAS_POINTS = 10.0
+GAZETTEER_BIAS_HALF_KM = 50.0
+
+# Route cache: endpoints are snapped to a grid of this many degrees
+# (0.0001° ≈ 11 m) so nearby repeats of the same query share an entry
+ROUTE_CACHE_GRID_DEG = 0.0001
+# Rows kept in ROUTE_CACHE_DB; in memory the cache shares the artifact
+# store's budget (STORE_MEMORY_BUDGET_MB)
+ROUTE_CACHE_MAX_ENTRIES = 512
+ROUTE_CACHE_TTL_SECONDS = 6 * 3600
+# SQLite file backing the in-memory route cache (empty string = memory only)
+ROUTE_CACHE_DB = os.environ.get(
+    "NAVIGATOR_ROUTE_CACHE_DB", os.path.join(PROJECT_DIR, ".cache", "routes.sqlite")
+)
+
+# Offline road network for the local routing backend: a CSV edge list
+# (from_lat, from_lon, to_lat, to_lon[, speed_kph, oneway, name]) or GeoJSON
+# LineStrings with speed_kph/oneway/name properties
+ROAD_NETWORK_PATH = os.environ.get(
+    "NAVIGATOR_ROAD_NETWORK", os.path.join(PROJECT_DIR, "road_network.geojson")
+)
+# Travel speeds (km/h) per profile; None means the edge's own speed_kph
+PROFILE_SPEEDS_KPH = {"driving-car": None, "cycling-regular": 18.0, "foot-walking": 5.0}
+DEFAULT_ROAD_SPEED_KPH = 50.0
+# Side length (degrees) of the grid cells used to snap points to nodes
+SNAP_GRID_DEG = 0.005
+
+# ORS matrix endpoint limit on sources × destinations per request
+MATRIX_MAX_ELEMENTS = 3500
+# Worker processes used for local one-to-many searches, and the number of
+# sources below which the searches simply run in-process
+MATRIX_LOCAL_WORKERS = min(4, os.cpu_count() or 1)
+MATRIX_PROCESS_MIN_SOURCES = 8
+
+# Stage timings and counters (see navigator.metrics); off unless
+# NAVIGATOR_METRICS is set. NAVIGATOR_METRICS_LOG appends every event to a
+# JSONL file.
+METRICS_ENABLED = os.environ.get("NAVIGATOR_METRICS", "").lower() in ("1", "true", "yes")
+METRICS_LOG = os.environ.get("NAVIGATOR_METRICS_LOG")
+# Individual events kept in memory for the debug panel
+METRICS_RECENT_EVENTS = 500
+
+# Memory budget of the process-wide artifact store holding session routes,
+# search graphs and traces; least recently used artifacts beyond it are
+# dropped and rebuilt when a session needs them again
+STORE_MEMORY_BUDGET_MB = float(os.environ.get("NAVIGATOR_STORE_BUDGET_MB", "256"))
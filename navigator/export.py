@@ -0,0 +1,209 @@
+"""Streaming export of routes and shortest-path results.
+
+Writers take an iterable of GeoJSON features and write them one at a time
+to a binary file object, so a batch is never held as one document:
+
+* ``geojson`` - a compact FeatureCollection (no indentation)
+* ``geojsonl`` - one compact feature per line (GeoJSON Lines)
+* ``polyline5`` / ``polyline6`` - one JSON object per line with the
+  geometry as an encoded polyline of precision 5 or 6
+* ``parquet`` - GeoParquet: WKB geometry plus columns for the common
+  properties, written in row groups (requires ``pyarrow``)
+
+Text formats can also be gzip-compressed on the fly.
+"""
+import gzip
+import json
+import struct
+from typing import BinaryIO, Dict, Iterable, Iterator, List
+
+import numpy as np
+
+EXPORT_FORMATS = {
+    "geojson": "GeoJSON",
+    "geojsonl": "GeoJSON Lines",
+    "polyline5": "Encoded polyline (precision 5)",
+    "polyline6": "Encoded polyline (precision 6)",
+    "parquet": "GeoParquet",
+}
+
+# File extension and MIME type per format (before any ".gz")
+EXPORT_FILE_TYPES = {
+    "geojson": (".geojson", "application/geo+json"),
+    "geojsonl": (".geojsonl", "application/geo+json-seq"),
+    "polyline5": (".polyline.jsonl", "application/jsonl"),
+    "polyline6": (".polyline.jsonl", "application/jsonl"),
+    "parquet": (".parquet", "application/vnd.apache.parquet"),
+}
+
+# Features per Parquet row group
+PARQUET_ROW_GROUP = 1000
+
+
+def _dumps(obj) -> bytes:
+    return json.dumps(obj, separators=(",", ":")).encode()
+
+
+def encode_polyline(latlon, precision: int = 5) -> str:
+    """Encode (lat, lon) vertices with the Google encoded polyline algorithm."""
+    points = np.asarray(latlon, dtype=np.float64).reshape(-1, 2)
+    ints = np.round(points * 10 ** precision).astype(np.int64)
+    deltas = np.diff(ints, axis=0, prepend=np.zeros((1, 2), dtype=np.int64)).ravel()
+    chars = []
+    for d in deltas.tolist():
+        value = ~(d << 1) if d < 0 else d << 1
+        while value >= 0x20:
+            chars.append(chr((0x20 | (value & 0x1F)) + 63))
+            value >>= 5
+        chars.append(chr(value + 63))
+    return "".join(chars)
+
+
+def decode_polyline(encoded: str, precision: int = 5) -> List[List[float]]:
+    """Inverse of ``encode_polyline``: a list of [lat, lon] pairs."""
+    values, value, shift = [], 0, 0
+    for ch in encoded:
+        b = ord(ch) - 63
+        value |= (b & 0x1F) << shift
+        shift += 5
+        if b < 0x20:
+            values.append(~(value >> 1) if value & 1 else value >> 1)
+            value, shift = 0, 0
+    coords = np.cumsum(np.asarray(values, dtype=np.int64).reshape(-1, 2), axis=0) / 10 ** precision
+    return coords.tolist()
+
+
+def route_features(routes: Iterable[Dict], **properties) -> Iterator[Dict]:
+    """Directions features tagged ``kind="route"`` and their ``route_index``.
+
+    Extra keyword ``properties`` are added to every feature. Input features
+    are not modified.
+    """
+    for i, route in enumerate(routes):
+        props = dict(route["properties"], kind="route", route_index=i, **properties)
+        summary = props.get("summary") or {}
+        props.setdefault("distance_m", summary.get("distance"))
+        props.setdefault("duration_s", summary.get("duration"))
+        yield {"type": "Feature", "geometry": route["geometry"], "properties": props}
+
+
+def shortest_path_feature(nodes, trace, **properties) -> Dict:
+    """The path found by a recorded search as a ``kind="shortest_path"`` feature."""
+    coords = [[round(float(nodes[u][1]), 6), round(float(nodes[u][0]), 6)] for u in trace.path]
+    props = dict(kind="shortest_path", mode=trace.mode, distance_m=trace.distance,
+                 path_nodes=len(trace.path), **properties)
+    return {"type": "Feature", "geometry": {"type": "LineString", "coordinates": coords}, "properties": props}
+
+
+def write_geojson(features: Iterable[Dict], fp: BinaryIO) -> int:
+    """Write a compact FeatureCollection; returns the number of features."""
+    fp.write(b'{"type":"FeatureCollection","features":[')
+    count = 0
+    for feature in features:
+        if count:
+            fp.write(b",")
+        fp.write(_dumps(feature))
+        count += 1
+    fp.write(b"]}\n")
+    return count
+
+
+def write_geojsonl(features: Iterable[Dict], fp: BinaryIO) -> int:
+    """Write one compact feature per line; returns the number of features."""
+    count = 0
+    for feature in features:
+        fp.write(_dumps(feature) + b"\n")
+        count += 1
+    return count
+
+
+def write_polylines(features: Iterable[Dict], fp: BinaryIO, precision: int = 5) -> int:
+    """Write ``{"properties", "precision", "polyline"}`` lines; returns the count."""
+    count = 0
+    for feature in features:
+        lonlat = np.asarray(feature["geometry"]["coordinates"], dtype=np.float64).reshape(-1, 2)
+        record = {"properties": feature["properties"], "precision": precision,
+                  "polyline": encode_polyline(lonlat[:, ::-1], precision)}
+        fp.write(_dumps(record) + b"\n")
+        count += 1
+    return count
+
+
+def _linestring_wkb(coordinates) -> bytes:
+    xy = np.ascontiguousarray(coordinates, dtype="<f8").reshape(-1, 2)
+    return struct.pack("<BII", 1, 2, len(xy)) + xy.tobytes()
+
+
+def write_parquet(features: Iterable[Dict], fp: BinaryIO, row_group: int = PARQUET_ROW_GROUP) -> int:
+    """Write GeoParquet in row groups of ``row_group`` features; returns the count.
+
+    Columns are ``kind``, ``route_index``, ``distance_m``, ``duration_s``,
+    the remaining ``properties`` as JSON and the WKB ``geometry``.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("Parquet export requires pyarrow (pip install pyarrow)") from e
+
+    geo = {"version": "1.0.0", "primary_column": "geometry",
+           "columns": {"geometry": {"encoding": "WKB", "geometry_types": ["LineString"]}}}
+    schema = pa.schema([
+        ("kind", pa.string()),
+        ("route_index", pa.int32()),
+        ("distance_m", pa.float64()),
+        ("duration_s", pa.float64()),
+        ("properties", pa.string()),
+        ("geometry", pa.binary()),
+    ], metadata={b"geo": json.dumps(geo).encode()})
+    columns = {name: [] for name in schema.names}
+    count = 0
+    with pq.ParquetWriter(fp, schema, compression="zstd") as writer:
+        def flush():
+            if columns["geometry"]:
+                writer.write_table(pa.table(columns, schema=schema))
+                for values in columns.values():
+                    values.clear()
+
+        for feature in features:
+            props = dict(feature["properties"])
+            for name in ("kind", "route_index", "distance_m", "duration_s"):
+                columns[name].append(props.pop(name, None))
+            columns["properties"].append(json.dumps(props, separators=(",", ":")))
+            columns["geometry"].append(_linestring_wkb(feature["geometry"]["coordinates"]))
+            count += 1
+            if len(columns["geometry"]) >= row_group:
+                flush()
+        flush()
+    return count
+
+
+def write_features(features: Iterable[Dict], fp: BinaryIO, fmt: str = "geojson", compress: bool = False) -> int:
+    """Write ``features`` to ``fp`` in export format ``fmt``; returns the count.
+
+    With ``compress`` text formats are gzip-compressed on the fly; Parquet
+    is compressed internally and does not accept it.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format {fmt!r}; expected one of {sorted(EXPORT_FORMATS)}")
+    if fmt == "parquet":
+        if compress:
+            raise ValueError("Parquet output is already compressed; gzip is only for text formats")
+        return write_parquet(features, fp)
+    if compress:
+        with gzip.GzipFile(fileobj=fp, mode="wb") as gz:
+            return write_features(features, gz, fmt)
+    if fmt == "geojson":
+        return write_geojson(features, fp)
+    if fmt == "geojsonl":
+        return write_geojsonl(features, fp)
+    return write_polylines(features, fp, precision=int(fmt[-1]))
+
+
+def export_filename(stem: str, fmt: str, compress: bool = False) -> str:
+    """File name for ``stem`` exported as ``fmt`` (``.gz`` appended if compressed)."""
+    return stem + EXPORT_FILE_TYPES[fmt][0] + (".gz" if compress else "")
+
+
+def export_mime(fmt: str, compress: bool = False) -> str:
+    return "application/gzip" if compress else EXPORT_FILE_TYPES[fmt][1]
@@ -0,0 +1,41 @@
+"""Human-readable formatting of distances, durations and directions."""
+from typing import Dict, List
+
+# Icons for maneuvers, matched against the lowercased instruction in order
+MANEUVER_ICONS = (("turn right", "↪️"), ("turn left", "↩️"), ("continue", "⬆️"))
+DEFAULT_MANEUVER_ICON = "➡️"
+
+
+def format_distance(meters: float, units: str = "km") -> str:
+    """Format distance in meters to km or miles with 2 decimal places."""
+    if units == "mi":
+        miles = meters / 1609.344
+        return f"{miles:.2f} mi"
+    km = meters / 1000.0
+    return f"{km:.2f} km"
+
+
+def format_duration(seconds: float) -> str:
+    """Format duration in seconds to hours and minutes."""
+    hours = int(seconds // 3600)
+    minutes = int((seconds % 3600) // 60)
+    if hours > 0:
+        return f"{hours}h {minutes}m"
+    return f"{minutes}m"
+
+
+def maneuver_icon(instruction: str) -> str:
+    """Emoji for a turn-by-turn instruction."""
+    text = instruction.lower()
+    for phrase, icon in MANEUVER_ICONS:
+        if phrase in text:
+            return icon
+    return DEFAULT_MANEUVER_ICON
+
+
+def directions_table(steps: List[Dict], units: str = "km") -> List[Dict]:
+    """Turn-by-turn rows (step number, icon, instruction, distance and
+    duration) for the ``steps`` of a directions segment."""
+    return [{"step": i, "icon": maneuver_icon(step["instruction"]), "instruction": step["instruction"],
+             "distance": format_distance(step["distance"], units), "duration": format_duration(step["duration"])}
+            for i, step in enumerate(steps, 1)]
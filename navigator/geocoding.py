@@ -0,0 +1,188 @@
+"""Place search: offline gazetteer, shared result cache and Pelias fallback."""
+import atexit
+import bisect
+import csv
+import json
+import os
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+from . import metrics
+from .cache import TTLCache
+from .config import (GAZETTEER_BIAS_HALF_KM, GAZETTEER_BIAS_POINTS, GAZETTEER_MIN_SCORE,
+                     GAZETTEER_PATH, GEOCODE_CACHE_DB, GEOCODE_CACHE_MAX_ENTRIES,
+                     GEOCODE_CACHE_TTL_SECONDS)
+from .geometry import as_latlon_array, distances_to
+from .ors import get_client
+
+
+@lru_cache(maxsize=None)
+def get_geocode_cache() -> TTLCache:
+    """Process-wide geocoding cache (created once, shared across sessions)."""
+    cache = TTLCache(GEOCODE_CACHE_MAX_ENTRIES, GEOCODE_CACHE_TTL_SECONDS,
+                     db_path=GEOCODE_CACHE_DB, table="geocode")
+    atexit.register(cache.close)
+    return cache
+
+
+def normalize_query(query: str) -> str:
+    """Cache key for a search string: case-folded with collapsed whitespace."""
+    return " ".join(query.casefold().split())
+
+
+class PlaceIndex:
+    """In-memory gazetteer answering autocomplete queries without the network.
+
+    Normalized names are kept in a sorted array for prefix lookups with
+    ``bisect``. Only when a query has too few prefix matches are names scored
+    with RapidFuzz, and then only the block of names sharing its first
+    character, using plain edit-distance similarity (``fuzz.ratio``) so
+    short junk queries do not score high.
+    """
+
+    def __init__(self, places: List[Dict]):
+        self.labels = [p["label"] for p in places]
+        self.keys = [normalize_query(p["label"]) for p in places]
+        self.coords = as_latlon_array([(p["lat"], p["lon"]) for p in places])
+        self._order = sorted(range(len(self.keys)), key=self.keys.__getitem__)
+        self._sorted_keys = [self.keys[i] for i in self._order]
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    @classmethod
+    def load(cls, path: str) -> "PlaceIndex":
+        """Load places from a CSV (``name``/``label``, ``lat``, ``lon``) or GeoJSON file."""
+        places = []
+        if path.lower().endswith((".geojson", ".json")):
+            with open(path, encoding="utf-8") as f:
+                features = json.load(f).get("features", [])
+            for feat in features:
+                geom = feat.get("geometry") or {}
+                props = feat.get("properties") or {}
+                label = props.get("label", props.get("name"))
+                if geom.get("type") == "Point" and label:
+                    lon, lat = geom["coordinates"][:2]
+                    places.append({"label": label, "lat": float(lat), "lon": float(lon)})
+        else:
+            with open(path, newline="", encoding="utf-8") as f:
+                for row in csv.DictReader(f):
+                    label = row.get("label") or row.get("name")
+                    if label and row.get("lat") and row.get("lon"):
+                        places.append({"label": label, "lat": float(row["lat"]), "lon": float(row["lon"])})
+        return cls(places)
+
+    def _prefix_matches(self, key: str, limit: int) -> List[int]:
+        lo = bisect.bisect_left(self._sorted_keys, key)
+        hits = []
+        for pos in range(lo, len(self._sorted_keys)):
+            if len(hits) >= limit or not self._sorted_keys[pos].startswith(key):
+                break
+            hits.append(self._order[pos])
+        return hits
+
+    def search(self, query: str, max_results: int = 5,
+               focus: Tuple[float, float] = None) -> List[Dict]:
+        """Best local matches for ``query`` as autocomplete suggestions with a
+        ``score`` (0-100, plus a small bonus for places near ``focus``)."""
+        key = normalize_query(query)
+        if not key or not self.labels:
+            return []
+        # Fetch a few extra candidates so the spatial bias can reorder them
+        limit = max_results * 4
+        prefix = self._prefix_matches(key, limit)
+        scores = {i: 100.0 for i in prefix}
+        if len(prefix) < max_results:
+            from rapidfuzz import fuzz, process
+            lo = bisect.bisect_left(self._sorted_keys, key[0])
+            hi = bisect.bisect_left(self._sorted_keys, chr(ord(key[0]) + 1), lo)
+            for _, score, j in process.extract(key, self._sorted_keys[lo:hi], scorer=fuzz.ratio,
+                                               limit=limit, score_cutoff=50):
+                scores.setdefault(self._order[lo + j], float(score))
+        if not scores:
+            return []
+        candidates = list(scores)
+        if focus is not None:
+            km = (distances_to(focus, self.coords[candidates]) / 1000.0).tolist()
+            for i, d in zip(candidates, km):
+                scores[i] += GAZETTEER_BIAS_POINTS * 0.5 ** (d / GAZETTEER_BIAS_HALF_KM)
+        best = sorted(candidates, key=lambda i: -scores[i])[:max_results]
+        return [{"label": self.labels[i], "lat": float(self.coords[i, 0]),
+                 "lon": float(self.coords[i, 1]), "score": scores[i]} for i in best]
+
+
+@lru_cache(maxsize=None)
+def get_place_index():
+    """Process-wide gazetteer, loaded on first use; ``None`` if no file is configured."""
+    if not GAZETTEER_PATH or not os.path.exists(GAZETTEER_PATH):
+        return None
+    return PlaceIndex.load(GAZETTEER_PATH)
+
+
+def autocomplete(query: str, max_results: int = 5,
+                 focus: Tuple[float, float] = None) -> List[Dict]:
+    """Get location suggestions from the local gazetteer or OpenRouteService.
+
+    Confident local matches are returned directly; otherwise Pelias is
+    queried (through the shared geocoding cache). ``focus`` (lat, lon)
+    biases local matches towards nearby places. API errors propagate to
+    the caller.
+    """
+    if not query or len(query.strip()) < 2:
+        return []
+
+    index = get_place_index()
+    if index is not None:
+        local = index.search(query, max_results, focus)
+        if local and local[0]["score"] >= GAZETTEER_MIN_SCORE:
+            metrics.count("gazetteer_hits")
+            return local
+
+    cache = get_geocode_cache()
+    key = normalize_query(query)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached[:max_results]
+    
+    client = get_client()
+    # Try autocomplete first
+    results = client.pelias_autocomplete(text=query)
+    suggestions = []
+
+    if results and 'features' in results:
+        for feat in results['features']:
+            if 'geometry' not in feat:
+                continue
+            props = feat['properties']
+            coords = feat['geometry']['coordinates']
+            suggestions.append({
+                "label": props.get('label', props.get('name', 'Unknown')),
+                "lat": coords[1],
+                "lon": coords[0]
+            })
+
+    # If autocomplete fails or returns no results, try search
+    if not suggestions:
+        search_results = client.pelias_search(text=query)
+        if search_results and 'features' in search_results:
+            for feat in search_results['features']:
+                if 'geometry' not in feat:
+                    continue
+                props = feat['properties']
+                coords = feat['geometry']['coordinates']
+                suggestions.append({
+                    "label": props.get('label', props.get('name', 'Unknown')),
+                    "lat": coords[1],
+                    "lon": coords[0]
+                })
+
+    # Remove duplicates while preserving order
+    seen = set()
+    unique_suggestions = []
+    for s in suggestions:
+        if s['label'] not in seen and all(x is not None for x in [s['lat'], s['lon']]):
+            seen.add(s['label'])
+            unique_suggestions.append(s)
+
+    cache.set(key, unique_suggestions)
+    return unique_suggestions[:max_results]
@@ -0,0 +1,333 @@
+"""Vectorized great-circle kernels, route similarity and polyline simplification.
+
+Points are (lat, lon) in degrees and distances are in meters throughout.
+"""
+import heapq
+import math
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+EARTH_RADIUS_M = 6371000.0
+
+# Two routes are duplicates when their geometries are this similar:
+# "shared_length" compares the fraction of each route lying within
+# ALTERNATIVE_SHARED_TOLERANCE_M of the other; "hausdorff" compares the
+# Hausdorff distance between the simplified polylines.
+ALTERNATIVE_SIMILARITY_METRIC = "shared_length"
+ALTERNATIVE_SHARED_TOLERANCE_M = 25.0
+ALTERNATIVE_SHARED_RATIO_MAX = 0.9
+ALTERNATIVE_HAUSDORFF_MIN_M = 100.0
+
+# Polyline simplification: tolerances (meters) of the precomputed levels of
+# detail, finest first. The map shows the coarsest level whose tolerance is
+# below LOD_PIXEL_TOLERANCE screen pixels at the current zoom.
+SIMPLIFY_METHODS = {"douglas-peucker": "Douglas-Peucker", "visvalingam": "Visvalingam-Whyatt"}
+SIMPLIFY_LOD_TOLERANCES_M = (1.0, 5.0, 20.0, 80.0, 300.0)
+LOD_PIXEL_TOLERANCE = 1.0
+# The route map zooms up to MAP_MAX_ZOOM and only embeds the levels it shows
+# there; levels finer than MAP_LOD_MIN_TOLERANCE_M are never sent and the
+# finest remaining level is used at the closest zooms instead
+MAP_MAX_ZOOM = 18
+MAP_LOD_MIN_TOLERANCE_M = 5.0
+
+
+def as_latlon_array(points, dtype=np.float64) -> np.ndarray:
+    """Coerce a sequence of (lat, lon) points into an (N, 2) array."""
+    arr = np.asarray(points, dtype=dtype)
+    return arr.reshape(-1, 2)
+
+
+def haversine_pairs(a, b, dtype=np.float64) -> np.ndarray:
+    """Element-wise great-circle distance in meters between (lat, lon) arrays.
+
+    ``a`` and ``b`` have shape (..., 2) and broadcast against each other.
+    ``dtype`` selects float64 (default) or float32 arithmetic.
+    """
+    a = np.radians(np.asarray(a, dtype=dtype))
+    b = np.radians(np.asarray(b, dtype=dtype))
+    lat1, lon1 = a[..., 0], a[..., 1]
+    lat2, lon2 = b[..., 0], b[..., 1]
+    hav = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return (2 * EARTH_RADIUS_M) * np.arcsin(np.sqrt(np.clip(hav, 0, 1))).astype(dtype)
+
+
+def segment_lengths(latlon, dtype=np.float64) -> np.ndarray:
+    """Lengths in meters of the N-1 consecutive segments of an (N, 2) polyline."""
+    pts = as_latlon_array(latlon, dtype)
+    return haversine_pairs(pts[:-1], pts[1:], dtype)
+
+
+def cumulative_distance(latlon, dtype=np.float64) -> np.ndarray:
+    """Distance in meters along the polyline at each of its N vertices."""
+    seg = segment_lengths(latlon, dtype)
+    out = np.zeros(len(seg) + 1, dtype=dtype)
+    np.cumsum(seg, out=out[1:])
+    return out
+
+
+def pairwise_distances(a, b=None, dtype=np.float64) -> np.ndarray:
+    """(N, M) distance matrix in meters between point sets ``a`` and ``b``
+    (``b`` defaults to ``a``)."""
+    a = as_latlon_array(a, dtype)
+    b = a if b is None else as_latlon_array(b, dtype)
+    return haversine_pairs(a[:, None, :], b[None, :, :], dtype)
+
+
+def distances_to(point: Tuple[float, float], latlon, dtype=np.float64) -> np.ndarray:
+    """One-to-many distances in meters from ``point`` to each row of ``latlon``."""
+    return haversine_pairs(as_latlon_array(latlon, dtype), np.asarray(point, dtype=dtype), dtype)
+
+
+def nearest_index(point: Tuple[float, float], latlon) -> int:
+    """Index of the vertex of ``latlon`` closest to ``point``."""
+    return int(np.argmin(distances_to(point, latlon)))
+
+
+def _decimate(latlon: np.ndarray, max_points: int) -> np.ndarray:
+    # Evenly spaced subset of the vertices, always keeping both endpoints
+    if len(latlon) <= max_points:
+        return latlon
+    keep = np.unique(np.linspace(0, len(latlon) - 1, max_points).round().astype(np.int64))
+    return latlon[keep]
+
+
+def _local_xy(latlon: np.ndarray, lat0: float) -> np.ndarray:
+    # Equirectangular projection to meters around latitude lat0; accurate
+    # enough for comparing geometries a few hundred km across
+    rad = np.radians(latlon)
+    return np.column_stack((EARTH_RADIUS_M * rad[:, 1] * math.cos(math.radians(lat0)),
+                            EARTH_RADIUS_M * rad[:, 0]))
+
+
+def hausdorff_distance(a, b, max_points: int = 300) -> float:
+    """Discrete Hausdorff distance in meters between two (lat, lon) polylines,
+    computed on at most ``max_points`` vertices of each."""
+    a = _decimate(as_latlon_array(a), max_points)
+    b = _decimate(as_latlon_array(b), max_points)
+    d = pairwise_distances(a, b)
+    return float(max(d.min(axis=1).max(), d.min(axis=0).max()))
+
+
+def _point_segment_distance(p, a, b) -> np.ndarray:
+    # Row-wise distance from points p to segments a-b, all (N, 2) in meters
+    ab, ap = b - a, p - a
+    t = np.clip((ap * ab).sum(axis=1) / np.maximum((ab ** 2).sum(axis=1), 1e-12), 0.0, 1.0)
+    return np.hypot(*(ap - t[:, None] * ab).T)
+
+
+def shared_length_ratio(a, b, tolerance_m: float = ALTERNATIVE_SHARED_TOLERANCE_M) -> float:
+    """Fraction of polyline ``a``'s length lying within ``tolerance_m`` of
+    polyline ``b`` (both (lat, lon)), judged at the midpoint of each segment.
+
+    ``b`` is split into pieces no longer than ``tolerance_m`` and bucketed
+    on a grid, so each midpoint is only measured against the pieces in its
+    neighbouring cells; every vertex of both lines is used.
+    """
+    a, b = as_latlon_array(a), as_latlon_array(b)
+    if len(a) < 2 or len(b) < 2:
+        return 0.0
+    lat0 = float(a[:, 0].mean())
+    pa, pb = _local_xy(a, lat0), _local_xy(b, lat0)
+    mids = (pa[:-1] + pa[1:]) / 2
+    lengths = np.hypot(*(pa[1:] - pa[:-1]).T)
+    total = lengths.sum()
+    if total <= 0:
+        return 1.0
+
+    # pieces of b's segments, each at most tolerance_m long
+    seg = pb[1:] - pb[:-1]
+    parts = np.maximum(np.ceil(np.hypot(*seg.T) / tolerance_m), 1).astype(np.int64)
+    owner = np.repeat(np.arange(len(seg)), parts)
+    first = np.repeat(np.cumsum(parts) - parts, parts)
+    frac = (np.arange(len(owner)) - first) / parts[owner]
+    q0 = pb[owner] + frac[:, None] * seg[owner]
+    q1 = q0 + seg[owner] / parts[owner][:, None]
+
+    # a midpoint within tolerance_m of a piece is within 1.5 * tolerance_m
+    # of the piece's centre, so the 3x3 cells of that size around it suffice
+    cell = 1.5 * tolerance_m
+    origin = np.minimum(mids.min(axis=0), pb.min(axis=0)) - cell
+    span = 4 + int((np.maximum(mids.max(axis=0), pb.max(axis=0)) - origin).max() // cell)
+
+    def cell_key(xy):
+        ij = np.floor((xy - origin) / cell).astype(np.int64)
+        return ij[:, 0] * span + ij[:, 1]
+
+    piece_keys = cell_key((q0 + q1) / 2)
+    order = np.argsort(piece_keys, kind="stable")
+    sorted_keys = piece_keys[order]
+    mid_keys = cell_key(mids)
+    near = np.zeros(len(mids), dtype=bool)
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            key = mid_keys + dx * span + dy
+            lo = np.searchsorted(sorted_keys, key, "left")
+            hi = np.searchsorted(sorted_keys, key, "right")
+            counts = hi - lo
+            if not counts.any():
+                continue
+            rows = np.repeat(np.arange(len(mids)), counts)
+            cols = order[np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts) + np.repeat(lo, counts)]
+            hit = _point_segment_distance(mids[rows], q0[cols], q1[cols]) <= tolerance_m
+            near[rows[hit]] = True
+    return float(lengths[near].sum() / total)
+
+
+def routes_are_similar(a, b, metric: str = ALTERNATIVE_SIMILARITY_METRIC) -> bool:
+    """Whether two (lat, lon) route geometries count as the same route."""
+    if metric == "hausdorff":
+        return hausdorff_distance(a, b) < ALTERNATIVE_HAUSDORFF_MIN_M
+    if metric == "shared_length":
+        return min(shared_length_ratio(a, b), shared_length_ratio(b, a)) >= ALTERNATIVE_SHARED_RATIO_MAX
+    raise ValueError(f"Unknown similarity metric: {metric}")
+
+
+def dedupe_routes(features: List[Dict], metric: str = ALTERNATIVE_SIMILARITY_METRIC) -> List[Dict]:
+    """Drop route features whose geometry duplicates an earlier one."""
+    kept, kept_geoms = [], []
+    for feat in features:
+        geom = [(p[1], p[0]) for p in feat['geometry']['coordinates']]
+        if any(routes_are_similar(geom, other, metric) for other in kept_geoms):
+            continue
+        kept.append(feat)
+        kept_geoms.append(geom)
+    return kept
+
+
+def simplify_douglas_peucker(latlon, tolerance_m: float) -> np.ndarray:
+    """Indices of the vertices kept by Douglas-Peucker simplification: no
+    dropped vertex is further than ``tolerance_m`` from the simplified line."""
+    pts = as_latlon_array(latlon)
+    n = len(pts)
+    if n < 3:
+        return np.arange(n)
+    xy = _local_xy(pts, float(pts[:, 0].mean()))
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        i, j = stack.pop()
+        if j <= i + 1:
+            continue
+        a, b = xy[i], xy[j]
+        ab = b - a
+        rel = xy[i + 1:j] - a
+        len2 = float(ab @ ab)
+        if len2 > 0:
+            t = np.clip(rel @ ab / len2, 0.0, 1.0)
+            d = np.hypot(*(rel - t[:, None] * ab).T)
+        else:
+            d = np.hypot(*rel.T)
+        k = int(np.argmax(d))
+        if d[k] > tolerance_m:
+            mid = i + 1 + k
+            keep[mid] = True
+            stack.append((i, mid))
+            stack.append((mid, j))
+    return np.flatnonzero(keep)
+
+
+def simplify_visvalingam(latlon, tolerance_m: float) -> np.ndarray:
+    """Indices of the vertices kept by Visvalingam-Whyatt simplification:
+    vertices are removed smallest effective triangle area first until every
+    remaining area is at least ``tolerance_m``²."""
+    pts = as_latlon_array(latlon)
+    n = len(pts)
+    if n < 3:
+        return np.arange(n)
+    xy = _local_xy(pts, float(pts[:, 0].mean()))
+    x, y = xy[:, 0].tolist(), xy[:, 1].tolist()
+    prev = list(range(-1, n - 1))
+    nxt = list(range(1, n + 1))
+    removed = bytearray(n)
+    threshold = tolerance_m ** 2
+
+    def tri_area(i):
+        p, q = prev[i], nxt[i]
+        return abs((x[i] - x[p]) * (y[q] - y[p]) - (x[q] - x[p]) * (y[i] - y[p])) / 2
+
+    area = [0.0] * n
+    for i in range(1, n - 1):
+        area[i] = tri_area(i)
+    heap = [(area[i], i) for i in range(1, n - 1)]
+    heapq.heapify(heap)
+    while heap:
+        a, i = heapq.heappop(heap)
+        if removed[i] or a != area[i]:
+            continue  # stale entry
+        if a >= threshold:
+            break
+        removed[i] = 1
+        p, q = prev[i], nxt[i]
+        nxt[p], prev[q] = q, p
+        for j in (p, q):
+            if 0 < j < n - 1:
+                # effective area never drops below the area just removed
+                area[j] = max(tri_area(j), a)
+                heapq.heappush(heap, (area[j], j))
+    return np.flatnonzero(np.frombuffer(bytes(removed), dtype=np.uint8) == 0)
+
+
+def simplify_polyline(latlon, tolerance_m: float, method: str = "douglas-peucker") -> np.ndarray:
+    """Indices of the vertices of ``latlon`` kept at ``tolerance_m``."""
+    if method == "douglas-peucker":
+        return simplify_douglas_peucker(latlon, tolerance_m)
+    if method == "visvalingam":
+        return simplify_visvalingam(latlon, tolerance_m)
+    raise ValueError(f"Unknown simplification method: {method}")
+
+
+def build_route_lods(latlon, tolerances=SIMPLIFY_LOD_TOLERANCES_M,
+                     method: str = "douglas-peucker") -> List[Dict]:
+    """Precompute levels of detail of a (lat, lon) polyline, finest first.
+
+    Each level is ``{"tolerance_m", "coords", "vertices"}``; coarser levels
+    simplify the previous level, so the total cost stays close to one pass.
+    """
+    pts = as_latlon_array(latlon)
+    levels = []
+    for tol in sorted(tolerances):
+        pts = pts[simplify_polyline(pts, tol, method)]
+        levels.append({"tolerance_m": tol, "coords": pts.tolist(), "vertices": len(pts)})
+    return levels
+
+
+def meters_per_pixel(zoom: int, lat: float) -> float:
+    """Ground resolution of a Web Mercator tile map at ``zoom`` and latitude ``lat``."""
+    return 156543.03392 * math.cos(math.radians(lat)) / (2 ** zoom)
+
+
+def lod_index_for_zoom(levels: List[Dict], zoom: int, lat: float) -> int:
+    """Index of the coarsest level that still looks exact at ``zoom``."""
+    limit = LOD_PIXEL_TOLERANCE * meters_per_pixel(zoom, lat)
+    best = 0
+    for i, level in enumerate(levels):
+        if level["tolerance_m"] <= limit:
+            best = i
+    return best
+
+
+def haversine_distance(a: Tuple[float, float], b: Tuple[float, float]) -> float:
+    # Returns distance in meters between two (lat, lon) points; scalar math
+    # is much faster than numpy for one pair, use haversine_pairs for batches
+    lat1, lon1 = math.radians(a[0]), math.radians(a[1])
+    lat2, lon2 = math.radians(b[0]), math.radians(b[1])
+    hav = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(min(hav, 1.0)))
+
+
+def map_lods(levels: List[Dict], lat: float, max_zoom: int = MAP_MAX_ZOOM,
+             min_tolerance_m: float = MAP_LOD_MIN_TOLERANCE_M) -> Tuple[List[int], List[int]]:
+    """Levels of ``levels`` a map of zooms 0 to ``max_zoom`` needs.
+
+    Returns the indices of the levels to embed, finest first, and for each
+    zoom the position in that list of the level shown. Levels finer than
+    ``min_tolerance_m`` are skipped (the coarsest level is kept if all are).
+    """
+    candidates = [i for i, level in enumerate(levels) if level["tolerance_m"] >= min_tolerance_m]
+    candidates = candidates or [len(levels) - 1]
+    allowed = [levels[i] for i in candidates]
+    picks = [candidates[lod_index_for_zoom(allowed, z, lat)] for z in range(max_zoom + 1)]
+    used = sorted(set(picks))
+    return used, [used.index(i) for i in picks]
@@ -0,0 +1,556 @@
+"""Sparse route graphs and traced shortest-path searches."""
+import heapq
+from bisect import bisect_left
+from array import array
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from . import metrics
+from .geometry import as_latlon_array, distances_to, segment_lengths, simplify_polyline
+
+
+def _to_array(typecode: str, values: np.ndarray) -> array:
+    # Copy a numpy buffer into a stdlib array (cheap to index from Python loops)
+    out = array(typecode)
+    out.frombytes(np.ascontiguousarray(values, dtype='q' if typecode == 'q' else 'd').tobytes())
+    return out
+
+# Largest graph for which the dense n×n matrix view is still offered
+MATRIX_VIEW_MAX_NODES = 60
+
+
+class SparseGraph:
+    """Weighted graph stored in CSR (compressed sparse row) form.
+
+    ``indptr[u]:indptr[u+1]`` is the slice of ``indices``/``weights`` holding
+    the neighbours of ``u``. Memory is O(n + m) instead of the O(n²) needed
+    by a dense adjacency matrix.
+    """
+
+    def __init__(self, indptr: array, indices: array, weights: array, edge_ids: array = None):
+        self.indptr = indptr
+        self.indices = indices
+        self.weights = weights
+        # Optional id of the source edge behind each CSR slot (e.g. road segment)
+        self.edge_ids = edge_ids
+
+    @property
+    def n(self) -> int:
+        return len(self.indptr) - 1
+
+    @property
+    def num_edges(self) -> int:
+        return len(self.indices)
+
+    def __len__(self) -> int:
+        return self.n
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the CSR arrays in bytes."""
+        arrays = (self.indptr, self.indices, self.weights, self.edge_ids)
+        return sum(len(a) * a.itemsize for a in arrays if a is not None)
+
+    @classmethod
+    def from_edges(cls, n: int, edges: List[Tuple[int, int, float]]) -> "SparseGraph":
+        """Build a graph from directed ``(u, v, weight)`` triples in O(n + m)."""
+        counts = [0] * (n + 1)
+        for u, _, _ in edges:
+            counts[u + 1] += 1
+        for i in range(n):
+            counts[i + 1] += counts[i]
+        indptr = array('q', counts)
+        fill = list(counts[:-1])
+        indices = array('q', bytes(8 * len(edges)))
+        weights = array('d', bytes(8 * len(edges)))
+        for u, v, w in edges:
+            pos = fill[u]
+            indices[pos] = v
+            weights[pos] = w
+            fill[u] = pos + 1
+        return cls(indptr, indices, weights)
+
+    @classmethod
+    def from_arrays(cls, n: int, src, dst, weights, edge_ids=None) -> "SparseGraph":
+        """Build a graph from parallel numpy arrays of directed edges."""
+        src = np.asarray(src, dtype=np.int64)
+        order = np.argsort(src, kind="stable")
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=n), out=indptr[1:])
+        ids = None if edge_ids is None else _to_array('q', np.asarray(edge_ids)[order])
+        return cls(_to_array('q', indptr), _to_array('q', np.asarray(dst)[order]),
+                   _to_array('d', np.asarray(weights)[order]), ids)
+
+    def neighbors(self, u: int) -> List[Tuple[int, float]]:
+        """Return ``(v, weight)`` pairs for the outgoing edges of ``u``."""
+        lo, hi = self.indptr[u], self.indptr[u + 1]
+        return list(zip(self.indices[lo:hi], self.weights[lo:hi]))
+
+    def edge_weight(self, u: int, v: int) -> float:
+        """Weight of edge ``u -> v`` (0 on the diagonal, ``inf`` if absent)."""
+        if u == v:
+            return 0.0
+        for nbr, w in self.neighbors(u):
+            if nbr == v:
+                return w
+        return float('inf')
+
+    def reversed(self) -> "SparseGraph":
+        """Graph with every edge reversed (cached; used by backward searches)."""
+        if getattr(self, '_reverse', None) is None:
+            edges = [(v, u, w) for u in range(self.n) for v, w in self.neighbors(u)]
+            self._reverse = SparseGraph.from_edges(self.n, edges)
+            self._reverse._reverse = self
+        return self._reverse
+
+    def to_matrix(self, max_nodes: int = MATRIX_VIEW_MAX_NODES) -> List[List[float]]:
+        """Export a dense adjacency matrix; only allowed for small graphs."""
+        n = self.n
+        if n > max_nodes:
+            raise ValueError(f"Graph has {n} nodes; dense matrix export is limited to {max_nodes}")
+        matrix = [[0.0 if i == j else float('inf') for j in range(n)] for i in range(n)]
+        for u in range(n):
+            for v, w in self.neighbors(u):
+                matrix[u][v] = w
+        return matrix
+
+
+def build_graph_from_coords(coords_latlon: List[Tuple[float, float]]):
+    # nodes: list of (lat, lon); sparse graph with weights (meters); edges only between consecutive points
+    nodes = list(coords_latlon)
+    n = len(nodes)
+    metrics.observe("graph_vertices", n)
+    if n < 2:
+        return nodes, SparseGraph(array('q', [0] * (n + 1)), array('q'), array('d'))
+    # A polyline chain has at most two neighbours per node, so the CSR arrays
+    # can be laid out directly without sorting an edge list: each node's
+    # slice holds its left neighbour first and its right neighbour last.
+    seg = segment_lengths(nodes)
+    degree = np.full(n, 2, dtype=np.int64)
+    degree[0] = degree[-1] = 1
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(degree, out=indptr[1:])
+    indices = np.empty(2 * (n - 1), dtype=np.int64)
+    weights = np.empty(2 * (n - 1), dtype=np.float64)
+    left = indptr[1:n]        # slots of nodes 1..n-1 pointing to i-1
+    right = indptr[1:n] - 1   # slots of nodes 0..n-2 pointing to i+1
+    indices[left] = np.arange(0, n - 1)
+    weights[left] = seg
+    indices[right] = np.arange(1, n)
+    weights[right] = seg
+    return nodes, SparseGraph(_to_array('q', indptr), _to_array('q', indices), _to_array('d', weights))
+
+# Snapshot spacing for delta-encoded traces: a full copy of the state is
+# kept every ``interval`` steps, with at most TRACE_MAX_SNAPSHOTS copies
+TRACE_MIN_SNAPSHOT_INTERVAL = 64
+TRACE_MAX_SNAPSHOTS = 16
+
+SEARCH_MODES = {
+    "dijkstra": "Dijkstra",
+    "astar": "A* (haversine heuristic)",
+    "bidirectional": "Bidirectional Dijkstra",
+}
+
+
+class AlgorithmTrace:
+    """Delta-encoded step record of a shortest-path search.
+
+    Step ``k`` stores only the node settled at that step, the search side it
+    belongs to and the ``(node, new_dist, new_pred)`` relaxations it caused.
+    Full copies of ``dist``/``prev``/``visited`` are kept every
+    ``snapshot_interval`` steps, so any state is rebuilt from the nearest
+    snapshot plus at most one interval of deltas. Indexing (``trace[k]``)
+    returns the same dict shape the old list-of-copies trace used; a
+    bidirectional trace adds ``*_rev`` keys for the backward search.
+    """
+
+    def __init__(self, n: int, start_index: int, target_index: int = None, mode: str = "dijkstra",
+                 recording: bool = True):
+        self.n = n
+        self.recording = recording
+        self._expanded = 0
+        self.start_index = start_index
+        self.target_index = target_index
+        self.mode = mode
+        self.sides = 2 if mode == "bidirectional" else 1
+        self.snapshot_interval = max(TRACE_MIN_SNAPSHOT_INTERVAL, -(-n // TRACE_MAX_SNAPSHOTS))
+        self.settled = array('q')
+        self.step_side = array('b')
+        # Relaxations of step k are relax_*[relax_ptr[k]:relax_ptr[k+1]]
+        self.relax_ptr = array('q', [0])
+        self.relax_node = array('q')
+        self.relax_dist = array('d')
+        self.relax_pred = array('q')
+        self.snapshots: Dict[int, Tuple[Tuple[array, array, bytearray], ...]] = {}
+        # Result of the search, filled in by the solver
+        self.path: List[int] = []
+        self.distance = float('inf')
+        self._by_node = None
+
+    @property
+    def expanded(self) -> int:
+        """Number of nodes settled by the search (both sides together)."""
+        return self._expanded
+
+    def begin_step(self, *states) -> None:
+        """Snapshot the live ``(dist, prev, visited)`` of every side if the
+        upcoming step falls on an interval."""
+        k = len(self.settled)
+        if self.recording and k % self.snapshot_interval == 0:
+            self.snapshots[k] = tuple(
+                (array('d', dist), array('q', prev), bytearray(visited))
+                for dist, prev, visited in states
+            )
+
+    def record(self, u: int, relaxations: List[Tuple[int, float, int]], side: int = 0) -> None:
+        """Append the delta for a step: settled node ``u`` and its relaxations."""
+        self._expanded += 1
+        if not self.recording:
+            return
+        self.settled.append(u)
+        self.step_side.append(side)
+        for v, d, p in relaxations:
+            self.relax_node.append(v)
+            self.relax_dist.append(d)
+            self.relax_pred.append(p)
+        self.relax_ptr.append(len(self.relax_node))
+
+    def finish(self, *states) -> None:
+        self.begin_step(*states)
+
+    def __len__(self) -> int:
+        # one state per settled node plus the final state
+        return len(self.settled) + 1
+
+    def __getitem__(self, k: int) -> Dict:
+        if k < 0:
+            k += len(self)
+        if not self.recording:
+            raise IndexError("trace was run without step recording")
+        if not 0 <= k < len(self):
+            raise IndexError("trace step out of range")
+        base = k - k % self.snapshot_interval
+        sides = [(list(d), list(p), list(vis)) for d, p, vis in self.snapshots[base]]
+        for step in range(base, k):
+            dist, prev, visited = sides[self.step_side[step]]
+            visited[self.settled[step]] = 1
+            for r in range(self.relax_ptr[step], self.relax_ptr[step + 1]):
+                v = self.relax_node[r]
+                dist[v] = self.relax_dist[r]
+                prev[v] = self.relax_pred[r]
+        current = self.settled[k] if k < len(self.settled) else None
+        state = {'current': current, 'side': self.step_side[k] if current is not None else None}
+        for side, suffix in zip(sides, ("", "_rev")):
+            dist, prev, visited = side
+            state['distances' + suffix] = dist
+            state['visited' + suffix] = [bool(x) for x in visited]
+            state['predecessors' + suffix] = [None if p < 0 else p for p in prev]
+        return state
+
+    def _node_index(self):
+        # Relaxations grouped by (side, node) in step order, and the step at
+        # which each node was settled on each side; built on first use
+        if self._by_node is None:
+            counts = np.diff(np.frombuffer(self.relax_ptr, dtype=np.int64))
+            steps = np.repeat(np.arange(len(self.settled), dtype=np.int64), counts)
+            sides = np.frombuffer(self.step_side, dtype=np.int8)[steps].astype(np.int64)
+            keys = sides * self.n + np.frombuffer(self.relax_node, dtype=np.int64)
+            order = np.argsort(keys, kind="stable")
+            ptr = np.searchsorted(keys[order], np.arange(self.sides * self.n + 1))
+            settle = np.full((self.sides, self.n), len(self.settled), dtype=np.int64)
+            settle[np.frombuffer(self.step_side, dtype=np.int8), np.frombuffer(self.settled, dtype=np.int64)] = \
+                np.arange(len(self.settled))
+            sources = [np.flatnonzero(np.asarray(self.snapshots[0][side][0]) == 0).tolist()
+                       for side in range(self.sides)]
+            # Predecessor of each node when it was settled (its final one, or
+            # the latest for unsettled nodes): the last relaxation before then
+            tree = np.array([np.asarray(self.snapshots[0][side][1], dtype=np.int64) for side in range(self.sides)])
+            if len(order):
+                span = len(self.settled) + 1
+                sorted_keys = keys[order] * span + steps[order]
+                settle_keys = np.arange(self.sides * self.n).reshape(self.sides, self.n) * span + settle
+                j = np.searchsorted(sorted_keys, settle_keys) - 1
+                found = j >= ptr[:-1].reshape(self.sides, self.n)
+                preds = np.frombuffer(self.relax_pred, dtype=np.int64)[order[np.maximum(j, 0)]]
+                tree = np.where(found, preds, tree)
+            # plain arrays: single-element lookups on them are much cheaper
+            self._by_node = (_to_array('q', order), _to_array('q', ptr), _to_array('q', steps[order]),
+                             [_to_array('q', row) for row in settle], sources,
+                             [_to_array('q', row) for row in tree])
+        return self._by_node
+
+    def node_state(self, k: int, nodes: List[int], side: int = 0) -> List[Tuple[float, int, bool]]:
+        """``(distance, predecessor, visited)`` of ``nodes`` on one search side
+        before step ``k`` (as in ``trace[k]``; predecessor ``None`` if unset).
+
+        Only the requested nodes are looked up, by binary search in a
+        per-node index, so this costs O(len(nodes) log n) rather than the
+        O(n) of rebuilding the full state.
+        """
+        if not self.recording:
+            raise IndexError("trace was run without step recording")
+        order, ptr, steps, settle, _, _ = self._node_index()
+        init_dist, init_prev, _ = self.snapshots[0][side]
+        out = []
+        for v in nodes:
+            lo, hi = ptr[side * self.n + v], ptr[side * self.n + v + 1]
+            j = bisect_left(steps, k, lo, hi)
+            if j > lo:
+                r = order[j - 1]
+                dist, pred = self.relax_dist[r], self.relax_pred[r]
+            else:
+                dist, pred = init_dist[v], init_prev[v]
+            out.append((dist, None if pred < 0 else pred, settle[side][v] < k))
+        return out
+
+    def frontier(self, k: int, side: int = 0, limit: int = 10, max_steps: int = None) -> List[int]:
+        """Up to ``limit`` nodes reached but not yet settled before step ``k``,
+        most recently relaxed first.
+
+        Scans back over at most ``max_steps`` steps (default ``8 * limit``),
+        so the cost does not grow with the size of the graph.
+        """
+        if not self.recording:
+            raise IndexError("trace was run without step recording")
+        _, _, _, settle, sources, _ = self._node_index()
+        settle = settle[side]
+        max_steps = 8 * limit if max_steps is None else max_steps
+        seen, out = set(), []
+        for step in range(k - 1, max(-1, k - 1 - max_steps), -1):
+            if self.step_side[step] != side:
+                continue
+            for r in range(self.relax_ptr[step + 1] - 1, self.relax_ptr[step] - 1, -1):
+                v = self.relax_node[r]
+                if v in seen:
+                    continue
+                seen.add(v)
+                if settle[v] >= k:
+                    out.append(v)
+                    if len(out) >= limit:
+                        return out
+        # search sources are reached without being relaxed
+        out.extend(v for v in sources[side] if v not in seen and settle[v] >= k)
+        return out[:limit]
+
+    def settled_predecessors(self, side: int = 0) -> array:
+        """Predecessor (-1 if none) each node had on ``side`` when it was
+        settled, or at the end of the search for nodes never settled."""
+        if not self.recording:
+            raise IndexError("trace was run without step recording")
+        return self._node_index()[5][side]
+
+    def settled_path(self, node: int, side: int = 0) -> List[int]:
+        """Node ids from the root of ``side`` to ``node`` through the
+        predecessors nodes had when settled.
+
+        For a node settled at step ``k`` this is its search path at ``k``
+        (settled predecessors do not change), read in O(path length).
+        """
+        tree = self.settled_predecessors(side)
+        path = []
+        while node >= 0 and len(path) <= self.n:
+            path.append(node)
+            node = tree[node]
+        return path[::-1]
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate size of the recorded buffers in bytes."""
+        size = sum(len(a) * a.itemsize for a in (
+            self.settled, self.step_side, self.relax_ptr, self.relax_node,
+            self.relax_dist, self.relax_pred))
+        for snapshot in self.snapshots.values():
+            for dist, prev, visited in snapshot:
+                size += len(dist) * dist.itemsize + len(prev) * prev.itemsize + len(visited)
+        return size
+
+
+def _walk_predecessors(prev, u: int) -> List[int]:
+    # Follow predecessor links from u back to the search root (root first)
+    path = []
+    while u >= 0:
+        path.append(u)
+        u = prev[u]
+    return path[::-1]
+
+
+def _unidirectional_search(graph: SparseGraph, trace: AlgorithmTrace, heuristic=None) -> None:
+    # Heap-based Dijkstra, or A* when a heuristic is given; stops as soon as
+    # the target (if any) is settled
+    n = graph.n
+    start, target = trace.start_index, trace.target_index
+    indptr, indices, weights = graph.indptr, graph.indices, graph.weights
+    dist = [float('inf')] * n
+    prev = array('q', [-1]) * n
+    visited = bytearray(n)
+    dist[start] = 0.0
+    h = heuristic or (lambda v: 0.0)
+    heap = [(h(start), 0.0, start)]
+
+    while heap:
+        _, d, u = heapq.heappop(heap)
+        if visited[u] or d > dist[u]:
+            continue  # stale heap entry
+        trace.begin_step((dist, prev, visited))
+        visited[u] = 1
+
+        relaxed = []
+        for e in range(indptr[u], indptr[u + 1]):
+            v = indices[e]
+            if visited[v]:
+                continue
+            alt = d + weights[e]
+            if alt < dist[v]:
+                dist[v] = alt
+                prev[v] = u
+                heapq.heappush(heap, (alt + h(v), alt, v))
+                relaxed.append((v, alt, u))
+        trace.record(u, relaxed)
+        if u == target:
+            break
+
+    trace.finish((dist, prev, visited))
+    if target is not None and dist[target] < float('inf'):
+        trace.distance = dist[target]
+        trace.path = _walk_predecessors(prev, target)
+
+
+def _bidirectional_search(graph: SparseGraph, trace: AlgorithmTrace) -> None:
+    # Alternate forward search from the start (side 0) and backward search
+    # from the target over reversed edges (side 1); stop once the two
+    # frontiers cannot improve on the best meeting point found so far
+    n = graph.n
+    start, target = trace.start_index, trace.target_index
+    inf = float('inf')
+    graphs = (graph, graph.reversed())
+    dist = ([inf] * n, [inf] * n)
+    prev = (array('q', [-1]) * n, array('q', [-1]) * n)
+    visited = (bytearray(n), bytearray(n))
+    heaps = ([(0.0, start)], [(0.0, target)])
+    dist[0][start] = 0.0
+    dist[1][target] = 0.0
+    best, meet = (0.0, start) if start == target else (inf, -1)
+
+    def top(side):
+        heap = heaps[side]
+        while heap and (visited[side][heap[0][1]] or heap[0][0] > dist[side][heap[0][1]]):
+            heapq.heappop(heap)  # drop stale entries
+        return heap[0][0] if heap else inf
+
+    while True:
+        top_f, top_b = top(0), top(1)
+        if top_f + top_b >= best:
+            break
+        side = 0 if top_f <= top_b else 1
+        other = 1 - side
+        d, u = heapq.heappop(heaps[side])
+        trace.begin_step(*zip(dist, prev, visited))
+        visited[side][u] = 1
+
+        g = graphs[side]
+        relaxed = []
+        for e in range(g.indptr[u], g.indptr[u + 1]):
+            v = g.indices[e]
+            if visited[side][v]:
+                continue
+            alt = d + g.weights[e]
+            if alt < dist[side][v]:
+                dist[side][v] = alt
+                prev[side][v] = u
+                heapq.heappush(heaps[side], (alt, v))
+                relaxed.append((v, alt, u))
+            if dist[side][v] + dist[other][v] < best:
+                best, meet = dist[side][v] + dist[other][v], v
+        trace.record(u, relaxed, side)
+
+    trace.finish(*zip(dist, prev, visited))
+    if meet >= 0:
+        trace.distance = best
+        trace.path = _walk_predecessors(prev[0], meet) + _walk_predecessors(prev[1], meet)[::-1][1:]
+
+
+def shortest_path_search(graph: SparseGraph, start_index: int, target_index: int = None,
+                         mode: str = "dijkstra",
+                         coords: List[Tuple[float, float]] = None,
+                         heuristic_scale: float = 1.0,
+                         record: bool = True) -> AlgorithmTrace:
+    """Run a traced shortest-path search from ``start_index``.
+
+    With a ``target_index`` the search stops once the target is settled and
+    the trace carries the resulting ``path`` and ``distance``. ``mode`` is one
+    of ``SEARCH_MODES``; ``astar`` needs the node ``coords`` (lat, lon) for its
+    haversine heuristic, and both ``astar`` and ``bidirectional`` need a target.
+    For weights other than meters, ``heuristic_scale`` converts meters into
+    weight units (e.g. ``1 / max_speed`` for travel times) so the heuristic
+    stays admissible. ``record=False`` skips the step trace and only keeps
+    the result and the expansion count.
+    """
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"Unknown search mode: {mode}")
+    if mode != "dijkstra" and target_index is None:
+        raise ValueError(f"Search mode '{mode}' requires a target node")
+
+    trace = AlgorithmTrace(graph.n, start_index, target_index, mode, record)
+    with metrics.span("path_search", mode=mode):
+        if mode == "bidirectional":
+            _bidirectional_search(graph, trace)
+        elif mode == "astar":
+            if coords is None:
+                raise ValueError("A* search requires node coordinates")
+            # Edge weights are great-circle segment lengths, so the straight-line
+            # distance to the goal never overestimates the remaining cost
+            h = (distances_to(coords[target_index], coords) * heuristic_scale).tolist()
+            _unidirectional_search(graph, trace, heuristic=h.__getitem__)
+        else:
+            _unidirectional_search(graph, trace)
+    if metrics.is_enabled():
+        metrics.observe("nodes_expanded", trace.expanded, mode=mode)
+        if record:
+            metrics.observe("trace_bytes", trace.nbytes, mode=mode)
+    return trace
+
+
+def dijkstra_trace(graph: SparseGraph, start_index: int) -> AlgorithmTrace:
+    # Full single-source Dijkstra (settles every reachable node)
+    return shortest_path_search(graph, start_index)
+
+
+def build_route_graph(latlon, simplify_tolerance: float = None,
+                      simplify_method: str = "douglas-peucker") -> Dict:
+    """Sparse graph over a route polyline, optionally simplified to
+    ``simplify_tolerance`` meters first.
+
+    Returns ``nodes`` ((N, 2) float64 lat/lon array), ``graph`` and
+    ``source_vertices`` (polyline length before simplification).
+    """
+    latlon = as_latlon_array(latlon)
+    source_vertices = len(latlon)
+    if simplify_tolerance:
+        latlon = latlon[simplify_polyline(latlon, simplify_tolerance, simplify_method)]
+    nodes, graph = build_graph_from_coords(latlon.tolist())
+    return {"nodes": np.asarray(nodes, dtype=np.float64).reshape(-1, 2), "graph": graph,
+            "source_vertices": source_vertices}
+
+
+def search_route_graph(route_graph: Dict, mode: str = "dijkstra", record: bool = True) -> AlgorithmTrace:
+    """Search from the first to the last node of a ``build_route_graph`` result."""
+    coords = route_graph["nodes"].tolist()
+    return shortest_path_search(route_graph["graph"], 0, len(coords) - 1, mode, coords, record=record)
+
+
+def build_route_search(latlon, mode: str = "dijkstra", simplify_tolerance: float = None,
+                       simplify_method: str = "douglas-peucker") -> Dict:
+    """Traced search from the first to the last vertex of a route polyline.
+
+    Returns the ``build_route_graph`` result plus ``trace`` (recorded search
+    in ``mode``) and ``expanded`` (nodes expanded by every search mode, for
+    comparison).
+    """
+    route_graph = build_route_graph(latlon, simplify_tolerance, simplify_method)
+    trace = search_route_graph(route_graph, mode)
+    expanded = {mode: trace.expanded}
+    for other in SEARCH_MODES:
+        if other not in expanded:
+            expanded[other] = search_route_graph(route_graph, other, record=False).expanded
+    return dict(route_graph, trace=trace, expanded=expanded)
@@ -0,0 +1,259 @@
+"""Offline routing over a road network file, answering ORS-style requests."""
+import csv
+import json
+import math
+import os
+import threading
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from .config import DEFAULT_ROAD_SPEED_KPH, PROFILE_SPEEDS_KPH, ROAD_NETWORK_PATH, SNAP_GRID_DEG
+from .geometry import EARTH_RADIUS_M, distances_to, haversine_pairs, nearest_index
+from .graph import SparseGraph, shortest_path_search
+
+
+class GridIndex:
+    """Uniform grid bucketing (lat, lon) points for nearest-point queries."""
+
+    def __init__(self, latlon: np.ndarray, cell_deg: float = SNAP_GRID_DEG):
+        self.latlon = latlon
+        self.cell_deg = cell_deg
+        cells = np.floor(latlon / cell_deg).astype(np.int64)
+        order = np.lexsort((cells[:, 1], cells[:, 0]))
+        self._buckets: Dict[Tuple[int, int], np.ndarray] = {}
+        if len(order):
+            sorted_cells = cells[order]
+            breaks = np.flatnonzero(np.any(np.diff(sorted_cells, axis=0) != 0, axis=1)) + 1
+            for chunk in np.split(order, breaks):
+                self._buckets[tuple(cells[chunk[0]])] = chunk
+
+    # Rings searched around the query cell before falling back to a full scan
+    MAX_RINGS = 32
+
+    @staticmethod
+    def _ring(ci: int, cj: int, r: int):
+        # Cells at Chebyshev distance exactly r from (ci, cj)
+        if r == 0:
+            yield ci, cj
+            return
+        for d in range(-r, r + 1):
+            yield ci + d, cj - r
+            yield ci + d, cj + r
+        for d in range(-r + 1, r):
+            yield ci - r, cj + d
+            yield ci + r, cj + d
+
+    def nearest(self, point: Tuple[float, float]) -> int:
+        """Index of the point closest to ``point`` (lat, lon), or -1 if empty."""
+        if not self._buckets:
+            return -1
+        ci, cj = int(math.floor(point[0] / self.cell_deg)), int(math.floor(point[1] / self.cell_deg))
+        # Meters spanned by one cell in its narrowest (east-west) direction
+        cell_m = math.radians(self.cell_deg) * EARTH_RADIUS_M * max(math.cos(math.radians(point[0])), 1e-6)
+        best, best_d = -1, float('inf')
+        for ring in range(self.MAX_RINGS):
+            # points in this ring or further out are at least (ring - 1) cells away
+            if best >= 0 and (ring - 1) * cell_m > best_d:
+                return best
+            cand = [self._buckets[c] for c in self._ring(ci, cj, ring) if c in self._buckets]
+            if cand:
+                idx = np.concatenate(cand)
+                d = distances_to(point, self.latlon[idx])
+                k = int(np.argmin(d))
+                if d[k] < best_d:
+                    best, best_d = int(idx[k]), float(d[k])
+        # far from every point: a full scan is cheaper than more rings
+        return nearest_index(point, self.latlon)
+
+
+def _parse_oneway(value) -> bool:
+    return str(value).strip().lower() in ("1", "true", "yes", "t", "y")
+
+
+class RoadNetwork:
+    """Offline road network answering ``get_route``-style requests.
+
+    Nodes are the distinct (lat, lon) vertices of the input; every road
+    segment becomes an edge with a length, speed, one-way flag and name.
+    Per-profile CSR graphs weighted by travel time are built on first use.
+    ``path`` is the file the network was loaded from (``None`` if built in
+    memory).
+    """
+
+    def __init__(self, coords: np.ndarray, src: np.ndarray, dst: np.ndarray,
+                 speed_kph: np.ndarray, oneway: np.ndarray, name_ids: np.ndarray, names: List[str],
+                 path: str = None):
+        self.path = path
+        self.coords = coords
+        self.src, self.dst = src, dst
+        self.length_m = haversine_pairs(coords[src], coords[dst])
+        self.speed_kph = speed_kph
+        self.oneway = oneway
+        self.name_ids = name_ids
+        self.names = names
+        self.index = GridIndex(coords)
+        self._graphs: Dict[str, SparseGraph] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def num_nodes(self) -> int:
+        return len(self.coords)
+
+    @classmethod
+    def load(cls, path: str) -> "RoadNetwork":
+        """Load a CSV edge list or a GeoJSON file of LineStrings."""
+        node_ids: Dict[Tuple[float, float], int] = {}
+        names: Dict[str, int] = {}
+        edges = []
+
+        def node(lat, lon):
+            key = (round(float(lat), 7), round(float(lon), 7))
+            if key not in node_ids:
+                node_ids[key] = len(node_ids)
+            return node_ids[key]
+
+        def add(a, b, props):
+            speed = props.get("speed_kph") or props.get("maxspeed")
+            name = props.get("name") or ""
+            edges.append((a, b, float(speed) if speed not in (None, "") else DEFAULT_ROAD_SPEED_KPH,
+                          _parse_oneway(props.get("oneway", False)), names.setdefault(name, len(names))))
+
+        if path.lower().endswith((".geojson", ".json")):
+            with open(path, encoding="utf-8") as f:
+                features = json.load(f).get("features", [])
+            for feat in features:
+                geom = feat.get("geometry") or {}
+                props = feat.get("properties") or {}
+                lines = {"LineString": [geom.get("coordinates")],
+                         "MultiLineString": geom.get("coordinates")}.get(geom.get("type"), [])
+                for line in lines:
+                    ids = [node(p[1], p[0]) for p in line]
+                    for a, b in zip(ids, ids[1:]):
+                        if a != b:
+                            add(a, b, props)
+        else:
+            with open(path, newline="", encoding="utf-8") as f:
+                for row in csv.DictReader(f):
+                    a = node(row["from_lat"], row["from_lon"])
+                    b = node(row["to_lat"], row["to_lon"])
+                    if a != b:
+                        add(a, b, row)
+
+        coords = np.array(list(node_ids), dtype=np.float64).reshape(-1, 2)
+        cols = list(zip(*edges)) if edges else [[], [], [], [], []]
+        return cls(coords,
+                   np.array(cols[0], dtype=np.int64), np.array(cols[1], dtype=np.int64),
+                   np.array(cols[2], dtype=np.float64), np.array(cols[3], dtype=bool),
+                   np.array(cols[4], dtype=np.int64),
+                   [n for n, _ in sorted(names.items(), key=lambda kv: kv[1])], path=path)
+
+    def profile_speeds(self, profile: str) -> np.ndarray:
+        """Per-edge travel speed in km/h for a routing profile."""
+        if profile not in PROFILE_SPEEDS_KPH:
+            raise ValueError(f"Unknown profile: {profile}")
+        fixed = PROFILE_SPEEDS_KPH[profile]
+        if fixed is None:
+            return self.speed_kph
+        return np.minimum(self.speed_kph, fixed) if profile != "foot-walking" else np.full_like(self.speed_kph, fixed)
+
+    def graph(self, profile: str) -> SparseGraph:
+        """CSR graph weighted by travel seconds; pedestrians ignore one-way flags."""
+        with self._lock:
+            if profile not in self._graphs:
+                seconds = self.length_m / (self.profile_speeds(profile) / 3.6)
+                edge_ids = np.arange(len(self.src))
+                both = ~self.oneway if profile != "foot-walking" else np.ones(len(self.src), dtype=bool)
+                src = np.concatenate([self.src, self.dst[both]])
+                dst = np.concatenate([self.dst, self.src[both]])
+                self._graphs[profile] = SparseGraph.from_arrays(
+                    self.num_nodes, src, dst,
+                    np.concatenate([seconds, seconds[both]]),
+                    np.concatenate([edge_ids, edge_ids[both]]))
+            return self._graphs[profile]
+
+    def _path_edges(self, graph: SparseGraph, path: List[int]) -> List[int]:
+        # Cheapest CSR edge for each consecutive pair of the path
+        edges = []
+        for u, v in zip(path, path[1:]):
+            best, best_w = -1, float('inf')
+            for e in range(graph.indptr[u], graph.indptr[u + 1]):
+                if graph.indices[e] == v and graph.weights[e] < best_w:
+                    best, best_w = graph.edge_ids[e], graph.weights[e]
+            edges.append(best)
+        return edges
+
+    def _steps(self, path: List[int], edges: List[int], seconds: np.ndarray) -> List[Dict]:
+        # Group consecutive edges on the same road into ORS-style steps
+        steps = []
+        bearings = []
+        for u, v in zip(path, path[1:]):
+            (lat1, lon1), (lat2, lon2) = np.radians(self.coords[u]), np.radians(self.coords[v])
+            y = math.sin(lon2 - lon1) * math.cos(lat2)
+            x = math.cos(lat1) * math.sin(lat2) - math.sin(lat1) * math.cos(lat2) * math.cos(lon2 - lon1)
+            bearings.append(math.degrees(math.atan2(y, x)))
+        for i, e in enumerate(edges):
+            name = self.names[self.name_ids[e]]
+            if steps and steps[-1]["name"] == name:
+                step = steps[-1]
+            else:
+                if not steps:
+                    instruction = f"Head along {name}" if name else "Head out"
+                else:
+                    turn = (bearings[i] - bearings[i - 1] + 180) % 360 - 180
+                    onto = f" onto {name}" if name else ""
+                    instruction = ("Turn right" if turn > 30 else "Turn left" if turn < -30 else "Continue") + onto
+                step = {"instruction": instruction, "name": name, "distance": 0.0,
+                        "duration": 0.0, "way_points": [i, i]}
+                steps.append(step)
+            step["distance"] += float(self.length_m[e])
+            step["duration"] += float(seconds[i])
+            step["way_points"][1] = i + 1
+        steps.append({"instruction": "Arrive at your destination", "name": "", "distance": 0.0,
+                      "duration": 0.0, "way_points": [len(path) - 1, len(path) - 1]})
+        return steps
+
+    def route(self, start_coords: Tuple[float, float], end_coords: Tuple[float, float],
+              profile: str = "driving-car") -> Dict:
+        """Fastest route between two (lat, lon) points as an ORS-style GeoJSON
+        FeatureCollection (empty if the snapped nodes are not connected)."""
+        graph = self.graph(profile)
+        start, end = self.index.nearest(start_coords), self.index.nearest(end_coords)
+        if start < 0 or end < 0:
+            return {"type": "FeatureCollection", "features": []}
+        max_mps = float(self.profile_speeds(profile).max()) / 3.6 if len(self.src) else 1.0
+        trace = shortest_path_search(graph, start, end, "astar", self.coords,
+                                     heuristic_scale=1.0 / max_mps, record=False)
+        if not trace.path:
+            return {"type": "FeatureCollection", "features": []}
+        path = trace.path
+        edges = self._path_edges(graph, path)
+        seconds = self.length_m[edges] / (self.profile_speeds(profile)[edges] / 3.6)
+        distance = float(self.length_m[edges].sum()) if edges else 0.0
+        summary = {"distance": distance, "duration": float(seconds.sum())}
+        feature = {
+            "type": "Feature",
+            "geometry": {"type": "LineString",
+                         "coordinates": [[float(lon), float(lat)] for lat, lon in self.coords[path]]},
+            "properties": {
+                "segments": [dict(summary, steps=self._steps(path, edges, seconds))],
+                "summary": summary,
+                "way_points": [0, len(path) - 1],
+                "expanded_nodes": trace.expanded,
+            },
+        }
+        return {"type": "FeatureCollection", "features": [feature]}
+
+
+@lru_cache(maxsize=None)
+def load_road_network(path: str) -> RoadNetwork:
+    """Road network loaded from ``path``, cached for the life of the process."""
+    return RoadNetwork.load(path)
+
+
+def get_road_network():
+    """Process-wide road network from ``ROAD_NETWORK_PATH``; ``None`` if the file is missing."""
+    if not ROAD_NETWORK_PATH or not os.path.exists(ROAD_NETWORK_PATH):
+        return None
+    return load_road_network(ROAD_NETWORK_PATH)
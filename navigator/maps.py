@@ -0,0 +1,224 @@
+"""Folium map pages for routes and recorded path searches.
+
+Each ``render_*`` function returns a complete HTML page, built once per
+route or search so front-ends can cache it and send it unchanged. Route
+geometry is drawn at the levels of detail the map's zoom range uses (see
+``map_lods``) with ``ZoomLevelSwitcher`` showing one level at a time, and a
+search is replayed in the browser by ``TracePlayer``.
+"""
+import json
+from typing import Dict, List, Sequence, Tuple
+
+import folium
+from branca.element import MacroElement
+from jinja2 import Template
+
+from .geometry import MAP_MAX_ZOOM, map_lods
+from .graph import AlgorithmTrace, SparseGraph
+from .trace_view import playback_frames
+
+ROUTE_COLORS = ("blue", "red", "green")
+
+
+class ZoomLevelSwitcher(MacroElement):
+    """Shows exactly one of several layers depending on the map zoom.
+
+    ``layers[i]`` is displayed at zoom levels where ``zoom_to_layer[z] == i``.
+    """
+
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        (function() {
+            var map = {{ this._parent.get_name() }};
+            var layers = [{% for layer in this.layers %}{{ layer.get_name() }}{% if not loop.last %}, {% endif %}{% endfor %}];
+            var zoomToLayer = {{ this.zoom_to_layer }};
+            function update() {
+                var z = Math.max(0, Math.min(zoomToLayer.length - 1, Math.round(map.getZoom())));
+                layers.forEach(function(layer, i) {
+                    if (i === zoomToLayer[z]) { if (!map.hasLayer(layer)) { map.addLayer(layer); } }
+                    else if (map.hasLayer(layer)) { map.removeLayer(layer); }
+                });
+            }
+            map.on('zoomend', update);
+            update();
+        })();
+        {% endmacro %}
+    """)
+
+    def __init__(self, layers: List, zoom_to_layer: List[int]):
+        super().__init__()
+        self._name = "ZoomLevelSwitcher"
+        self.layers = layers
+        self.zoom_to_layer = json.dumps(zoom_to_layer)
+
+
+class TracePlayer(MacroElement):
+    """Client-side step player for a recorded path search.
+
+    Node markers and edges are drawn once as single canvas layers from
+    ``frames`` (see ``playback_frames``); moving between steps only restyles
+    the nodes settled in between and redraws the current path, so stepping
+    and autoplay run in the browser without re-rendering the map.
+    """
+
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        (function() {
+            var map = {{ this._parent.get_name() }};
+            var data = {{ this.frames }};
+            var colors = ["gray", "blue", "orange"];
+            var n = data.coords.length, last = data.settled.length;
+            var renderer = L.canvas({padding: 0.5});
+            // step at which each node is settled on each side (last = never)
+            var settleAt = data.tree.map(function() { var a = new Int32Array(n); a.fill(last); return a; });
+            data.settled.forEach(function(v, i) { settleAt[data.sides ? data.sides[i] : 0][v] = i; });
+            L.polyline(data.edges.map(function(e) { return [data.coords[e[0]], data.coords[e[1]]]; }),
+                       {color: "lightgray", weight: 2, renderer: renderer}).addTo(map);
+            var markers = data.coords.map(function(c) {
+                return L.circleMarker(c, {radius: 4, color: colors[0], fill: true, renderer: renderer});
+            });
+            L.layerGroup(markers).addTo(map);
+            var path = L.polyline([], {color: "red", weight: 4, opacity: 0.8}).addTo(map);
+
+            var control = L.control({position: "bottomleft"});
+            var ui = {};
+            control.onAdd = function() {
+                var div = L.DomUtil.create("div", "leaflet-bar");
+                div.style.cssText = "background:white;padding:4px 6px;font:12px sans-serif";
+                div.innerHTML = '<button data-d="-1000000">⏮</button><button data-d="-1">◀</button>' +
+                    '<button data-play="1">▶</button><button data-d="1">▶|</button><button data-d="1000000">⏭</button> ' +
+                    '<input type="range" min="0" max="' + last + '" style="width:160px;vertical-align:middle"> ' +
+                    '<select>' + [1, 5, 25, 100, 500].map(function(r) {
+                        return '<option value="' + r + '"' + (r === 5 ? " selected" : "") + '>' + r + ' steps/s</option>';
+                    }).join("") + '</select> <span></span>';
+                ui.slider = div.querySelector("input");
+                ui.speed = div.querySelector("select");
+                ui.label = div.querySelector("span");
+                ui.play = div.querySelector("[data-play]");
+                div.querySelectorAll("[data-d]").forEach(function(b) {
+                    b.onclick = function() { stop(); seek(shown + Number(b.dataset.d)); report(); };
+                });
+                ui.play.onclick = function() { if (timer) { stop(); report(); } else { play(); } };
+                ui.slider.oninput = function() { stop(); seek(Number(ui.slider.value)); };
+                ui.slider.onchange = report;
+                L.DomEvent.disableClickPropagation(div);
+                return div;
+            };
+            control.addTo(map);
+
+            function colorAt(v, k) {
+                if (settleAt[0][v] < k) { return colors[1]; }
+                return settleAt.length > 1 && settleAt[1][v] < k ? colors[2] : colors[0];
+            }
+            var shown = 0;
+            function seek(k) {
+                k = Math.max(0, Math.min(last, k));
+                // only nodes settled between the old and new step change style
+                for (var i = Math.min(shown, k); i < Math.max(shown, k); i++) {
+                    var v = data.settled[i];
+                    markers[v].setStyle({color: colorAt(v, k)});
+                }
+                shown = k;
+                var latlngs = [];
+                if (k < last) {
+                    var tree = data.tree[data.sides ? data.sides[k] : 0];
+                    for (var u = data.settled[k]; u >= 0 && latlngs.length <= n; u = tree[u]) {
+                        latlngs.push(data.coords[u]);
+                    }
+                }
+                path.setLatLngs(latlngs.reverse());
+                ui.slider.value = k;
+                ui.label.textContent = "Step " + k + " of " + last;
+            }
+            var timer = null, carry = 0, before = 0;
+            function frame(now) {
+                carry += (now - before) * Number(ui.speed.value) / 1000;
+                before = now;
+                var advance = Math.floor(carry);
+                carry -= advance;
+                if (advance) { seek(shown + advance); }
+                timer = shown < last ? requestAnimationFrame(frame) : null;
+                if (!timer) { ui.play.textContent = "▶"; report(); }
+            }
+            function play() {
+                if (shown >= last) { seek(0); }
+                carry = 0;
+                before = performance.now();
+                ui.play.textContent = "⏸";
+                timer = requestAnimationFrame(frame);
+            }
+            function stop() {
+                if (timer) { cancelAnimationFrame(timer); }
+                timer = null;
+                ui.play.textContent = "▶";
+            }
+            // The host page (components/trace_player) keeps this step and
+            // the app's step in sync: it sends the app's step as traceSeek
+            // and gets the step the player is left at as traceStep
+            function report() { window.parent.postMessage({traceStep: shown}, "*"); }
+            window.addEventListener("message", function(event) {
+                if (event.data && typeof event.data.traceSeek === "number") {
+                    stop();
+                    seek(event.data.traceSeek);
+                }
+            });
+            seek(0);
+            window.parent.postMessage({traceReady: true}, "*");
+        })();
+        {% endmacro %}
+    """)
+
+    def __init__(self, frames: dict):
+        super().__init__()
+        self._name = "TracePlayer"
+        self.frames = json.dumps(frames, separators=(",", ":"))
+
+
+def _page(m: folium.Map) -> str:
+    return folium.Figure().add_child(m).render()
+
+
+def _lod_groups(m: folium.Map, levels: List[Dict], lat: float) -> Tuple[List[int], List[folium.FeatureGroup]]:
+    # one layer per level the zoom range uses, switched by the zoom
+    used, zoom_to_layer = map_lods(levels, lat)
+    groups = [folium.FeatureGroup(name=f"{levels[i]['tolerance_m']:g} m detail", control=False) for i in used]
+    for group in groups:
+        group.add_to(m)
+    ZoomLevelSwitcher(groups, zoom_to_layer).add_to(m)
+    return used, groups
+
+
+def render_route_map(start: Sequence[float], end: Sequence[float], route_levels: List[List[Dict]]) -> str:
+    """Page showing each route's levels (see ``build_route_lods``) between
+    ``start`` and ``end``; the zoom levels are chosen from the first route."""
+    m = folium.Map(location=[start[0], start[1]], zoom_start=12, max_zoom=MAP_MAX_ZOOM)
+    folium.Marker([start[0], start[1]], popup="Start", icon=folium.Icon(color='green', icon='info-sign')).add_to(m)
+    folium.Marker([end[0], end[1]], popup="Destination", icon=folium.Icon(color='red', icon='info-sign')).add_to(m)
+    used, groups = _lod_groups(m, route_levels[0], start[0])
+    for idx, levels in enumerate(route_levels):
+        for group, i in zip(groups, used):
+            folium.PolyLine(levels[i]["coords"], weight=4, color=ROUTE_COLORS[idx % len(ROUTE_COLORS)],
+                            opacity=0.8).add_to(group)
+    return _page(m)
+
+
+def render_trace_map(nodes: List, graph: SparseGraph, trace: AlgorithmTrace) -> str:
+    """Page with a ``TracePlayer`` for ``trace``; it does not depend on the
+    step shown, so it can be sent unchanged while the user steps through."""
+    m = folium.Map(location=[nodes[0][0], nodes[0][1]], zoom_start=13)
+    TracePlayer(playback_frames(nodes, graph, trace)).add_to(m)
+    return _page(m)
+
+
+def render_path_map(levels: List[Dict], path: List) -> str:
+    """Page showing the route's ``levels`` in gray and the (lat, lon)
+    ``path`` found by a search on top."""
+    m = folium.Map(location=path[0], zoom_start=13, max_zoom=MAP_MAX_ZOOM)
+    used, groups = _lod_groups(m, levels, path[0][0])
+    for group, i in zip(groups, used):
+        folium.PolyLine(levels[i]["coords"], color='lightgray', weight=2).add_to(group)
+    if len(path) > 1:
+        folium.PolyLine(path, color='green', weight=5, opacity=0.9).add_to(m)
+    folium.Marker(path[0], popup='Start', icon=folium.Icon(color='green')).add_to(m)
+    folium.Marker(path[-1], popup='Destination', icon=folium.Icon(color='red')).add_to(m)
+    return _page(m)
@@ -0,0 +1,204 @@
+"""Many-to-many travel time matrices and multi-stop trip ordering."""
+import heapq
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from . import metrics
+from .config import MATRIX_LOCAL_WORKERS, MATRIX_MAX_ELEMENTS, MATRIX_PROCESS_MIN_SOURCES, ROUTE_REQUEST_TIMEOUT
+from .graph import SparseGraph
+from .local_engine import RoadNetwork, get_road_network, load_road_network
+from .ors import get_client
+from .routing import get_route_executor
+
+
+def _one_to_many(graph: SparseGraph, lengths: np.ndarray, source: int,
+                 targets: List[int]) -> Tuple[List[float], List[float]]:
+    # Dijkstra on travel time from one source until every target is settled;
+    # returns (seconds, meters) per target, inf where unreachable
+    inf = float('inf')
+    n = graph.n
+    indptr, indices, weights, edge_ids = graph.indptr, graph.indices, graph.weights, graph.edge_ids
+    lengths = lengths.tolist()
+    dist = [inf] * n
+    meters = [inf] * n
+    done = bytearray(n)
+    remaining = set(targets)
+    dist[source], meters[source] = 0.0, 0.0
+    heap = [(0.0, source)]
+    while heap and remaining:
+        d, u = heapq.heappop(heap)
+        if done[u] or d > dist[u]:
+            continue
+        done[u] = 1
+        remaining.discard(u)
+        for e in range(indptr[u], indptr[u + 1]):
+            v = indices[e]
+            alt = d + weights[e]
+            if alt < dist[v]:
+                dist[v] = alt
+                meters[v] = meters[u] + lengths[edge_ids[e]]
+                heapq.heappush(heap, (alt, v))
+    return [dist[t] for t in targets], [meters[t] for t in targets]
+
+
+# Per-process state of the local matrix workers, set by _init_matrix_worker
+_worker_graph = None
+_worker_lengths = None
+
+
+def _init_matrix_worker(path: str, profile: str) -> None:
+    # Workers are spawned, not forked (forking a process that runs threads,
+    # such as Streamlit's, can deadlock), so each one parses the file once
+    global _worker_graph, _worker_lengths
+    network = load_road_network(path)
+    _worker_graph, _worker_lengths = network.graph(profile), network.length_m
+
+
+def _worker_one_to_many(source: int, targets: List[int]) -> Tuple[List[float], List[float]]:
+    return _one_to_many(_worker_graph, _worker_lengths, source, targets)
+
+
+@lru_cache(maxsize=None)
+def get_matrix_pool(path: str, profile: str) -> ProcessPoolExecutor:
+    """Process-wide worker pool holding the ``profile`` graph of the road
+    network at ``path``; spawned on first use and reused by later matrices."""
+    return ProcessPoolExecutor(max_workers=MATRIX_LOCAL_WORKERS, mp_context=multiprocessing.get_context("spawn"),
+                               initializer=_init_matrix_worker, initargs=(path, profile))
+
+
+def _local_matrix(network: RoadNetwork, sources, destinations, profile: str) -> Dict:
+    # The searches are pure Python, so threads would serialize on the GIL;
+    # large matrices of a network loaded from a file are spread over the
+    # worker processes of get_matrix_pool instead, small ones run in-process
+    src_nodes = [network.index.nearest(p) for p in sources]
+    dst_nodes = [network.index.nearest(p) for p in destinations]
+    durations = np.full((len(src_nodes), len(dst_nodes)), np.inf)
+    distances = np.full_like(durations, np.inf)
+    if network.path and len(src_nodes) >= MATRIX_PROCESS_MIN_SOURCES and MATRIX_LOCAL_WORKERS > 1:
+        try:
+            rows = get_matrix_pool(network.path, profile).map(
+                _worker_one_to_many, src_nodes, [dst_nodes] * len(src_nodes),
+                chunksize=max(1, len(src_nodes) // (MATRIX_LOCAL_WORKERS * 4)))
+            for i, (secs, dists) in enumerate(rows):
+                durations[i], distances[i] = secs, dists
+            return {"durations": durations, "distances": distances}
+        except BrokenProcessPool:
+            # a worker died: start a new pool next time, answer in-process now
+            get_matrix_pool.cache_clear()
+    graph = network.graph(profile)
+    for i, s in enumerate(src_nodes):
+        durations[i], distances[i] = _one_to_many(graph, network.length_m, s, dst_nodes)
+    return {"durations": durations, "distances": distances}
+
+
+def _ors_matrix_block(sources, destinations, profile: str) -> Tuple[np.ndarray, np.ndarray]:
+    locations = [[lon, lat] for lat, lon in list(sources) + list(destinations)]
+    response = get_client().distance_matrix(
+        locations=locations,
+        sources=list(range(len(sources))),
+        destinations=list(range(len(sources), len(locations))),
+        profile=profile,
+        metrics=["distance", "duration"],
+    )
+    def grid(key):
+        # unreachable pairs come back as null
+        return np.array([[np.inf if v is None else v for v in row] for row in response[key]], dtype=np.float64)
+    return grid("durations"), grid("distances")
+
+
+def _ors_matrix(sources, destinations, profile: str) -> Dict:
+    # Tile the matrix into blocks that fit MATRIX_MAX_ELEMENTS and fetch them concurrently
+    cols = min(len(destinations), MATRIX_MAX_ELEMENTS)
+    rows = max(1, MATRIX_MAX_ELEMENTS // max(cols, 1))
+    durations = np.full((len(sources), len(destinations)), np.inf)
+    distances = np.full_like(durations, np.inf)
+    executor = get_route_executor()
+    blocks = []
+    for r0 in range(0, len(sources), rows):
+        for c0 in range(0, len(destinations), cols):
+            block_src, block_dst = sources[r0:r0 + rows], destinations[c0:c0 + cols]
+            blocks.append((r0, c0, executor.submit(_ors_matrix_block, block_src, block_dst, profile)))
+    for r0, c0, future in blocks:
+        dur, dist = future.result(timeout=ROUTE_REQUEST_TIMEOUT * 2)
+        durations[r0:r0 + dur.shape[0], c0:c0 + dur.shape[1]] = dur
+        distances[r0:r0 + dist.shape[0], c0:c0 + dist.shape[1]] = dist
+    return {"durations": durations, "distances": distances}
+
+
+def distance_matrix(sources: List[Tuple[float, float]], destinations: List[Tuple[float, float]] = None,
+                    profile: str = "driving-car", backend: str = "ors") -> Dict:
+    """Travel times and distances between every source and destination.
+
+    Points are (lat, lon); ``destinations`` defaults to ``sources``. Returns
+    ``{"durations": seconds, "distances": meters}`` as (N, M) arrays with
+    ``inf`` for unreachable pairs. The ``"ors"`` backend uses the ORS matrix
+    endpoint in as few requests as its size limit allows; ``"local"`` runs
+    one-to-many searches over the offline road network.
+    """
+    sources = [tuple(p) for p in sources]
+    destinations = sources if destinations is None else [tuple(p) for p in destinations]
+    if not sources or not destinations:
+        empty = np.zeros((len(sources), len(destinations)))
+        return {"durations": empty, "distances": empty.copy()}
+    metrics.observe("matrix_elements", len(sources) * len(destinations), backend=backend)
+    with metrics.span("distance_matrix", backend=backend):
+        if backend == "local":
+            network = get_road_network()
+            if network is None:
+                raise RuntimeError("No local road network is configured (set NAVIGATOR_ROAD_NETWORK).")
+            return _local_matrix(network, sources, destinations, profile)
+        return _ors_matrix(sources, destinations, profile)
+
+
+def _tour_cost(cost: np.ndarray, tour: List[int]) -> float:
+    return float(sum(cost[a, b] for a, b in zip(tour, tour[1:])))
+
+
+def optimize_trip(cost: np.ndarray, start: int = 0, round_trip: bool = False) -> List[int]:
+    """Visiting order over all stops of a square ``cost`` matrix.
+
+    Builds a nearest-neighbour tour from ``start`` and improves it with
+    2-opt moves. With ``round_trip`` the tour returns to ``start`` (the
+    start index is repeated at the end).
+    """
+    n = len(cost)
+    if n == 0:
+        return []
+    cost = np.where(np.isfinite(cost), cost, np.nanmax(np.where(np.isfinite(cost), cost, 0)) * 10 + 1)
+    tour = [start]
+    unvisited = set(range(n)) - {start}
+    while unvisited:
+        last = tour[-1]
+        nxt = min(unvisited, key=lambda j: cost[last, j])
+        tour.append(nxt)
+        unvisited.remove(nxt)
+    if round_trip:
+        tour.append(start)
+
+    symmetric = np.allclose(cost, cost.T)
+    last_movable = len(tour) - 1 if round_trip else len(tour)
+    improved = True
+    while improved:
+        improved = False
+        for i in range(1, last_movable - 1):
+            for j in range(i + 1, last_movable):
+                if symmetric:
+                    # only the two edges around the reversed segment change
+                    a, b = tour[i - 1], tour[i]
+                    c = tour[j]
+                    d = tour[j + 1] if j + 1 < len(tour) else None
+                    before = cost[a, b] + (cost[c, d] if d is not None else 0.0)
+                    after = cost[a, c] + (cost[b, d] if d is not None else 0.0)
+                    better = after < before - 1e-9
+                else:
+                    candidate = tour[:i] + tour[i:j + 1][::-1] + tour[j + 1:]
+                    better = _tour_cost(cost, candidate) < _tour_cost(cost, tour) - 1e-9
+                if better:
+                    tour[i:j + 1] = tour[i:j + 1][::-1]
+                    improved = True
+    return tour
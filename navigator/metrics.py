@@ -0,0 +1,213 @@
+"""Lightweight stage timings, counters and payload sizes.
+
+Instrumentation is off unless ``NAVIGATOR_METRICS`` is set or ``enable()``
+is called. While off, ``span`` returns a shared no-op context manager and
+``count``/``observe`` return after one flag check, so instrumented code
+pays next to nothing.
+
+Aggregates are kept per (name, labels) and can be exported as JSON lines
+or in the Prometheus text format; with ``NAVIGATOR_METRICS_LOG`` every
+individual event is also appended to a JSONL file.
+"""
+import json
+import threading
+import time
+from collections import deque
+from typing import Dict, List
+
+from .config import METRICS_ENABLED, METRICS_LOG, METRICS_RECENT_EVENTS
+
+_enabled = METRICS_ENABLED
+_lock = threading.Lock()
+_counters: Dict[tuple, float] = {}
+_spans: Dict[tuple, List[float]] = {}  # key -> [count, total seconds, max seconds]
+_sizes: Dict[tuple, List[float]] = {}  # key -> [count, total, max, last]
+_recent = deque(maxlen=METRICS_RECENT_EVENTS)
+_log_file = None
+
+
+def enable(log_path: str = METRICS_LOG) -> None:
+    """Start recording; events are also appended to ``log_path`` if given."""
+    global _enabled, _log_file
+    with _lock:
+        if log_path and _log_file is None:
+            _log_file = open(log_path, "a", encoding="utf-8")
+        _enabled = True
+
+
+def disable() -> None:
+    global _enabled
+    _enabled = False
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def reset() -> None:
+    """Drop all recorded values."""
+    with _lock:
+        _counters.clear()
+        _spans.clear()
+        _sizes.clear()
+        _recent.clear()
+
+
+def _key(name: str, labels: Dict) -> tuple:
+    return (name,) + tuple(sorted(labels.items())) if labels else (name,)
+
+
+def _event(kind: str, name: str, value: float, labels: Dict) -> None:
+    # caller holds the lock
+    event = {"ts": time.time(), "type": kind, "name": name, "value": value}
+    if labels:
+        event["labels"] = labels
+    _recent.append(event)
+    if _log_file is not None:
+        _log_file.write(json.dumps(event) + "\n")
+        _log_file.flush()
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("name", "labels", "started")
+
+    def __init__(self, name: str, labels: Dict):
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.started
+        key = _key(self.name, self.labels)
+        with _lock:
+            agg = _spans.get(key)
+            if agg is None:
+                agg = _spans[key] = [0, 0.0, 0.0]
+            agg[0] += 1
+            agg[1] += elapsed
+            agg[2] = max(agg[2], elapsed)
+            if exc_type is not None:
+                errors = _key(self.name + "_errors", self.labels)
+                _counters[errors] = _counters.get(errors, 0) + 1
+            _event("span", self.name, elapsed, self.labels)
+        return False
+
+
+def span(name: str, **labels):
+    """Context manager timing one stage, e.g. ``with span("render_map"):``.
+
+    Exceptions raised inside also increment ``<name>_errors``.
+    """
+    if not _enabled:
+        return _NULL_SPAN
+    return _Span(name, labels)
+
+
+def count(name: str, value: float = 1, **labels) -> None:
+    """Add ``value`` to a counter (upstream calls, cache hits, errors...)."""
+    if not _enabled:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def observe(name: str, value: float, **labels) -> None:
+    """Record a payload size (vertices, bytes...) of the current run."""
+    if not _enabled:
+        return
+    key = _key(name, labels)
+    with _lock:
+        agg = _sizes.get(key)
+        if agg is None:
+            agg = _sizes[key] = [0, 0.0, 0.0, 0.0]
+        agg[0] += 1
+        agg[1] += value
+        agg[2] = max(agg[2], value)
+        agg[3] = value
+        _event("size", name, value, labels)
+
+
+def snapshot() -> List[Dict]:
+    """Current aggregates, one dict per metric and label set."""
+    rows = []
+    with _lock:
+        for key, value in _counters.items():
+            rows.append({"type": "counter", "name": key[0], "labels": dict(key[1:]), "value": value})
+        for key, (n, total, peak) in _spans.items():
+            rows.append({"type": "span", "name": key[0], "labels": dict(key[1:]), "count": n,
+                         "total_s": total, "mean_s": total / n, "max_s": peak})
+        for key, (n, total, peak, last) in _sizes.items():
+            rows.append({"type": "size", "name": key[0], "labels": dict(key[1:]), "count": n,
+                         "total": total, "max": peak, "last": last})
+    return rows
+
+
+def recent_events() -> List[Dict]:
+    """The last ``METRICS_RECENT_EVENTS`` spans and sizes, oldest first."""
+    with _lock:
+        return list(_recent)
+
+
+def to_jsonl() -> str:
+    """Aggregates as JSON lines."""
+    return "".join(json.dumps(row) + "\n" for row in snapshot())
+
+
+def _prom_labels(labels: Dict) -> str:
+    if not labels:
+        return ""
+    def escape(value):
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{escape(v)}"' for k, v in sorted(labels.items())) + "}"
+
+
+def to_prometheus(prefix: str = "navigator") -> str:
+    """Aggregates in the Prometheus text exposition format.
+
+    Counters become ``<prefix>_<name>_total``, spans summaries in seconds
+    (``_seconds_count``/``_seconds_sum``) and sizes summaries with a
+    ``_max`` gauge.
+    """
+    by_name: Dict[tuple, List[Dict]] = {}
+    for row in snapshot():
+        by_name.setdefault((row["type"], row["name"]), []).append(row)
+    lines = []
+    for (kind, name), rows in sorted(by_name.items()):
+        if kind == "counter":
+            metric = f"{prefix}_{name}_total"
+            lines.append(f"# TYPE {metric} counter")
+            lines.extend(f"{metric}{_prom_labels(r['labels'])} {r['value']:g}" for r in rows)
+        elif kind == "span":
+            metric = f"{prefix}_{name}_seconds"
+            lines.append(f"# TYPE {metric} summary")
+            for r in rows:
+                labels = _prom_labels(r["labels"])
+                lines.append(f"{metric}_count{labels} {r['count']}")
+                lines.append(f"{metric}_sum{labels} {r['total_s']:.6f}")
+            lines.append(f"# TYPE {metric}_max gauge")
+            lines.extend(f"{metric}_max{_prom_labels(r['labels'])} {r['max_s']:.6f}" for r in rows)
+        else:
+            metric = f"{prefix}_{name}"
+            lines.append(f"# TYPE {metric} summary")
+            for r in rows:
+                labels = _prom_labels(r["labels"])
+                lines.append(f"{metric}_count{labels} {r['count']}")
+                lines.append(f"{metric}_sum{labels} {r['total']:g}")
+            lines.append(f"# TYPE {metric}_max gauge")
+            lines.extend(f"{metric}_max{_prom_labels(r['labels'])} {r['max']:g}" for r in rows)
+    return "\n".join(lines) + "\n"
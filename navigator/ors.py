@@ -0,0 +1,249 @@
+"""Shared OpenRouteService client.
+
+One ``ORSClient`` per process wraps ``openrouteservice.Client`` with a
+pooled HTTP session, client-side rate limiting, jittered retries and
+coalescing of identical in-flight requests. ``openrouteservice`` is
+imported on first use, so code that only needs the offline parts of the
+package never loads it.
+"""
+import json
+import random
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict
+
+from . import metrics
+from .config import (API_KEY, ORS_BASE_URL, ORS_MAX_QUEUE_WAIT, ORS_MAX_RETRIES, ORS_POOL_SIZE,
+                     ORS_RATE_LIMITS, ORS_RETRY_BASE_DELAY, ROUTE_REQUEST_TIMEOUT)
+
+# HTTP statuses worth retrying after a pause
+RETRIABLE_STATUSES = {429, 502, 503, 504}
+
+# openrouteservice.Client retries a 503 by itself until its retry_timeout
+# runs out; with this (seconds) its first retry raises Timeout at once, so
+# every retry goes back through ORSClient and waits for quota
+LIBRARY_RETRY_TIMEOUT = 0.001
+
+
+class RateLimitExceeded(Exception):
+    """A request would have waited longer than ``ORS_MAX_QUEUE_WAIT`` for its quota."""
+
+
+class TokenBucket:
+    """Bucket of up to ``capacity`` tokens refilled at ``rate`` per second.
+
+    Tokens can be reserved ahead of time (the count goes negative), which
+    makes later callers wait proportionally longer. Not thread-safe on its
+    own; ``RateLimiter`` serializes access.
+    """
+
+    def __init__(self, capacity: float, rate: float):
+        self.capacity = float(capacity)
+        self.rate = float(rate)
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def wait_time(self, now: float) -> float:
+        """Seconds from ``now`` until the next token is due."""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self) -> None:
+        self.tokens -= 1
+
+
+class RateLimiter:
+    """Per-minute and per-day quota of one ORS endpoint group.
+
+    ``acquire`` reserves a token in both buckets and sleeps until the
+    reservation is due, so queued callers are served in arrival order.
+    """
+
+    def __init__(self, per_minute: int, per_day: int):
+        self.minute = TokenBucket(per_minute, per_minute / 60.0)
+        self.day = TokenBucket(per_day, per_day / 86400.0)
+        self._lock = threading.Lock()
+        self.waiting = 0
+        self.acquired = 0
+        self.rejected = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def acquire(self, max_wait: float = ORS_MAX_QUEUE_WAIT) -> float:
+        """Block until a request may be sent; returns the seconds waited.
+
+        Raises ``RateLimitExceeded`` without consuming quota if the wait
+        would exceed ``max_wait``.
+        """
+        with self._lock:
+            now = time.monotonic()
+            wait = max(self.minute.wait_time(now), self.day.wait_time(now))
+            if wait > max_wait:
+                self.rejected += 1
+                raise RateLimitExceeded(f"ORS rate limit reached; next request slot in {wait:.0f}s")
+            self.minute.take()
+            self.day.take()
+            self.acquired += 1
+            self.wait_total += wait
+            self.wait_max = max(self.wait_max, wait)
+            if wait > 0:
+                self.waiting += 1
+        if wait > 0:
+            time.sleep(wait)
+            with self._lock:
+                self.waiting -= 1
+        return wait
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "waiting": self.waiting,
+                "acquired": self.acquired,
+                "rejected": self.rejected,
+                "wait_avg_s": self.wait_total / self.acquired if self.acquired else 0.0,
+                "wait_max_s": self.wait_max,
+                "minute_tokens": max(0.0, self.minute.tokens),
+                "day_tokens": max(0.0, self.day.tokens),
+            }
+
+
+class ORSClient:
+    """Thread-safe front for ``openrouteservice.Client``, shared by all callers.
+
+    Every call is rate limited by its endpoint group (``ORS_RATE_LIMITS``)
+    and retried with full-jitter exponential backoff on throttling and
+    transient failures. A call identical to one already in flight waits for
+    that upstream request instead of sending its own; the response object is
+    shared, so callers treat it as read-only (as with cached responses).
+    """
+
+    def __init__(self, client, limits: Dict = ORS_RATE_LIMITS):
+        self._client = client
+        self._limiters = {group: RateLimiter(*quota) for group, quota in limits.items()}
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.coalesced = 0
+        self.retries = 0
+        self.errors = 0
+
+    def directions(self, **params):
+        return self._call("directions", "directions", params)
+
+    def pelias_autocomplete(self, **params):
+        return self._call("geocode", "pelias_autocomplete", params)
+
+    def pelias_search(self, **params):
+        return self._call("geocode", "pelias_search", params)
+
+    def distance_matrix(self, **params):
+        return self._call("matrix", "distance_matrix", params)
+
+    def _call(self, group: str, method: str, params: Dict):
+        key = json.dumps([method, params], sort_keys=True, default=str)
+        with self._lock:
+            pending = self._inflight.get(key)
+            if pending is not None:
+                self.coalesced += 1
+                metrics.count("ors_coalesced", endpoint=method)
+            else:
+                future = self._inflight[key] = Future()
+        if pending is not None:
+            return pending.result()
+        try:
+            result = self._send(group, method, params)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._inflight[key]
+
+    def _send(self, group: str, method: str, params: Dict):
+        limiter = self._limiters.get(group)
+        for attempt in range(ORS_MAX_RETRIES + 1):
+            if limiter is not None:
+                metrics.observe("ors_queue_wait_seconds", limiter.acquire(), group=group)
+            with self._lock:
+                self.calls += 1
+            metrics.count("ors_calls", endpoint=method)
+            try:
+                with metrics.span("ors_request", endpoint=method):
+                    return getattr(self._client, method)(**params)
+            except Exception as e:
+                if attempt == ORS_MAX_RETRIES or not is_retriable(e):
+                    with self._lock:
+                        self.errors += 1
+                    metrics.count("ors_errors", endpoint=method)
+                    raise
+            with self._lock:
+                self.retries += 1
+            metrics.count("ors_retries", endpoint=method)
+            time.sleep(random.uniform(0, ORS_RETRY_BASE_DELAY * 2 ** attempt))
+
+    def stats(self) -> Dict:
+        """Upstream calls, coalesced calls, retries and per-group queue state.
+
+        ``queued`` is the number of requests currently waiting for quota and
+        ``in_flight`` the number of distinct upstream requests outstanding.
+        """
+        with self._lock:
+            stats = {"calls": self.calls, "coalesced": self.coalesced, "retries": self.retries,
+                     "errors": self.errors, "in_flight": len(self._inflight)}
+        stats["limits"] = {group: limiter.stats() for group, limiter in self._limiters.items()}
+        stats["queued"] = sum(s["waiting"] for s in stats["limits"].values())
+        return stats
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> ORSClient:
+    """Process-wide ``ORSClient`` over a pooled ``openrouteservice.Client``."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            import openrouteservice
+            import requests
+            # retries are handled by ORSClient, so 429s and 503s must surface at once
+            raw = openrouteservice.Client(key=API_KEY, base_url=ORS_BASE_URL,
+                                          timeout=ROUTE_REQUEST_TIMEOUT, retry_timeout=LIBRARY_RETRY_TIMEOUT,
+                                          retry_over_query_limit=False)
+            session = getattr(raw, "_session", None)
+            if session is not None:
+                adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=ORS_POOL_SIZE)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+            _client = ORSClient(raw)
+        return _client
+
+
+def set_client(client: ORSClient) -> None:
+    """Replace the process-wide client, e.g. with one pointed at a stub server."""
+    global _client
+    with _client_lock:
+        _client = client
+
+
+def is_api_error(exc: Exception) -> bool:
+    """Whether ``exc`` is an error response from the ORS API."""
+    import openrouteservice
+    return isinstance(exc, openrouteservice.exceptions.ApiError)
+
+
+def is_retriable(exc: Exception) -> bool:
+    """Whether a failed ORS request may succeed if sent again."""
+    import openrouteservice
+    import requests
+    if isinstance(exc, openrouteservice.exceptions.ApiError):
+        return exc.status in RETRIABLE_STATUSES
+    # non-JSON error pages (e.g. a proxy's 502) come back as HTTPError
+    if isinstance(exc, openrouteservice.exceptions.HTTPError):
+        return exc.status_code in RETRIABLE_STATUSES
+    return isinstance(exc, (openrouteservice.exceptions.Timeout, requests.exceptions.ConnectionError))
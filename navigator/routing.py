@@ -0,0 +1,214 @@
+"""Directions requests: concurrent alternatives, deduplication and caching.
+
+Every directions request (main route or one alternative variation) is
+cached on its own parameters, so a query whose requests were partly made
+before (e.g. after turning alternatives on) only sends the missing ones.
+"""
+import atexit
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from functools import lru_cache
+from typing import Callable, Dict, Iterator, List, Tuple
+
+from . import metrics
+from .cache import TTLCache
+from .config import (ROUTE_CACHE_DB, ROUTE_CACHE_GRID_DEG, ROUTE_CACHE_MAX_ENTRIES,
+                     ROUTE_CACHE_TTL_SECONDS, ROUTE_REQUEST_TIMEOUT)
+from .geometry import dedupe_routes
+from .local_engine import get_road_network
+from .ors import get_client, is_api_error
+from .store import get_artifact_store
+
+# Start-point shifts used to coax alternative routes out of the directions API
+ALTERNATIVE_START_OFFSET = 0.0005  # About 50 meters
+ALTERNATIVE_VARIATIONS = [
+    ("start shifted north", (0.0, ALTERNATIVE_START_OFFSET)),
+    ("start shifted east", (ALTERNATIVE_START_OFFSET, 0.0)),
+]
+ALTERNATIVE_MODES = {
+    "native": "Ask ORS for alternatives (one request)",
+    "shifted": "Shift the start point (extra requests)",
+}
+# Parameters for ORS's own alternative_routes search
+NATIVE_ALTERNATIVE_ROUTES = {"target_count": 3, "weight_factor": 1.4, "share_factor": 0.6}
+ROUTING_BACKENDS = {"ors": "OpenRouteService (online)", "local": "Local road network (offline)"}
+
+
+class RoutingError(Exception):
+    """No route could be produced for a query."""
+
+
+@lru_cache(maxsize=None)
+def get_route_cache() -> TTLCache:
+    """Process-wide directions cache, persisted to ``ROUTE_CACHE_DB``.
+
+    Answers held in memory are charged to the artifact store's budget (see
+    ``get_artifact_store``), so large route geometries are evicted by size
+    along with the rest of the process's data; ``ROUTE_CACHE_MAX_ENTRIES``
+    bounds the table.
+    """
+    if ROUTE_CACHE_DB:
+        os.makedirs(os.path.dirname(ROUTE_CACHE_DB) or ".", exist_ok=True)
+    cache = TTLCache(ROUTE_CACHE_MAX_ENTRIES, ROUTE_CACHE_TTL_SECONDS,
+                     db_path=ROUTE_CACHE_DB or None, table="routes", store=get_artifact_store())
+    atexit.register(cache.close)
+    return cache
+
+
+def route_cache_key(params: Dict) -> str:
+    """Cache key for one directions request; its (lon, lat) ``coordinates``
+    are snapped to ``ROUTE_CACHE_GRID_DEG``."""
+    def snap(point):
+        return [round(point[0] / ROUTE_CACHE_GRID_DEG), round(point[1] / ROUTE_CACHE_GRID_DEG)]
+    key = dict(params, coordinates=[snap(point) for point in params["coordinates"]])
+    return json.dumps(key, sort_keys=True)
+
+
+@lru_cache(maxsize=None)
+def get_route_executor() -> ThreadPoolExecutor:
+    """Process-wide worker pool for concurrent directions requests."""
+    return ThreadPoolExecutor(max_workers=8, thread_name_prefix="directions")
+
+
+def _timed_directions(params: Dict) -> Tuple[Dict, float]:
+    client = get_client()
+    started = time.perf_counter()
+    try:
+        response = client.directions(**params)
+    except Exception as e:
+        # ORS refuses alternative_routes for some queries (e.g. long
+        # distances); fall back to the plain route rather than failing
+        if not is_api_error(e) or "alternative_routes" not in params:
+            raise
+        params = {k: v for k, v in params.items() if k != "alternative_routes"}
+        response = client.directions(**params)
+    return response, time.perf_counter() - started
+
+
+def fetch_routes(start_coords: Tuple[float, float], end_coords: Tuple[float, float],
+                 profile: str = "driving-car", alternatives: bool = True,
+                 alternatives_mode: str = "shifted") -> Iterator[Dict]:
+    """Request the main route and its variations concurrently.
+
+    With ``alternatives_mode="native"`` a single request asks ORS for
+    alternative routes; ``"shifted"`` sends extra requests from slightly
+    moved start points. Yields one result dict per request in a fixed order
+    (main route first),
+    each as soon as it is available: ``label``, ``features`` (GeoJSON route
+    features, empty on failure), ``error`` (message or ``None``),
+    ``elapsed`` seconds and ``cached``. Requests found in the route cache
+    are not sent; successful answers are cached. Every request has its own
+    ``ROUTE_REQUEST_TIMEOUT``.
+    """
+    coords = [
+        (start_coords[1], start_coords[0]),  # (lon, lat)
+        (end_coords[1], end_coords[0]),
+    ]
+
+    # Basic parameters without alternatives
+    params = {
+        "coordinates": coords,
+        "profile": profile,
+        "format": "geojson",
+        "instructions": True
+    }
+    requests_to_send = [("main route", params)]
+    if alternatives and alternatives_mode == "native":
+        params["alternative_routes"] = dict(NATIVE_ALTERNATIVE_ROUTES)
+    elif alternatives:
+        for label, (dlon, dlat) in ALTERNATIVE_VARIATIONS:
+            alt_params = params.copy()
+            alt_params["coordinates"] = [(coords[0][0] + dlon, coords[0][1] + dlat), coords[1]]
+            requests_to_send.append((label, alt_params))
+
+    cache = get_route_cache()
+    executor = get_route_executor()
+    submitted = []
+    for label, p in requests_to_send:
+        key = route_cache_key(p)
+        cached = cache.get(key)
+        future = None if cached is not None else executor.submit(_timed_directions, p)
+        submitted.append((label, key, cached, future, time.monotonic() + ROUTE_REQUEST_TIMEOUT))
+    for label, key, cached, future, deadline in submitted:
+        if cached is not None:
+            yield {"label": label, "features": cached, "error": None, "elapsed": 0.0, "cached": True}
+            continue
+        result = {"label": label, "features": [], "error": None, "elapsed": 0.0, "cached": False}
+        try:
+            response, result["elapsed"] = future.result(timeout=max(0.0, deadline - time.monotonic()))
+        except FutureTimeoutError:
+            future.cancel()
+            result["error"] = f"timed out after {ROUTE_REQUEST_TIMEOUT:g}s"
+        except Exception as e:
+            result["error"] = str(e) or type(e).__name__
+        else:
+            if response and 'features' in response:
+                result["features"] = response['features']
+            elif response:
+                result["features"] = [response]
+            if result["features"]:
+                cache.set(key, result["features"])
+        yield result
+
+
+def get_route(start_coords: Tuple[float, float], end_coords: Tuple[float, float],
+              profile: str = "driving-car", alternatives: bool = True,
+              on_result: Callable[[Dict], None] = None,
+              alternatives_mode: str = "shifted", backend: str = "ors") -> List[Dict]:
+    """Calculate route between two points.
+
+    ``on_result`` is called with each request's result dict as it arrives
+    (see ``fetch_routes``), so callers can show the main route before the
+    alternatives have finished. Alternatives whose geometry is too similar
+    to an earlier route are dropped (see ``dedupe_routes``). Each request's
+    answer is kept in the shared route cache, so a repeated query makes no
+    network calls and failed alternatives are retried on their own.
+    ``backend="local"`` answers from the offline road network instead (a
+    single route, no alternatives).
+
+    Raises ``RoutingError`` when the main route cannot be calculated; failed
+    alternatives are only reported through ``on_result``.
+    """
+    with metrics.span("get_route", backend=backend):
+        if backend == "local":
+            network = get_road_network()
+            if network is None:
+                raise RoutingError("No local road network is configured (set NAVIGATOR_ROAD_NETWORK).")
+            started = time.perf_counter()
+            features = network.route(start_coords, end_coords, profile)["features"]
+            if on_result is not None:
+                on_result({"label": "local route", "features": features,
+                           "error": None if features else "no connected route in the road network",
+                           "elapsed": time.perf_counter() - started})
+            return features
+
+        all_features = []
+        for result in fetch_routes(start_coords, end_coords, profile, alternatives, alternatives_mode):
+            if on_result is not None:
+                on_result(result)
+            if result["error"]:
+                # results come main route first: without it there is no answer
+                if not all_features:
+                    metrics.count("route_errors", backend=backend)
+                    raise RoutingError(f"Error calculating route: {result['error']}")
+                continue
+            all_features.extend(result["features"])
+        return dedupe_routes(all_features)
+
+
+def route_between(src_coords, dest_coords):
+    # src/dest are (lon, lat) as passed to the directions API
+    cache = get_route_cache()
+    params = {"coordinates": [src_coords, dest_coords], "profile": 'driving-car', "format": 'geojson'}
+    key = route_cache_key(params)
+    route = cache.get(key)
+    if route is not None:
+        return route
+    try:
+        route = get_client().directions(**params)
+    except Exception:
+        return None
+    cache.set(key, route)
+    return route
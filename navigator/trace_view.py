@@ -0,0 +1,123 @@
+"""Windowed views of a recorded search for step-by-step display.
+
+A step shows only the nodes around it: the node being settled, its graph
+neighbours and the newest frontier nodes of each search side. Their state
+is read with ``AlgorithmTrace.node_state`` and ``frontier`` instead of
+rebuilding every list with ``trace[k]``, and the adjacency is a sparse
+neighbour list of the window, so moving between steps costs O(window)
+rather than O(n) to O(n²). The whole graph and the final path are
+browsed page by page.
+
+For map playback, ``playback_frames`` packs the geometry and the settle
+order once so a browser-side player can derive every step itself.
+"""
+from typing import Dict, List
+
+from .geometry import cumulative_distance
+from .graph import AlgorithmTrace, SparseGraph
+
+# Newest frontier nodes shown per search side
+TRACE_WINDOW_FRONTIER = 10
+# Nodes per page of the full adjacency list
+ADJACENCY_PAGE_SIZE = 50
+# Vertices per page of the final path table
+PATH_PAGE_SIZE = 50
+
+SIDE_NAMES = ("forward", "backward")
+
+
+def _fmt(value: float) -> str:
+    return "∞" if value == float('inf') else f"{value:.1f}"
+
+
+def adjacency_rows(graph: SparseGraph, nodes) -> List[Dict]:
+    """Sparse neighbour-list rows (meters) for ``nodes``."""
+    return [{"node": f"N{u}",
+             "neighbors": ", ".join(f"N{v} ({w:.1f})" for v, w in graph.neighbors(u))}
+            for u in nodes]
+
+
+def adjacency_page(graph: SparseGraph, page: int, page_size: int = ADJACENCY_PAGE_SIZE) -> List[Dict]:
+    """Rows of page ``page`` (0-based) of the full adjacency list."""
+    start = page * page_size
+    return adjacency_rows(graph, range(start, min(graph.n, start + page_size)))
+
+
+def path_rows(latlon, trace: AlgorithmTrace) -> List[Dict]:
+    """One row per vertex of the path found: order, coordinates and
+    distance along the path (meters)."""
+    path = [latlon[u] for u in trace.path]
+    if not path:
+        return []
+    along = cumulative_distance(path).tolist()
+    return [{"order": i, "lat": round(lat, 6), "lon": round(lon, 6), "along_m": round(d, 1)}
+            for i, ((lat, lon), d) in enumerate(zip(path, along))]
+
+
+def window_matrix(graph: SparseGraph, nodes: List[int]) -> List[Dict]:
+    """Dense adjacency restricted to the rows and columns of ``nodes``."""
+    labels = [f"N{v}" for v in nodes]
+    return [dict({"": f"N{u}"}, **{label: _fmt(graph.edge_weight(u, v)) for label, v in zip(labels, nodes)})
+            for u in nodes]
+
+
+def step_view(graph: SparseGraph, trace: AlgorithmTrace, k: int,
+              frontier_limit: int = TRACE_WINDOW_FRONTIER) -> Dict:
+    """Window of nodes and formatted rows for step ``k`` of ``trace``.
+
+    ``current``/``side`` are the node settled at this step and its search
+    side (``None`` after the last step), ``window`` the node ids shown,
+    ``state`` one row per window node and ``adjacency`` their neighbour
+    lists.
+    """
+    current = trace.settled[k] if k < len(trace.settled) else None
+    side = trace.step_side[k] if current is not None else None
+    roles: Dict[int, str] = {}
+    if current is not None:
+        roles[current] = "current"
+        for v, _ in graph.neighbors(current):
+            roles.setdefault(v, "neighbor")
+    for s in range(trace.sides):
+        for v in trace.frontier(k, s, frontier_limit):
+            roles.setdefault(v, "frontier" if trace.sides == 1 else f"frontier ({SIDE_NAMES[s]})")
+    window = sorted(roles)
+
+    state = [{"node": f"N{v}", "role": roles[v]} for v in window]
+    for s in range(trace.sides):
+        suffix = "" if trace.sides == 1 else f" ({SIDE_NAMES[s]})"
+        for row, (dist, pred, visited) in zip(state, trace.node_state(k, window, s)):
+            row["distance" + suffix] = _fmt(dist)
+            row["predecessor" + suffix] = "" if pred is None else f"N{pred}"
+            row["visited" + suffix] = visited
+    return {
+        "current": current,
+        "side": side,
+        "window": window,
+        "state": state,
+        "adjacency": adjacency_rows(graph, window),
+    }
+
+
+def playback_frames(nodes: List, graph: SparseGraph, trace: AlgorithmTrace) -> Dict:
+    """JSON-serialisable data for replaying ``trace`` on the client.
+
+    ``coords`` (rounded (lat, lon) per node) and ``edges`` (node id pairs,
+    one per undirected edge) are the static geometry. Step ``k`` shows the
+    nodes ``settled[:k]`` as visited on their side (``sides``, omitted for
+    one-sided searches) and the path to ``settled[k]`` through ``tree``,
+    the settle-time predecessors of each side (-1 at the root).
+    """
+    edges = []
+    for u in range(graph.n):
+        for v, _ in graph.neighbors(u):
+            if u < v or graph.edge_weight(v, u) == float('inf'):
+                edges.append([u, v])
+    frames = {
+        "coords": [[round(lat, 6), round(lon, 6)] for lat, lon in nodes],
+        "edges": edges,
+        "settled": trace.settled.tolist(),
+        "tree": [trace.settled_predecessors(s).tolist() for s in range(trace.sides)],
+    }
+    if trace.sides == 2:
+        frames["sides"] = trace.step_side.tolist()
+    return frames
@@ -1,235 +1,125 @@
 import streamlit as st
-import openrouteservice
-from rapidfuzz import process, fuzz
-from typing import Dict, List, Tuple
+import streamlit.components.v1 as components
+from typing import List
 import folium
 from streamlit_folium import folium_static
-import json
-import math
+import io
+import itertools
+import os
+
+from navigator.export import (EXPORT_FORMATS, export_filename, export_mime, route_features,
+                              shortest_path_feature, write_features)
+from navigator.formatting import directions_table, format_distance, format_duration
+from navigator.geocoding import autocomplete, get_geocode_cache
+from navigator.geometry import SIMPLIFY_METHODS, build_route_lods, map_lods
+from navigator.graph import MATRIX_VIEW_MAX_NODES, SEARCH_MODES, build_route_graph, search_route_graph
+from navigator.maps import render_path_map, render_route_map, render_trace_map
+from navigator.matrix import distance_matrix, optimize_trip
+from navigator import metrics
+from navigator.ors import get_client
+from navigator.routing import ALTERNATIVE_MODES, ALTERNATIVE_VARIATIONS, ROUTING_BACKENDS, RoutingError, get_route
+from navigator.store import CompactRoute, content_key, get_artifact_store, store_routes
+from navigator.trace_view import (ADJACENCY_PAGE_SIZE, PATH_PAGE_SIZE, adjacency_page, path_rows, step_view,
+                                  window_matrix)
 
 # Configuration and Setup
 st.set_page_config(page_title="Smart City Navigator 🚗", layout="wide")
 
-API_KEY = "eyJvcmciOiI1YjNjZTM1OTc4NTExMTAwMDFjZjYyNDgiLCJpZCI6Ijg3YTI4ODI2YTc0OTRjODNiM2JkYTYzMDYxMGQxMWRjIiwiaCI6Im11cm11cjY0In0="
-client = openrouteservice.Client(key=API_KEY)
-
 # Initialize session state
 if 'start_coords' not in st.session_state:
     st.session_state.start_coords = None
 if 'end_coords' not in st.session_state:
     st.session_state.end_coords = None
-if 'routes' not in st.session_state:
-    st.session_state.routes = []
+# keys of the session's routes in the shared artifact store
+if 'route_keys' not in st.session_state:
+    st.session_state.route_keys = []
 if 'selected_route_index' not in st.session_state:
     st.session_state.selected_route_index = 0
 
-# Helper Functions
-def format_distance(meters: float, units: str = "km") -> str:
-    """Format distance in meters to km or miles with 2 decimal places."""
-    if units == "mi":
-        miles = meters / 1609.344
-        return f"{miles:.2f} mi"
-    km = meters / 1000.0
-    return f"{km:.2f} km"
-
-def format_duration(seconds: float) -> str:
-    """Format duration in seconds to hours and minutes."""
-    hours = int(seconds // 3600)
-    minutes = int((seconds % 3600) // 60)
-    if hours > 0:
-        return f"{hours}h {minutes}m"
-    return f"{minutes}m"
-
-def autocomplete(query: str, max_results: int = 5) -> List[Dict]:
-    """Get location suggestions from OpenRouteService."""
-    if not query or len(query.strip()) < 2:
-        return []
-    
+def suggest(query: str, max_results: int = 5, focus=None) -> List[dict]:
+    # autocomplete() raises on API errors; show them instead of failing the page
     try:
-        # Try autocomplete first
-        results = client.pelias_autocomplete(text=query)
-        suggestions = []
-        
-        if results and 'features' in results:
-            for feat in results['features']:
-                if 'geometry' not in feat:
-                    continue
-                props = feat['properties']
-                coords = feat['geometry']['coordinates']
-                suggestions.append({
-                    "label": props.get('label', props.get('name', 'Unknown')),
-                    "lat": coords[1],
-                    "lon": coords[0]
-                })
-        
-        # If autocomplete fails or returns no results, try search
-        if not suggestions:
-            search_results = client.pelias_search(text=query)
-            if search_results and 'features' in search_results:
-                for feat in search_results['features']:
-                    if 'geometry' not in feat:
-                        continue
-                    props = feat['properties']
-                    coords = feat['geometry']['coordinates']
-                    suggestions.append({
-                        "label": props.get('label', props.get('name', 'Unknown')),
-                        "lat": coords[1],
-                        "lon": coords[0]
-                    })
-        
-        # Remove duplicates while preserving order
-        seen = set()
-        unique_suggestions = []
-        for s in suggestions:
-            if s['label'] not in seen and all(x is not None for x in [s['lat'], s['lon']]):
-                seen.add(s['label'])
-                unique_suggestions.append(s)
-        
-        return unique_suggestions[:max_results]
+        with metrics.span("geocode"):
+            return autocomplete(query, max_results, focus)
     except Exception as e:
         st.error(f"Error getting suggestions: {str(e)}")
         return []
 
-def get_route(start_coords: Tuple[float, float], end_coords: Tuple[float, float], 
-              profile: str = "driving-car", alternatives: bool = True) -> List[Dict]:
-    """Calculate route between two points."""
-    try:
-        coords = [
-            (start_coords[1], start_coords[0]),  # (lon, lat)
-            (end_coords[1], end_coords[0]),
-        ]
-        
-        # Basic parameters without alternatives
-        params = {
-            "coordinates": coords,
-            "profile": profile,
-            "format": "geojson",
-            "instructions": True
-        }
-        
-        response = client.directions(**params)
-        routes = [response]
-        
-        # If alternatives are requested, make additional calls with slightly modified coordinates
-        if alternatives:
-            try:
-                # Try slightly different paths by adjusting coordinates
-                offset = 0.0005  # About 50 meters
-                variations = [
-                    [(coords[0][0], coords[0][1] + offset), coords[1]],  # Shift start north
-                    [(coords[0][0] + offset, coords[0][1]), coords[1]],  # Shift start east
-                ]
-                
-                for var_coords in variations:
-                    try:
-                        alt_params = params.copy()
-                        alt_params["coordinates"] = var_coords
-                        alt_response = client.directions(**alt_params)
-                        if alt_response and alt_response != response:
-                            routes.append(alt_response)
-                    except:
-                        continue
-                        
-            except:
-                # If generating alternatives fails, continue with the main route
-                pass
-        
-        # Extract and return all features
-        all_features = []
-        for r in routes:
-            if 'features' in r:
-                all_features.extend(r['features'])
-            else:
-                all_features.append(r)
-        
-        return all_features
-    except Exception as e:
-        st.error(f"Error calculating route: {str(e)}")
-        return []
-
-def route_between(src_coords, dest_coords):
-    try:
-        route = client.directions(
-            coordinates=[src_coords, dest_coords],
-            profile='driving-car',
-            format='geojson'
-        )
-        return route
-    except Exception:
-        return None
+def load_routes() -> List[CompactRoute]:
+    # Sessions only keep store keys; if a route was evicted they are fetched
+    # again (normally a route cache hit) instead of kept per session
+    store = get_artifact_store()
+    routes = [store.get(key) for key in st.session_state.route_keys]
+    if any(route is None for route in routes):
+        features = get_route(**st.session_state.route_query)
+        st.session_state.route_keys = store_routes(features)
+        routes = [store.get(key) or CompactRoute.from_feature(feature)
+                  for key, feature in zip(st.session_state.route_keys, features)]
+    return routes
+
+def load_primary_route() -> CompactRoute:
+    return load_routes()[0]
+
+def load_route_lods(route: CompactRoute, method: str) -> list:
+    # Levels of detail of one route, shared per route and method
+    def build():
+        metrics.observe("route_vertices", len(route.offsets))
+        with metrics.span("build_lods"):
+            return build_route_lods(route.latlon, method=method)
+    return get_artifact_store().get_or_create(content_key("lods", route.key, method), build)
+
+def load_directions(route: CompactRoute, units: str) -> list:
+    # Formatted turn-by-turn table of one route, shared per route and units
+    return get_artifact_store().get_or_create(
+        content_key("directions", route.key, units),
+        lambda: directions_table(route.properties['segments'][0]['steps'], units))
+
+def route_search_key() -> str:
+    return content_key("search", st.session_state.route_keys[0], st.session_state._algo_params)
+
+def load_route_search() -> dict:
+    # Graph, trace and expansion counts of the primary route, shared by all
+    # sessions and rebuilt after eviction. They are separate stages, so e.g.
+    # a new search mode reuses the graph
+    params = st.session_state._algo_params
+    tolerance = params["simplify_tolerance"]
+    method = params["simplify_method"] if tolerance else None
+    store = get_artifact_store()
+    graph_key = content_key("graph", st.session_state.route_keys[0], tolerance, method)
+    with metrics.span("build_graph"):
+        route_graph = store.get_or_create(
+            graph_key, lambda: build_route_graph(load_primary_route().latlon, tolerance, params["simplify_method"]))
+    trace = store.get_or_create(content_key("trace", graph_key, params["mode"]),
+                                lambda: search_route_graph(route_graph, params["mode"]))
+    expanded = store.get_or_create(
+        content_key("expanded", graph_key),
+        lambda: {mode: search_route_graph(route_graph, mode, record=False).expanded for mode in SEARCH_MODES})
+    return dict(route_graph, trace=trace, expanded=expanded)
+
+def load_step_view(graph, trace, step: int) -> dict:
+    # Formatted rows of one step's window, built once per step and route
+    return get_artifact_store().get_or_create(
+        content_key("step-view", route_search_key(), step), lambda: step_view(graph, trace, step))
+
+def load_export(fmt: str, compress: bool, search) -> bytes:
+    # All routes plus the shortest path (if computed), streamed feature by
+    # feature into one buffer that is shared through the store
+    def build():
+        features = (route.to_feature() for route in load_routes())
+        features = route_features(features)
+        if search is not None and search["trace"].path:
+            features = itertools.chain(features, [shortest_path_feature(search["nodes"], search["trace"])])
+        buf = io.BytesIO()
+        write_features(features, buf, fmt, compress)
+        return buf.getvalue()
+    key = content_key("export", st.session_state.route_keys, st.session_state.get('_algo_params'), fmt, compress)
+    return get_artifact_store().get_or_create(key, build)
+
+# Host of the trace map page that relays the step between the app and the
+# player (see components/trace_player/index.html)
+trace_player = components.declare_component(
+    "trace_player", path=os.path.join(os.path.dirname(os.path.abspath(__file__)), "components", "trace_player"))
 
-# -------------------------
-# Graph / Algorithm helpers
-# -------------------------
-def haversine_distance(a: Tuple[float, float], b: Tuple[float, float]) -> float:
-    # Returns distance in meters between two (lat, lon) points
-    lat1, lon1 = math.radians(a[0]), math.radians(a[1])
-    lat2, lon2 = math.radians(b[0]), math.radians(b[1])
-    dlat = lat2 - lat1
-    dlon = lon2 - lon1
-    R = 6371000.0
-    hav = math.sin(dlat/2)**2 + math.cos(lat1)*math.cos(lat2)*math.sin(dlon/2)**2
-    return 2 * R * math.asin(math.sqrt(hav))
-
-def build_graph_from_coords(coords_latlon: List[Tuple[float, float]]):
-    # nodes: list of (lat, lon); adjacency matrix with weights (meters); edges only between consecutive points
-    nodes = list(coords_latlon)
-    n = len(nodes)
-    adj = [[0.0 if i==j else float('inf') for j in range(n)] for i in range(n)]
-    # Connect consecutive points (polyline neighbors)
-    for i in range(n-1):
-        d = haversine_distance(nodes[i], nodes[i+1])
-        adj[i][i+1] = d
-        adj[i+1][i] = d
-    return nodes, adj
-
-def dijkstra_trace(adj_matrix: List[List[float]], start_index: int):
-    # Record each step: distances, visited, predecessors, current node
-    n = len(adj_matrix)
-    dist = [float('inf')] * n
-    prev = [None] * n
-    visited = [False] * n
-    dist[start_index] = 0.0
-    steps = []
-
-    for _ in range(n):
-        # select unvisited node with smallest dist
-        u = None
-        best = float('inf')
-        for i in range(n):
-            if not visited[i] and dist[i] < best:
-                best = dist[i]
-                u = i
-        # Record current selection (could be None if unreachable)
-        steps.append({
-            'distances': list(dist),
-            'visited': list(visited),
-            'predecessors': list(prev),
-            'current': u,
-        })
-
-        if u is None:
-            break
-
-        visited[u] = True
-
-        # relax neighbors
-        for v in range(n):
-            w = adj_matrix[u][v]
-            if w != float('inf') and not visited[v]:
-                alt = dist[u] + w
-                if alt < dist[v]:
-                    dist[v] = alt
-                    prev[v] = u
-
-    # final state
-    steps.append({
-        'distances': list(dist),
-        'visited': list(visited),
-        'predecessors': list(prev),
-        'current': None,
-    })
-    return steps
 
 # UI Components
 st.title("🌆 Smart City Navigator")
@@ -247,7 +137,7 @@ with col1:
     start_query = st.text_input("Enter starting location", 
                                help="Type to see suggestions. Supports partial matches.")
     
-    start_suggestions = autocomplete(start_query) if len(start_query) >= 2 else []
+    start_suggestions = suggest(start_query) if len(start_query) >= 2 else []
     
     # Always show selectbox, but with appropriate options
     start_labels = [s["label"] for s in start_suggestions] if start_suggestions else ["Select starting point"]
@@ -271,7 +161,8 @@ with col2:
     end_query = st.text_input("Enter destination", 
                              help="Type to see suggestions. Supports partial matches.")
     
-    end_suggestions = autocomplete(end_query) if len(end_query) >= 2 else []
+    # bias destination suggestions towards the chosen start
+    end_suggestions = suggest(end_query, focus=st.session_state.start_coords) if len(end_query) >= 2 else []
     
     # Always show selectbox, but with appropriate options
     end_labels = [s["label"] for s in end_suggestions] if end_suggestions else ["Select destination"]
@@ -305,128 +196,246 @@ with col3:
 with col4:
     show_alternatives = st.checkbox("Show alternative routes", value=True,
                                   help="Display multiple route options if available")
+    alternatives_mode = st.selectbox("Alternatives source", list(ALTERNATIVE_MODES),
+                                     format_func=lambda x: ALTERNATIVE_MODES[x],
+                                     disabled=not show_alternatives)
 
 with col5:
     units = st.selectbox("Distance Units", ["km", "mi"])
-
-# Calculate Route Button
+    routing_backend = st.selectbox("Routing backend", list(ROUTING_BACKENDS),
+                                   format_func=lambda x: ROUTING_BACKENDS[x],
+                                   help="The local backend needs a road network file (NAVIGATOR_ROAD_NETWORK)")
+
+algo_mode = st.selectbox("Path search algorithm", list(SEARCH_MODES),
+                         format_func=lambda x: SEARCH_MODES[x],
+                         help="Algorithm used for the step-by-step trace and final path")
+
+with st.expander("⚙️ Geometry simplification"):
+    simplify_method = st.selectbox("Simplification method", list(SIMPLIFY_METHODS),
+                                   format_func=lambda x: SIMPLIFY_METHODS[x])
+    simplify_graph = st.checkbox("Build the algorithm graph from a simplified route", value=False,
+                                 help="Fewer nodes make the trace faster and easier to follow")
+    graph_tolerance = st.slider("Graph simplification tolerance (meters)", 1, 200, 20,
+                                disabled=not simplify_graph)
+
+# Calculate Route Button: only fetches; the results below are rendered from
+# the stored routes on every run
 if st.button("🔍 Find Best Route", type="primary"):
     if st.session_state.start_coords and st.session_state.end_coords:
         with st.spinner("Calculating the best route..."):
-            routes = get_route(
-                st.session_state.start_coords,
-                st.session_state.end_coords,
-                transport_mode,
-                show_alternatives
-            )
-            
+            fetch_status = st.status("Fetching routes...", expanded=False)
+
+            def _report_route(result):
+                # Show each request as soon as it completes, main route first
+                if result["error"]:
+                    fetch_status.write(f"⚠️ {result['label'].capitalize()}: {result['error']}")
+                    if result["label"] in dict(ALTERNATIVE_VARIATIONS):
+                        st.warning(f"Alternative route ({result['label']}) unavailable: {result['error']}")
+                    return
+                for feat in result["features"]:
+                    summary = feat['properties']['segments'][0]
+                    source = "cached" if result.get("cached") else f"{result['elapsed']:.1f}s"
+                    fetch_status.write(
+                        f"✅ {result['label'].capitalize()}: {format_distance(summary['distance'], units)}, "
+                        f"{format_duration(summary['duration'])} ({source})"
+                    )
+
+            route_query = {
+                "start_coords": st.session_state.start_coords,
+                "end_coords": st.session_state.end_coords,
+                "profile": transport_mode,
+                "alternatives": show_alternatives,
+                "alternatives_mode": alternatives_mode,
+                "backend": routing_backend,
+            }
+            try:
+                routes = get_route(**route_query, on_result=_report_route)
+            except RoutingError as e:
+                st.error(str(e))
+                routes = []
+            fetch_status.update(label="Routes fetched" if routes else "Route request failed",
+                                state="complete" if routes else "error")
+
             if routes:
-                st.session_state.routes = routes
-                
-                # Create map centered on start point
-                m = folium.Map(
-                    location=[st.session_state.start_coords[0], st.session_state.start_coords[1]],
-                    zoom_start=12
-                )
-                
-                # Add routes to map with different colors
-                colors = ['blue', 'red', 'green']
-                for idx, route in enumerate(routes):
-                    coords = [(p[1], p[0]) for p in route['geometry']['coordinates']]
-                    
-                    # Main route info
-                    distance = route['properties']['segments'][0]['distance']
-                    duration = route['properties']['segments'][0]['duration']
-                    
-                    # Display route metrics
-                    col1, col2 = st.columns(2)
-                    with col1:
-                        st.metric(
-                            f"Route {idx + 1} Distance", 
-                            format_distance(distance, units)
-                        )
-                    with col2:
-                        st.metric(
-                            f"Estimated Time", 
-                            format_duration(duration)
-                        )
-                    
-                    # Add route to map
-                    folium.PolyLine(
-                        coords,
-                        weight=4,
-                        color=colors[idx % len(colors)],
-                        opacity=0.8
-                    ).add_to(m)
-                    
-                    # Show turn-by-turn directions
-                    with st.expander(f"📝 Turn-by-turn directions - Route {idx + 1}"):
-                        steps = route['properties']['segments'][0]['steps']
-                        for i, step in enumerate(steps, 1):
-                            instruction = step['instruction']
-                            distance = format_distance(step['distance'], units)
-                            duration = format_duration(step['duration'])
-                            
-                            # Add appropriate emoji based on the maneuver
-                            icon = "➡️"
-                            if "turn right" in instruction.lower():
-                                icon = "↪️"
-                            elif "turn left" in instruction.lower():
-                                icon = "↩️"
-                            elif "continue" in instruction.lower():
-                                icon = "⬆️"
-                            
-                            st.write(f"{icon} **Step {i}:** {instruction}")
-                            st.caption(f"Distance: {distance} • Duration: {duration}")
-                
-                # Add markers for start and end points
-                folium.Marker(
-                    [st.session_state.start_coords[0], st.session_state.start_coords[1]],
-                    popup="Start",
-                    icon=folium.Icon(color='green', icon='info-sign')
-                ).add_to(m)
-                
-                folium.Marker(
-                    [st.session_state.end_coords[0], st.session_state.end_coords[1]],
-                    popup="Destination",
-                    icon=folium.Icon(color='red', icon='info-sign')
-                ).add_to(m)
-                
-                # Display the map
-                st.subheader("🗺️ Route Map")
-                folium_static(m)
-                
-                # Add download option
-                st.download_button(
-                    label="📥 Download Route Data (GeoJSON)",
-                    data=json.dumps(routes[0], indent=2),
-                    file_name="route.geojson",
-                    mime="application/geo+json",
-                )
-                # -------------------------
-                # Build adjacency matrix and run Dijkstra trace for the primary route
-                # Store trace in session state (UI for stepping rendered below)
-                # -------------------------
-                try:
-                    primary = routes[0]
-                    # Extract polyline coordinates in lat,lon
-                    poly_coords = [(c[1], c[0]) for c in primary['geometry']['coordinates']]
-
-                    nodes, adj = build_graph_from_coords(poly_coords)
-                    trace = dijkstra_trace(adj, 0)  # start at node 0
-                    # Store in session for stepping
-                    st.session_state._algo_nodes = nodes
-                    st.session_state._algo_adj = adj
-                    st.session_state._algo_trace = trace
-                    # only set step to 0 when freshly generating trace
-                    st.session_state._algo_step = 0
-                except Exception as e:
-                    st.error(f"Error building algorithm trace: {e}")
+                st.session_state.route_keys = store_routes(routes)
+                st.session_state.route_query = route_query
+                # only set step to 0 when freshly generating trace
+                st.session_state._algo_step = 0
             else:
                 st.error("Could not find a route between these locations.")
     else:
         st.warning("Please select both starting point and destination.")
 
+# -------------------------
+# Route results (persistent). Each stage is memoized on its own inputs:
+# routes by query (route cache and store), levels of detail by route and
+# method, the map page by route set and method, the graph by route and
+# simplification, the trace by graph and search mode. Changing units only
+# reformats the numbers.
+# -------------------------
+routes = []
+if st.session_state.route_keys:
+    try:
+        routes = load_routes()
+    except RoutingError as e:
+        # An evicted route could not be fetched again; drop the stale result
+        st.session_state.route_keys = []
+        st.error(f"Could not reload the routes: {e}")
+if routes:
+    algo_params = {
+        "mode": algo_mode,
+        "simplify_tolerance": graph_tolerance if simplify_graph else None,
+        "simplify_method": simplify_method,
+    }
+    if algo_params != st.session_state.get('_algo_params'):
+        st.session_state._algo_params = algo_params
+        st.session_state._algo_step = 0
+
+    lod_stats = []
+    for idx, route in enumerate(routes):
+        levels = load_route_lods(route, simplify_method)
+        lod_stats.append((idx, len(route.offsets), levels))
+
+        # Main route info
+        distance = route.properties['segments'][0]['distance']
+        duration = route.properties['segments'][0]['duration']
+
+        # Display route metrics
+        col1, col2 = st.columns(2)
+        with col1:
+            st.metric(
+                f"Route {idx + 1} Distance",
+                format_distance(distance, units)
+            )
+        with col2:
+            st.metric(
+                f"Estimated Time",
+                format_duration(duration)
+            )
+
+    # Display the map
+    st.subheader("🗺️ Route Map")
+    query = st.session_state.route_query
+    map_lat = query["start_coords"][0]
+    with metrics.span("render_map"):
+        route_map = get_artifact_store().get_or_create(
+            content_key("route-map", st.session_state.route_keys, simplify_method),
+            lambda: render_route_map(query["start_coords"], query["end_coords"],
+                                     [levels for _, _, levels in lod_stats]))
+        components.html(route_map, height=510, width=700)
+    # Every level embedded in the page counts towards what is sent
+    used, _ = map_lods(lod_stats[0][2], map_lat)
+    for idx, full, levels in lod_stats:
+        sent = sum(levels[i]['vertices'] for i in used)
+        st.caption(
+            f"Route {idx + 1}: {full} vertices → "
+            + " / ".join(f"{levels[i]['vertices']} @ {levels[i]['tolerance_m']:g} m" for i in used)
+            + f" (sent: {sent}, −{100 * (1 - sent / max(full, 1)):.0f}%)"
+        )
+
+    # Turn-by-turn directions come after the map, one table per route that is
+    # only built and sent while its toggle is on
+    for idx, route in enumerate(routes):
+        if st.toggle(f"📝 Turn-by-turn directions - Route {idx + 1}", key=f"show_directions_{idx}"):
+            st.dataframe(load_directions(route, units), hide_index=True, use_container_width=True)
+
+# Multi-stop trip planning
+with st.expander("🧭 Multi-stop trip"):
+    st.caption("Plan the order of several stops from one distance matrix instead of a "
+               "directions call per pair. The selected starting point is used as the depot.")
+    stops_text = st.text_area("Stops (one place per line)", key="trip_stops")
+    round_trip = st.checkbox("Return to the starting point", value=False)
+    if st.button("Optimize trip"):
+        stop_places = []
+        for line in [l.strip() for l in stops_text.splitlines() if l.strip()]:
+            found = suggest(line, max_results=1)
+            if found:
+                stop_places.append(found[0])
+            else:
+                st.warning(f"No location found for '{line}'")
+        if st.session_state.start_coords:
+            depot = {"label": st.session_state.get('start_place', "Start"),
+                     "lat": st.session_state.start_coords[0], "lon": st.session_state.start_coords[1]}
+            stop_places.insert(0, depot)
+        if len(stop_places) < 2:
+            st.warning("Enter at least two locations (or a starting point and one stop).")
+        else:
+            try:
+                points = [(p["lat"], p["lon"]) for p in stop_places]
+                matrix = distance_matrix(points, profile=transport_mode, backend=routing_backend)
+                order = optimize_trip(matrix["durations"], start=0, round_trip=round_trip)
+                legs = list(zip(order, order[1:]))
+                total_time = sum(matrix["durations"][a, b] for a, b in legs)
+                total_dist = sum(matrix["distances"][a, b] for a, b in legs)
+                st.markdown(f"**Total:** {format_distance(total_dist, units)} • {format_duration(total_time)}")
+                st.table([{"stop": k + 1, "place": stop_places[i]["label"],
+                           "leg": (f"{format_distance(matrix['distances'][order[k - 1], i], units)}, "
+                                   f"{format_duration(matrix['durations'][order[k - 1], i])}") if k else "—"}
+                          for k, i in enumerate(order)])
+                trip_map = folium.Map(location=points[order[0]], zoom_start=11)
+                folium.PolyLine([points[i] for i in order], color='purple', weight=3,
+                                dash_array='6 6').add_to(trip_map)
+                for k, i in enumerate(order[:len(stop_places)]):
+                    folium.Marker(points[i], popup=f"{k + 1}. {stop_places[i]['label']}").add_to(trip_map)
+                folium_static(trip_map)
+            except Exception as e:
+                st.error(f"Error planning trip: {e}")
+
+# Cache statistics (shared by all sessions of this server)
+with st.sidebar:
+    st.markdown("**🗄️ Geocoding cache**")
+    geo_stats = get_geocode_cache().stats()
+    st.caption(
+        f"{geo_stats['hits']} hits • {geo_stats['misses']} misses • "
+        f"{geo_stats['size']}/{geo_stats['max_entries']} entries"
+    )
+    st.markdown("**🌐 ORS requests**")
+    ors_stats = get_client().stats()
+    waits = ors_stats["limits"].values()
+    st.caption(
+        f"{ors_stats['calls']} sent • {ors_stats['coalesced']} coalesced • {ors_stats['retries']} retried • "
+        f"{ors_stats['queued']} queued • {ors_stats['in_flight']} in flight • "
+        f"max wait {max((w['wait_max_s'] for w in waits), default=0.0):.1f}s"
+    )
+
+    st.markdown("**🧠 Shared session data**")
+    store_stats = get_artifact_store().stats()
+    st.caption(
+        f"{store_stats['entries']} artifacts • {store_stats['nbytes'] / 2**20:.1f}/"
+        f"{store_stats['budget_bytes'] / 2**20:.0f} MB • {store_stats['evictions']} evicted"
+    )
+
+    # Stage timings are process-wide, so the toggle affects every session
+    with st.expander("🔬 Instrumentation"):
+        if st.checkbox("Record stage timings", value=metrics.is_enabled()):
+            metrics.enable()
+        else:
+            metrics.disable()
+        rows = metrics.snapshot()
+        spans = [r for r in rows if r["type"] == "span"]
+        if spans:
+            st.dataframe(
+                [{"stage": r["name"] + "".join(f" {v}" for v in r["labels"].values()),
+                  "runs": r["count"], "mean ms": round(r["mean_s"] * 1000, 1),
+                  "max ms": round(r["max_s"] * 1000, 1)} for r in spans],
+                hide_index=True,
+            )
+        others = [r for r in rows if r["type"] != "span"]
+        if others:
+            st.dataframe(
+                [{"metric": r["name"] + "".join(f" {v}" for v in r["labels"].values()),
+                  "value": r["value"] if r["type"] == "counter" else r["last"],
+                  "max": r.get("max")} for r in others],
+                hide_index=True,
+            )
+        if rows:
+            st.download_button("Metrics (JSONL)", metrics.to_jsonl(), file_name="metrics.jsonl",
+                               mime="application/jsonl")
+            st.download_button("Metrics (Prometheus)", metrics.to_prometheus(), file_name="metrics.prom",
+                               mime="text/plain")
+            if st.button("Reset metrics"):
+                metrics.reset()
+
 # Footer
 st.markdown("---")
 st.markdown("""
@@ -440,12 +449,28 @@ st.markdown("""
 # -------------------------
 # Algorithm Trace UI (persistent)
 # -------------------------
-if '_algo_trace' in st.session_state and st.session_state.get('_algo_trace'):
-    trace = st.session_state._algo_trace
-    nodes = st.session_state._algo_nodes
-    adj = st.session_state._algo_adj
+search = None
+if st.session_state.get('_algo_params') and st.session_state.route_keys:
+    try:
+        search = load_route_search()
+    except Exception as e:
+        st.warning(f"Could not rebuild the algorithm trace: {e}")
+if search is not None:
+    trace = search["trace"]
+    nodes = search["nodes"].tolist()
+    graph = search["graph"]
+    graph_tolerance = st.session_state._algo_params["simplify_tolerance"]
+    if graph_tolerance:
+        st.caption(f"Algorithm graph: {len(nodes)} nodes "
+                   f"(simplified from {search['source_vertices']} at {graph_tolerance} m)")
     if '_algo_step' not in st.session_state:
         st.session_state._algo_step = 0
+    # A step reported by the map player (its last value is kept by the
+    # component, so each report carries a new seq and is applied once)
+    reported = st.session_state.get('trace_player')
+    if reported and reported.get('seq') != st.session_state.get('_player_seq'):
+        st.session_state._player_seq = reported['seq']
+        st.session_state._algo_step = min(max(int(reported['step']), 0), len(trace) - 1)
 
     total_steps = max(len(trace)-1, 0)
 
@@ -459,7 +484,7 @@ if '_algo_trace' in st.session_state and st.session_state.get('_algo_trace'):
         st.session_state._algo_step = max(st.session_state._algo_step - 1, 0)
 
     with tab1:
-        st.subheader("🔬 Algorithm Trace - Dijkstra (step-by-step)")
+        st.subheader(f"🔬 Algorithm Trace - {SEARCH_MODES[trace.mode]} (step-by-step)")
         col_a, col_b = st.columns([1,2])
         with col_a:
             st.write(f"Step {st.session_state._algo_step} of {total_steps}")
@@ -471,82 +496,101 @@ if '_algo_trace' in st.session_state and st.session_state.get('_algo_trace'):
                 st.session_state._algo_step = int(step_idx)
 
         with col_b:
-            cur = trace[st.session_state._algo_step]
-            # Build a simple table representation
-            labels = [f"N{i}" for i in range(len(nodes))]
-            table_rows = []
-            for i, row in enumerate(adj):
-                display_row = ["∞" if val==float('inf') else f"{val:.1f}" for val in row]
-                table_rows.append(dict(zip(labels, display_row)))
-            st.markdown("**Adjacency matrix (meters)**")
-            st.table(table_rows)
-
+            # Only the window around the step (current node, its neighbours
+            # and the newest frontier) is looked up and formatted
+            view = load_step_view(graph, trace, st.session_state._algo_step)
             st.markdown("**Current step details**")
-            st.write(f"Current node: {cur['current']}")
-            st.write(f"Distances: {cur['distances']}")
-            st.write(f"Visited: {cur['visited']}")
-            st.write(f"Predecessors: {cur['predecessors']}")
-
-            # Draw map for this step
-            mm = folium.Map(location=[nodes[0][0], nodes[0][1]], zoom_start=13)
-            # draw all nodes
-            for i, (lat, lon) in enumerate(nodes):
-                color = 'gray'
-                if cur['visited'][i]:
-                    color = 'blue'
-                folium.CircleMarker([lat, lon], radius=4, color=color, fill=True).add_to(mm)
-
-            # draw edges
-            for i in range(len(nodes)-1):
-                folium.PolyLine([nodes[i], nodes[i+1]], color='lightgray', weight=2).add_to(mm)
-
-            # highlight current path from start to the current node using predecessors
-            target = cur['current'] if cur['current'] is not None else None
-            if target is not None:
-                path = []
-                u = target
-                while u is not None:
-                    path.append(nodes[u])
-                    u = cur['predecessors'][u]
-                path = list(reversed(path))
-                if len(path) > 1:
-                    folium.PolyLine(path, color='red', weight=4, opacity=0.8).add_to(mm)
-
+            if view['current'] is None:
+                st.write("Search finished")
+            else:
+                side_name = f" ({'backward' if view['side'] == 1 else 'forward'} search)" if trace.sides == 2 else ""
+                st.write(f"Current node: N{view['current']}{side_name}")
+            st.caption(f"Showing {len(view['window'])} of {graph.n} nodes around this step")
+            st.dataframe(view['state'], hide_index=True, use_container_width=True)
+
+            # The dense matrix is limited to the window of small graphs;
+            # otherwise the window is a sparse neighbour list
+            if graph.n <= MATRIX_VIEW_MAX_NODES:
+                st.markdown("**Adjacency matrix around this step (meters)**")
+                st.table(window_matrix(graph, view['window']))
+            else:
+                st.markdown("**Adjacency around this step (meters)**")
+                st.dataframe(view['adjacency'], hide_index=True, use_container_width=True)
+            with st.expander(f"All nodes — {graph.n} nodes, {graph.num_edges} edges"):
+                pages = max(1, -(-graph.n // ADJACENCY_PAGE_SIZE))
+                page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, step=1,
+                                       key='adjacency_page')
+                st.dataframe(adjacency_page(graph, int(page) - 1), hide_index=True, use_container_width=True)
+
+            # The map page is built once per search and loaded once by the
+            # trace_player component; the step above is sent to the player,
+            # which restyles nodes in the browser, and the step chosen on the
+            # map comes back to the app on the next rerun
             st.subheader("Algorithm visualization")
-            folium_static(mm)
+            st.caption("The map follows the step above; stepping or playing on the map moves the step above too.")
+            with metrics.span("render_trace_map"):
+                map_key = content_key("trace-map", route_search_key())
+                map_page = get_artifact_store().get_or_create(map_key, lambda: render_trace_map(nodes, graph, trace))
+                trace_player(page=map_page, page_key=map_key, step=st.session_state._algo_step, height=510,
+                             key='trace_player', default=None)
 
     with tab2:
         st.subheader("✅ Final path (reconstructed)")
-        # Use the final step (last in trace) to reconstruct shortest paths
-        final = trace[-1]
-        # attempt to reconstruct path to the last node
-        dest_idx = len(nodes) - 1
-        path = []
-        u = dest_idx
-        if final['predecessors'][u] is None and final['distances'][u] == float('inf'):
+        expanded = search["expanded"]
+        if expanded:
+            st.markdown("**Nodes expanded per search mode**")
+            mode_cols = st.columns(len(expanded))
+            for mode_col, (mode, count) in zip(mode_cols, expanded.items()):
+                mode_col.metric(SEARCH_MODES[mode], f"{count} / {len(nodes)}")
+        # The solver stops at the destination and records the path it found
+        if not trace.path:
             st.warning("Destination unreachable from start in the computed graph.")
         else:
-            while u is not None:
-                path.append(nodes[u])
-                u = final['predecessors'][u]
-            path = list(reversed(path))
-            total_distance = final['distances'][dest_idx]
+            path = [nodes[u] for u in trace.path]
+            total_distance = trace.distance
             st.markdown(f"**Path length:** {len(path)} nodes — **Distance:** {total_distance:.1f} meters")
-            # show as a table with node index and coordinates
-            path_rows = []
-            for i, (lat, lon) in enumerate(path):
-                path_rows.append({"order": i, "lat": lat, "lon": lon})
-            st.table(path_rows)
-
-            # map
-            mm2 = folium.Map(location=[nodes[0][0], nodes[0][1]], zoom_start=13)
-            # full polyline (all nodes)
-            folium.PolyLine(nodes, color='lightgray', weight=2).add_to(mm2)
-            # highlight final path
-            if len(path) > 1:
-                folium.PolyLine(path, color='green', weight=5, opacity=0.9).add_to(mm2)
-            # markers
-            folium.Marker(path[0], popup='Start', icon=folium.Icon(color='green')).add_to(mm2)
-            folium.Marker(path[-1], popup='Destination', icon=folium.Icon(color='red')).add_to(mm2)
+            # Node index, coordinates and distance along the path, built once
+            # per search and shown one page at a time
+            rows = get_artifact_store().get_or_create(
+                content_key("path-rows", route_search_key()), lambda: path_rows(nodes, trace))
+            pages = max(1, -(-len(rows) // PATH_PAGE_SIZE))
+            page = int(st.number_input(f"Path page (of {pages})", min_value=1, max_value=pages, value=1, step=1,
+                                       key='path_page')) - 1
+            st.dataframe(rows[page * PATH_PAGE_SIZE:(page + 1) * PATH_PAGE_SIZE], hide_index=True,
+                         use_container_width=True)
+
+            # The map page is built once per search, like the trace map
             st.subheader("Final path visualization")
-            folium_static(mm2)
+            with metrics.span("render_path_map"):
+                path_page = get_artifact_store().get_or_create(
+                    content_key("path-map", route_search_key()),
+                    lambda: render_path_map(
+                        load_route_lods(load_primary_route(), st.session_state._algo_params["simplify_method"]),
+                        path))
+                components.html(path_page, height=510, width=700)
+
+# -------------------------
+# Route export (persistent)
+# -------------------------
+if st.session_state.route_keys:
+    st.subheader("📥 Export routes")
+    export_col1, export_col2 = st.columns([3, 1])
+    with export_col1:
+        export_format = st.selectbox("Export format", list(EXPORT_FORMATS), format_func=EXPORT_FORMATS.get,
+                                     key="export_format")
+    with export_col2:
+        export_gzip = st.checkbox("gzip", key="export_gzip", disabled=export_format == "parquet",
+                                  help="Compress text formats (Parquet is compressed internally)")
+    compress = export_gzip and export_format != "parquet"
+    try:
+        payload = load_export(export_format, compress, search)
+    except Exception as e:
+        st.warning(f"Could not export routes: {e}")
+    else:
+        path_note = " and the shortest path" if search is not None and search["trace"].path else ""
+        st.download_button(
+            label=f"📥 Download {len(st.session_state.route_keys)} route(s){path_note}",
+            data=payload,
+            file_name=export_filename("routes", export_format, compress),
+            mime=export_mime(export_format, compress),
+        )
@@ -0,0 +1,31 @@
+import os
+
+# The package reads its configuration at import time: keep the route cache
+# in memory so tests never share results through the SQLite file
+os.environ["NAVIGATOR_ROUTE_CACHE_DB"] = ""
+
+import pytest  # noqa: E402
+
+from benchmarks.stub_ors import StubORS  # noqa: E402
+
+
+@pytest.fixture
+def stub_ors():
+    """A running ``StubORS`` behind the process-wide ORS client, with empty
+    route and geocoding caches."""
+    import openrouteservice
+    from navigator.geocoding import get_geocode_cache
+    from navigator.ors import LIBRARY_RETRY_TIMEOUT, ORSClient, set_client
+    from navigator.routing import get_route_cache
+
+    get_route_cache().clear()
+    get_geocode_cache().clear()
+    with StubORS() as stub:
+        raw = openrouteservice.Client(key="stub", base_url=stub.base_url, retry_timeout=LIBRARY_RETRY_TIMEOUT)
+        set_client(ORSClient(raw, limits={}))
+        try:
+            yield stub
+        finally:
+            set_client(None)
+            get_route_cache().clear()
+            get_geocode_cache().clear()
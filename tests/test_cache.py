@@ -0,0 +1,120 @@
+import sqlite3
+
+import pytest
+
+from navigator import cache as cache_module
+from navigator.cache import ACCESS_FLUSH_BATCH, TTLCache
+from navigator.store import ArtifactStore
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "time", lambda: now[0])
+    return now
+
+
+def _accessed(path, key):
+    with sqlite3.connect(path) as db:
+        return db.execute("SELECT accessed FROM cache WHERE key = ?", (key,)).fetchone()[0]
+
+
+def test_entries_expire(clock):
+    cache = TTLCache(10, ttl_seconds=60)
+    cache.set("a", 1)
+    clock[0] += 59
+    assert cache.get("a") == 1
+    clock[0] += 2
+    assert cache.get("a") is None
+    assert cache.stats()["size"] == 0
+
+
+def test_least_recently_used_is_evicted():
+    cache = TTLCache(2, ttl_seconds=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert cache.stats()["evictions"] == 1
+
+
+def test_entries_reload_from_the_table(clock, tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = TTLCache(10, ttl_seconds=60, db_path=path)
+    cache.set("a", {"v": [1, 2]})
+    cache.set("b", "old")
+    cache.close()
+
+    clock[0] += 30
+    reopened = TTLCache(10, ttl_seconds=60, db_path=path)
+    assert reopened.get("a") == {"v": [1, 2]}
+    clock[0] += 31
+    # expired rows are neither returned nor kept
+    assert reopened.get("b") is None
+    reopened.close()
+    assert TTLCache(10, ttl_seconds=60, db_path=path).stats()["size"] == 0
+
+
+def test_table_is_trimmed_to_max_entries(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = TTLCache(2, ttl_seconds=60, db_path=path)
+    for key in "abc":
+        cache.set(key, key)
+    cache.close()
+    with sqlite3.connect(path) as db:
+        assert sorted(row[0] for row in db.execute("SELECT key FROM cache")) == ["b", "c"]
+
+
+def test_access_times_are_written_in_batches(clock, tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = TTLCache(10, ttl_seconds=3600, db_path=path)
+    cache.set("hot", 1)
+    written = _accessed(path, "hot")
+    for _ in range(ACCESS_FLUSH_BATCH - 1):
+        clock[0] += 1
+        cache.get("hot")
+    assert _accessed(path, "hot") == written
+    clock[0] += 1
+    cache.get("hot")
+    assert _accessed(path, "hot") == clock[0]
+
+
+def test_access_times_are_written_on_set_and_close(clock, tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = TTLCache(10, ttl_seconds=3600, db_path=path)
+    cache.set("a", 1)
+    clock[0] += 5
+    cache.get("a")
+    cache.set("b", 2)
+    assert _accessed(path, "a") == clock[0]
+
+    clock[0] += 5
+    cache.get("a")
+    assert _accessed(path, "a") == clock[0] - 5
+    cache.close()
+    assert _accessed(path, "a") == clock[0]
+
+
+def test_clear_drops_buffered_access_times(clock, tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = TTLCache(10, ttl_seconds=3600, db_path=path)
+    cache.set("a", 1)
+    cache.get("a")
+    cache.clear()
+    assert cache.get("a") is None
+    cache.set("b", 2)
+    cache.close()
+    with sqlite3.connect(path) as db:
+        assert [row[0] for row in db.execute("SELECT key FROM cache")] == ["b"]
+
+
+def test_entries_kept_in_a_store_are_charged_to_it():
+    store = ArtifactStore(budget_bytes=1 << 20)
+    cache = TTLCache(10, ttl_seconds=60, store=store)
+    cache.set("a", list(range(1000)))
+    assert store.stats()["entries"] == 1 and store.stats()["nbytes"] > 8000
+    assert cache.get("a") == list(range(1000))
+    cache.clear()
+    assert cache.get("a") is None
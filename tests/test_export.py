@@ -0,0 +1,89 @@
+import gzip
+import io
+import json
+
+import numpy as np
+import pytest
+
+from navigator.export import decode_polyline, encode_polyline, export_filename, route_features, write_features
+
+# Reference example of the encoded polyline algorithm, at both precisions
+POINTS = [(38.5, -120.2), (40.7, -120.95), (43.252, -126.453)]
+ENCODED = {5: "_p~iF~ps|U_ulLnnqC_mqNvxq`@", 6: "_izlhA~rlgdF_{geC~ywl@_kwzCn`{nI"}
+
+
+def _features(n):
+    rng = np.random.default_rng(n)
+    for i in range(n):
+        latlon = np.column_stack((12.9 + rng.random(50) * 0.1, 77.5 + rng.random(50) * 0.1))
+        yield {"type": "Feature", "geometry": {"type": "LineString", "coordinates": latlon[:, ::-1].round(6).tolist()},
+               "properties": {"summary": {"distance": 1000.0 + i, "duration": 100.0 + i}}}
+
+
+def _export(fmt, n, compress=False):
+    buf = io.BytesIO()
+    count = write_features(route_features(_features(n)), buf, fmt, compress)
+    assert count == n
+    return buf.getvalue()
+
+
+@pytest.mark.parametrize("precision", [5, 6])
+def test_polyline_known_vectors(precision):
+    assert encode_polyline(POINTS, precision) == ENCODED[precision]
+    assert np.allclose(decode_polyline(ENCODED[precision], precision), POINTS, rtol=0, atol=1e-9)
+    assert encode_polyline([(0.0, 0.0)], precision) == "??"
+    assert encode_polyline(np.empty((0, 2)), precision) == ""
+    assert decode_polyline("", precision) == []
+
+
+@pytest.mark.parametrize("precision", [5, 6])
+def test_polyline_round_trip(precision):
+    rng = np.random.default_rng(precision)
+    latlon = np.column_stack((rng.uniform(-90, 90, 500), rng.uniform(-180, 180, 500)))
+    decoded = np.array(decode_polyline(encode_polyline(latlon, precision), precision))
+    assert np.abs(decoded - latlon).max() <= 0.5 / 10 ** precision + 1e-12
+
+
+def test_geojsonl_has_one_feature_per_line():
+    lines = _export("geojsonl", 25).decode().splitlines()
+    assert len(lines) == 25
+    features = [json.loads(line) for line in lines]
+    assert [f["properties"]["route_index"] for f in features] == list(range(25))
+    assert features[3]["properties"]["distance_m"] == 1003.0
+    assert _export("geojsonl", 0) == b""
+
+
+def test_polyline_lines_decode_to_the_geometry():
+    features = list(_features(3))
+    for line, feature in zip(_export("polyline6", 3).decode().splitlines(), features):
+        record = json.loads(line)
+        assert record["precision"] == 6
+        lonlat = np.array(feature["geometry"]["coordinates"])
+        assert np.allclose(decode_polyline(record["polyline"], 6), lonlat[:, ::-1], atol=1e-6)
+
+
+@pytest.mark.parametrize("fmt", ["geojson", "geojsonl", "polyline5"])
+def test_gzip_output_matches_plain_output(fmt):
+    compressed = _export(fmt, 40, compress=True)
+    assert compressed[:2] == b"\x1f\x8b"
+    assert gzip.decompress(compressed) == _export(fmt, 40)
+    assert export_filename("routes", fmt, compress=True).endswith(".gz")
+
+
+def test_geojson_is_one_collection():
+    collection = json.loads(_export("geojson", 5))
+    assert collection["type"] == "FeatureCollection" and len(collection["features"]) == 5
+    assert json.loads(_export("geojson", 0))["features"] == []
+
+
+def test_parquet_row_groups():
+    pq = pytest.importorskip("pyarrow.parquet")
+    from navigator import export
+    buf = io.BytesIO()
+    assert export.write_parquet(route_features(_features(25)), buf, row_group=10) == 25
+    meta = pq.ParquetFile(io.BytesIO(buf.getvalue())).metadata
+    assert (meta.num_rows, meta.num_row_groups) == (25, 3)
+    with pytest.raises(ValueError):
+        write_features(_features(1), io.BytesIO(), "parquet", compress=True)
+    with pytest.raises(ValueError):
+        write_features(_features(1), io.BytesIO(), "kml")
@@ -0,0 +1,74 @@
+import random
+import string
+import time
+
+import pytest
+
+from navigator import geocoding
+from navigator.config import GAZETTEER_MIN_SCORE
+from navigator.geocoding import PlaceIndex, autocomplete
+
+
+def _gazetteer(n, seed=0):
+    rng = random.Random(seed)
+    words = ["".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 9))) for _ in range(n // 5)]
+    return [{"label": f"{rng.choice(words).title()} {rng.choice(['Road', 'Street', 'Nagar'])} {i}",
+             "lat": 12.9 + rng.random(), "lon": 77.5 + rng.random()} for i in range(n)]
+
+
+@pytest.fixture(scope="module")
+def large_index():
+    return PlaceIndex(_gazetteer(100_000))
+
+
+@pytest.fixture
+def small_index(monkeypatch):
+    index = PlaceIndex([
+        {"label": "MG Road", "lat": 12.975, "lon": 77.606},
+        {"label": "Majestic Bus Station", "lat": 12.977, "lon": 77.572},
+        {"label": "Mysore Palace", "lat": 12.305, "lon": 76.655},
+    ])
+    monkeypatch.setattr(geocoding, "get_place_index", lambda: index)
+    return index
+
+
+def test_prefix_matches_skip_fuzzy_scoring(large_index, monkeypatch):
+    import rapidfuzz.process
+
+    def fail(*args, **kwargs):
+        raise AssertionError("fuzzy pass ran for a query with enough prefix matches")
+    monkeypatch.setattr(rapidfuzz.process, "extract", fail)
+    results = large_index.search("s", max_results=5)
+    assert len(results) == 5 and all(r["score"] == 100.0 for r in results)
+
+
+def test_search_is_fast_on_large_gazetteer(large_index):
+    queries = [label[:5] for label in large_index.labels[:100]]  # prefixes
+    queries += large_index.labels[:100]  # exact labels
+    queries += [label[:2] + label[3:] for label in large_index.labels[:100]]  # typos
+    started = time.perf_counter()
+    for q in queries:
+        large_index.search(q)
+    assert (time.perf_counter() - started) / len(queries) < 0.005
+
+
+def test_typo_finds_intended_place(large_index):
+    label = large_index.labels[42]
+    best = large_index.search(label[:2] + label[3:])[0]
+    assert best["label"] == label
+
+
+def test_local_match_answers_without_pelias(stub_ors, small_index):
+    results = autocomplete("mysore pal")
+    assert results[0]["label"] == "Mysore Palace"
+    assert stub_ors.requests == 0
+
+
+def test_junk_query_falls_back_to_pelias(stub_ors, small_index):
+    assert all(r["score"] < GAZETTEER_MIN_SCORE for r in small_index.search("abcd"))
+    results = autocomplete("abcd")
+    assert [r["label"] for r in results] == ["Stub Place"]
+    assert stub_ors.requests == 1
+    # the Pelias answer is cached
+    autocomplete("abcd")
+    assert stub_ors.requests == 1
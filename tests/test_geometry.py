@@ -0,0 +1,30 @@
+import numpy as np
+
+from navigator.geometry import dedupe_routes, shared_length_ratio
+
+
+def _walk(n, seed=0, offset=0.0):
+    rng = np.random.default_rng(seed)
+    lat = 48.1 + offset + np.cumsum(rng.normal(0, 0.0003, n))
+    lon = 11.5 + offset + np.cumsum(rng.normal(0, 0.0003, n))
+    return np.column_stack((lat, lon))
+
+
+def _feature(latlon):
+    return {"type": "Feature", "properties": {},
+            "geometry": {"type": "LineString", "coordinates": latlon[:, ::-1].tolist()}}
+
+
+def test_shared_length_ratio_of_route_with_itself_is_one():
+    route = _walk(10_000)
+    assert shared_length_ratio(route, route) == 1.0
+
+
+def test_dedupe_keeps_one_copy_of_long_route():
+    route = _feature(_walk(10_000))
+    assert len(dedupe_routes([route, route])) == 1
+
+
+def test_dedupe_keeps_distinct_routes():
+    routes = [_feature(_walk(2_000)), _feature(_walk(2_000, offset=0.01))]
+    assert len(dedupe_routes(routes)) == 2
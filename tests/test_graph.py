@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+
+from navigator.geometry import pairwise_distances
+from navigator.graph import SEARCH_MODES, SparseGraph, shortest_path_search
+from navigator.trace_view import path_rows
+
+
+def _random_graph(n=80, seed=0):
+    # Partly one-way k-nearest-neighbour graph; no edge is shorter than the
+    # straight line, so the A* heuristic stays admissible
+    rng = np.random.default_rng(seed)
+    coords = np.column_stack((12.9 + rng.random(n) * 0.05, 77.5 + rng.random(n) * 0.05))
+    dist = pairwise_distances(coords)
+    weights = {}
+    for u in range(n):
+        for v in np.argsort(dist[u])[1:4].tolist():
+            w = float(dist[u, v]) * (1 + rng.random())
+            weights[u, v] = w
+            if rng.random() < 0.7:
+                weights[v, u] = w
+    graph = SparseGraph.from_edges(n, [(u, v, w) for (u, v), w in weights.items()])
+    return coords.tolist(), graph, weights
+
+
+def _all_pairs(n, weights):
+    d = np.full((n, n), np.inf)
+    np.fill_diagonal(d, 0.0)
+    for (u, v), w in weights.items():
+        d[u, v] = w
+    for k in range(n):
+        d = np.minimum(d, d[:, k, None] + d[None, k, :])
+    return d
+
+
+@pytest.mark.parametrize("mode", sorted(SEARCH_MODES))
+def test_search_modes_find_shortest_distance(mode):
+    coords, graph, weights = _random_graph()
+    reference = _all_pairs(graph.n, weights)
+    for s, t in [(0, 79), (5, 40), (17, 3), (60, 61), (11, 11)]:
+        trace = shortest_path_search(graph, s, t, mode, coords, record=False)
+        assert trace.distance == pytest.approx(reference[s, t])
+        if np.isfinite(reference[s, t]):
+            path = trace.path
+            assert path[0] == s and path[-1] == t
+            assert sum(weights[u, v] for u, v in zip(path, path[1:])) == pytest.approx(reference[s, t])
+        else:
+            assert trace.path == []
+
+
+@pytest.mark.parametrize("mode", sorted(SEARCH_MODES))
+def test_node_state_matches_full_state(mode):
+    coords, graph, weights = _random_graph(n=400, seed=1)
+    reach = _all_pairs(graph.n, weights)[0]
+    target = int(np.argmax(np.where(np.isfinite(reach), reach, -1)))
+    trace = shortest_path_search(graph, 0, target, mode, coords)
+    assert len(trace) > trace.snapshot_interval
+    nodes = list(range(graph.n))
+    for k in range(len(trace)):
+        state = trace[k]
+        for side, suffix in zip(range(trace.sides), ("", "_rev")):
+            expected = list(zip(state["distances" + suffix], state["predecessors" + suffix],
+                                state["visited" + suffix]))
+            assert trace.node_state(k, nodes, side) == expected
+
+
+def test_path_rows_follow_the_path():
+    coords, graph, weights = _random_graph()
+    reach = _all_pairs(graph.n, weights)[0]
+    target = int(np.argmax(np.where(np.isfinite(reach), reach, -1)))
+    trace = shortest_path_search(graph, 0, target, "dijkstra", coords)
+    rows = path_rows(coords, trace)
+    assert len(rows) == len(trace.path) > 2
+    assert [r["order"] for r in rows] == list(range(len(trace.path)))
+    assert rows[0]["along_m"] == 0.0
+    assert [r["along_m"] for r in rows] == sorted(r["along_m"] for r in rows)
+    assert (rows[-1]["lat"], rows[-1]["lon"]) == (round(coords[trace.path[-1]][0], 6),
+                                                  round(coords[trace.path[-1]][1], 6))
@@ -0,0 +1,96 @@
+import json
+
+import numpy as np
+import pytest
+
+from navigator.geometry import distances_to
+from navigator.graph import shortest_path_search
+from navigator.local_engine import GridIndex, RoadNetwork
+
+SIZE = 12
+
+
+def _grid_network(seed=0):
+    """SIZE x SIZE street grid ~500 m apart with random speeds and some
+    one-way streets; the middle avenue is a 120 km/h expressway, so the
+    fastest route is often not the shortest one."""
+    rng = np.random.default_rng(seed)
+    lat, lon = np.meshgrid(12.9 + np.arange(SIZE) * 0.0045, 77.5 + np.arange(SIZE) * 0.0046, indexing="ij")
+    coords = np.column_stack((lat.ravel(), lon.ravel())) + rng.normal(0, 0.0003, (SIZE * SIZE, 2))
+    src, dst, speed = [], [], []
+    for i in range(SIZE):
+        for j in range(SIZE):
+            u = i * SIZE + j
+            if j + 1 < SIZE:
+                src.append(u), dst.append(u + 1), speed.append(120.0 if i == SIZE // 2 else rng.uniform(20, 60))
+            if i + 1 < SIZE:
+                src.append(u), dst.append(u + SIZE), speed.append(rng.uniform(20, 60))
+    n = len(src)
+    oneway = rng.random(n) < 0.2
+    return RoadNetwork(coords, np.array(src), np.array(dst), np.array(speed), oneway,
+                       np.zeros(n, dtype=np.int64), ["Main Street"])
+
+
+def test_grid_index_matches_a_full_scan():
+    rng = np.random.default_rng(1)
+    points = np.column_stack((12.9 + rng.random(2000) * 0.2, 77.5 + rng.random(2000) * 0.2))
+    index = GridIndex(points, cell_deg=0.005)
+    queries = np.vstack((points[:50] + rng.normal(0, 0.001, (50, 2)),
+                         np.column_stack((12.9 + rng.random(50) * 0.2, 77.5 + rng.random(50) * 0.2)),
+                         [[13.5, 78.2], [12.0, 77.0]]))  # far outside the grid
+    for q in queries:
+        d = distances_to(tuple(q), points)
+        assert d[index.nearest(tuple(q))] == pytest.approx(d.min())
+    assert GridIndex(np.empty((0, 2))).nearest((12.9, 77.5)) == -1
+
+
+@pytest.mark.parametrize("profile", ["driving-car", "cycling-regular", "foot-walking"])
+def test_route_matches_dijkstra(profile):
+    network = _grid_network()
+    graph = network.graph(profile)
+    rng = np.random.default_rng(2)
+    for _ in range(25):
+        s, t = (int(v) for v in rng.integers(0, network.num_nodes, 2))
+        reference = shortest_path_search(graph, s, t, "dijkstra", network.coords, record=False)
+        features = network.route(tuple(network.coords[s]), tuple(network.coords[t]), profile)["features"]
+        if not reference.path:
+            assert features == []
+            continue
+        summary = features[0]["properties"]["summary"]
+        assert summary["duration"] == pytest.approx(reference.distance)
+        line = features[0]["geometry"]["coordinates"]
+        assert (line[0][1], line[0][0]) == tuple(network.coords[s])
+        assert (line[-1][1], line[-1][0]) == tuple(network.coords[t])
+
+
+def test_astar_expands_fewer_nodes_than_dijkstra():
+    network = _grid_network()
+    graph = network.graph("foot-walking")
+    s, t = 0, network.num_nodes - 1
+    reference = shortest_path_search(graph, s, t, "dijkstra", network.coords, record=False)
+    properties = network.route(tuple(network.coords[s]), tuple(network.coords[t]), "foot-walking")["features"][0]["properties"]
+    assert properties["summary"]["duration"] == pytest.approx(reference.distance)
+    assert properties["expanded_nodes"] < reference.expanded
+
+
+def test_loaded_network_snaps_and_names_steps(tmp_path):
+    path = tmp_path / "roads.geojson"
+    roads = [("Ring Road", [[77.50, 12.90], [77.51, 12.90], [77.52, 12.90]], False),
+             ("Lake Road", [[77.52, 12.90], [77.52, 12.91]], True)]
+    path.write_text(json.dumps({"type": "FeatureCollection", "features": [
+        {"type": "Feature", "geometry": {"type": "LineString", "coordinates": line},
+         "properties": {"name": name, "oneway": oneway, "speed_kph": 40}}
+        for name, line, oneway in roads]}))
+    network = RoadNetwork.load(str(path))
+    assert network.num_nodes == 4 and network.path == str(path)
+
+    # start and end are snapped to the nearest road nodes
+    route = network.route((12.9003, 77.5002), (12.9098, 77.5201))["features"][0]
+    assert route["geometry"]["coordinates"][0] == [77.50, 12.90]
+    assert route["geometry"]["coordinates"][-1] == [77.52, 12.91]
+    steps = route["properties"]["segments"][0]["steps"]
+    assert [s["name"] for s in steps] == ["Ring Road", "Lake Road", ""]
+    assert steps[1]["instruction"] == "Turn left onto Lake Road"
+    # Lake Road is one-way north: no way back by car, but on foot
+    assert network.route((12.91, 77.52), (12.90, 77.50))["features"] == []
+    assert network.route((12.91, 77.52), (12.90, 77.50), "foot-walking")["features"]
@@ -0,0 +1,23 @@
+from benchmarks.run import synthetic_polyline
+from navigator.geometry import build_route_lods, map_lods
+from navigator.graph import build_graph_from_coords, shortest_path_search
+from navigator.maps import render_path_map, render_route_map, render_trace_map
+
+
+def test_route_map_embeds_only_the_used_levels():
+    coords = synthetic_polyline(2000)
+    levels = build_route_lods(coords)
+    used, _ = map_lods(levels, coords[0][0])
+    page = render_route_map(coords[0], coords[-1], [levels])
+    assert page.count("L.polyline(") == len(used) < len(levels)
+    assert "zoomToLayer" in page
+
+
+def test_trace_and_path_maps():
+    coords = synthetic_polyline(300)
+    nodes, graph = build_graph_from_coords(coords)
+    trace = shortest_path_search(graph, 0, len(nodes) - 1, "dijkstra", nodes)
+    page = render_trace_map(nodes, graph, trace)
+    assert "traceSeek" in page and "traceStep" in page
+    path_page = render_path_map(build_route_lods(coords), [nodes[u] for u in trace.path])
+    assert path_page.count("L.polyline(") == len(map_lods(build_route_lods(coords), coords[0][0])[0]) + 1
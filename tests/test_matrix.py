@@ -0,0 +1,117 @@
+import itertools
+import json
+
+import numpy as np
+import pytest
+
+from navigator import matrix
+from navigator.local_engine import RoadNetwork
+from navigator.matrix import _tour_cost, distance_matrix, get_matrix_pool, optimize_trip
+
+# Nearest neighbour from stop 0 crosses its own path here; 2-opt untangles it
+POINTS = [(6, 8), (0, 8), (4, 5), (6, 2), (9, 0), (2, 3)]
+
+
+def _euclidean(points):
+    points = np.asarray(points, dtype=float)
+    return np.linalg.norm(points[:, None] - points[None], axis=2)
+
+
+def _best_cost(cost, start=0, round_trip=False):
+    others = [i for i in range(len(cost)) if i != start]
+    return min(_tour_cost(cost, [start, *p] + ([start] if round_trip else [])) for p in itertools.permutations(others))
+
+
+@pytest.mark.parametrize("round_trip", [False, True])
+def test_two_opt_improves_nearest_neighbour(round_trip):
+    cost = _euclidean(POINTS)
+    tour = optimize_trip(cost, round_trip=round_trip)
+    assert tour[0] == 0 and sorted(set(tour)) == list(range(len(POINTS)))
+    assert len(tour) == len(POINTS) + round_trip
+    if round_trip:
+        assert tour[-1] == 0
+    assert _tour_cost(cost, tour) == pytest.approx(_best_cost(cost, round_trip=round_trip))
+
+
+def test_asymmetric_and_unreachable_costs():
+    rng = np.random.default_rng(3)
+    cost = rng.uniform(1, 100, (7, 7))
+    np.fill_diagonal(cost, 0)
+    cost[2, 5] = cost[4, 1] = np.inf
+    tour = optimize_trip(cost, start=3)
+    assert tour[0] == 3 and sorted(tour) == list(range(7))
+    # no single reversal makes the tour shorter
+    for i in range(1, len(tour) - 1):
+        for j in range(i + 1, len(tour)):
+            candidate = tour[:i] + tour[i:j + 1][::-1] + tour[j + 1:]
+            assert _tour_cost(cost, candidate) >= _tour_cost(cost, tour) - 1e-9
+    assert optimize_trip(np.zeros((0, 0))) == []
+
+
+class FakeMatrixClient:
+    """Answers ORS matrix requests with |i - j| seconds between the
+    locations' indices (encoded in their longitude), null for pair (0, 1)."""
+
+    def __init__(self):
+        self.requests = []
+
+    def distance_matrix(self, locations, sources, destinations, profile, metrics):
+        self.requests.append((len(sources), len(destinations)))
+        ids = [round(lon * 1000) for lon, _ in locations]
+        durations = [[None if (ids[s], ids[d]) == (0, 1) else abs(ids[s] - ids[d]) for d in destinations]
+                     for s in sources]
+        return {"durations": durations, "distances": [[v and v * 10 for v in row] for row in durations]}
+
+
+def test_ors_matrix_is_split_into_blocks(monkeypatch):
+    client = FakeMatrixClient()
+    monkeypatch.setattr(matrix, "get_client", lambda: client)
+    monkeypatch.setattr(matrix, "MATRIX_MAX_ELEMENTS", 12)
+    points = [(12.9, i / 1000) for i in range(9)]
+    result = distance_matrix(points[:7], points[2:])
+    assert all(rows * cols <= 12 for rows, cols in client.requests)
+    assert sum(rows * cols for rows, cols in client.requests) == 7 * 7
+    ids = np.arange(9)
+    expected = np.abs(ids[:7, None] - ids[None, 2:]).astype(float)
+    np.testing.assert_array_equal(result["durations"], expected)
+    np.testing.assert_array_equal(result["distances"], expected * 10)
+
+    # more destinations than fit one request: a row at a time, in column blocks
+    client.requests.clear()
+    monkeypatch.setattr(matrix, "MATRIX_MAX_ELEMENTS", 4)
+    result = distance_matrix(points[:2], points)
+    assert sorted(client.requests) == [(1, 1)] * 2 + [(1, 4)] * 4
+    assert result["durations"][0, 1] == np.inf and result["durations"][1, 0] == 1
+
+
+def test_local_matrix_reuses_its_worker_pool(tmp_path, monkeypatch):
+    # a 3 x 3 grid of two-way streets 0.01° apart, all at the same speed
+    lines = [[[77.5 + j * 0.01, 12.9 + i * 0.01] for j in range(3)] for i in range(3)]
+    lines += [[[77.5 + j * 0.01, 12.9 + i * 0.01] for i in range(3)] for j in range(3)]
+    path = tmp_path / "grid.geojson"
+    path.write_text(json.dumps({"type": "FeatureCollection", "features": [
+        {"type": "Feature", "geometry": {"type": "LineString", "coordinates": line},
+         "properties": {"speed_kph": 36}} for line in lines]}))
+    network = RoadNetwork.load(str(path))
+    monkeypatch.setattr(matrix, "get_road_network", lambda: network)
+    monkeypatch.setattr(matrix, "MATRIX_LOCAL_WORKERS", 2)
+    points = [(lat, lon) for lon, lat in network.coords[:, ::-1]]
+
+    monkeypatch.setattr(matrix, "MATRIX_PROCESS_MIN_SOURCES", len(points) + 1)
+    in_process = distance_matrix(points, backend="local")
+    monkeypatch.setattr(matrix, "MATRIX_PROCESS_MIN_SOURCES", 2)
+    get_matrix_pool.cache_clear()
+    try:
+        first = distance_matrix(points, backend="local")
+        assert get_matrix_pool.cache_info().misses == 1
+        second = distance_matrix(points[:4], points, backend="local")
+        info = get_matrix_pool.cache_info()
+        assert (info.misses, info.hits, info.currsize) == (1, 1, 1)
+    finally:
+        for_shutdown = get_matrix_pool(str(path), "driving-car")
+        get_matrix_pool.cache_clear()
+        for_shutdown.shutdown()
+    np.testing.assert_allclose(first["durations"], in_process["durations"])
+    np.testing.assert_allclose(second["distances"], in_process["distances"][:4])
+    # 10 m/s along the streets
+    assert np.allclose(in_process["durations"] * 10, in_process["distances"])
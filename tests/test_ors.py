@@ -0,0 +1,121 @@
+import threading
+import time
+
+import openrouteservice
+import pytest
+import requests
+
+from navigator import ors
+from navigator.ors import ORSClient, RateLimiter, RateLimitExceeded, TokenBucket, is_retriable
+
+ApiError = openrouteservice.exceptions.ApiError
+HTTPError = openrouteservice.exceptions.HTTPError
+
+
+@pytest.mark.parametrize("exc, retriable", [
+    (ApiError(503), True),
+    (ApiError(429), True),
+    (ApiError(400), False),
+    (HTTPError(502), True),
+    (HTTPError(504), True),
+    (HTTPError(404), False),
+    (openrouteservice.exceptions.Timeout(), True),
+    (requests.exceptions.ConnectionError(), True),
+    (ValueError("bad input"), False),
+])
+def test_retry_classification(exc, retriable):
+    assert is_retriable(exc) is retriable
+
+
+def test_token_bucket_refills_at_rate():
+    bucket = TokenBucket(capacity=2, rate=1.0)
+    bucket.updated = 0.0
+    assert bucket.wait_time(0.0) == 0.0
+    bucket.take()
+    bucket.take()
+    assert bucket.wait_time(0.0) == pytest.approx(1.0)
+    assert bucket.wait_time(0.5) == pytest.approx(0.5)
+    # refill never exceeds the capacity
+    assert bucket.wait_time(100.0) == 0.0 and bucket.tokens == 2
+
+
+def test_rate_limiter_rejects_without_consuming_quota():
+    limiter = RateLimiter(per_minute=2, per_day=100)
+    assert limiter.acquire(max_wait=0) == 0.0
+    assert limiter.acquire(max_wait=0) == 0.0
+    with pytest.raises(RateLimitExceeded):
+        limiter.acquire(max_wait=0)
+    stats = limiter.stats()
+    assert stats["acquired"] == 2 and stats["rejected"] == 1
+
+
+class FakeRaw:
+    """Stands in for openrouteservice.Client: fails with ``errors`` in turn,
+    then answers, optionally waiting for ``release`` first."""
+
+    def __init__(self, errors=(), release=None):
+        self.errors = list(errors)
+        self.release = release
+        self.calls = 0
+
+    def directions(self, **params):
+        self.calls += 1
+        if self.release is not None:
+            self.release.wait(5)
+        if self.errors:
+            raise self.errors.pop(0)
+        return {"features": [], "params": params}
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(ors, "ORS_RETRY_BASE_DELAY", 0.0)
+
+
+def test_retriable_errors_are_retried_through_the_limiter():
+    raw = FakeRaw([HTTPError(502), ApiError(503)])
+    client = ORSClient(raw, limits={"directions": (100, 1000)})
+    assert client.directions(coordinates=[[0, 0], [1, 1]])["features"] == []
+    stats = client.stats()
+    assert raw.calls == 3 and stats["retries"] == 2 and stats["errors"] == 0
+    assert stats["limits"]["directions"]["acquired"] == 3
+
+
+def test_non_retriable_error_is_raised_at_once():
+    raw = FakeRaw([ApiError(400)])
+    client = ORSClient(raw, limits={})
+    with pytest.raises(ApiError):
+        client.directions(coordinates=[])
+    assert raw.calls == 1 and client.stats()["errors"] == 1
+
+
+def test_retries_stop_after_max_retries():
+    raw = FakeRaw([ApiError(503)] * (ors.ORS_MAX_RETRIES + 5))
+    client = ORSClient(raw, limits={})
+    with pytest.raises(ApiError):
+        client.directions(coordinates=[])
+    assert raw.calls == ors.ORS_MAX_RETRIES + 1
+
+
+def test_identical_inflight_requests_are_coalesced():
+    release = threading.Event()
+    raw = FakeRaw(release=release)
+    client = ORSClient(raw, limits={})
+    results = []
+
+    def call():
+        results.append(client.directions(coordinates=[[0, 0], [1, 1]]))
+    threads = [threading.Thread(target=call) for _ in range(2)]
+    for t in threads:
+        t.start()
+    deadline = time.monotonic() + 5
+    while client.stats()["coalesced"] < 1 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    release.set()
+    for t in threads:
+        t.join(5)
+    assert raw.calls == 1 and client.stats()["coalesced"] == 1
+    assert len(results) == 2 and results[0] is results[1]
+    # a different request is sent on its own
+    client.directions(coordinates=[[0, 0], [2, 2]])
+    assert raw.calls == 2
@@ -0,0 +1,94 @@
+import time
+
+import pytest
+
+from benchmarks.stub_ors import directions_geojson
+from navigator import routing
+from navigator.routing import ALTERNATIVE_START_OFFSET, RoutingError, fetch_routes, get_route
+
+START, END = (12.97, 77.59), (12.99, 77.62)
+LABELS = ["main route", "start shifted north", "start shifted east"]
+# Each request's route bends through a different midpoint so that none of
+# them is dropped as a duplicate
+DETOURS = {"main route": (0.0, 0.0), "start shifted north": (0.01, 0.0), "start shifted east": (0.0, 0.01)}
+
+
+def _label(request):
+    lon, lat = request["coordinates"][0]
+    if lat - START[0] > ALTERNATIVE_START_OFFSET / 2:
+        return "start shifted north"
+    if lon - START[1] > ALTERNATIVE_START_OFFSET / 2:
+        return "start shifted east"
+    return "main route"
+
+
+def serve(delays=None, failures=()):
+    """Stub directions handler answering each of fetch_routes' requests on its own."""
+    def answer(request):
+        label = _label(request)
+        time.sleep((delays or {}).get(label, 0.0))
+        if label in failures:
+            return 404, {"error": {"code": 2010, "message": f"no route for {label}"}}
+        (lon1, lat1), (lon2, lat2) = request["coordinates"]
+        dlat, dlon = DETOURS[label]
+        return directions_geojson([(lat1, lon1), ((lat1 + lat2) / 2 + dlat, (lon1 + lon2) / 2 + dlon), (lat2, lon2)])
+    return answer
+
+
+def test_results_come_in_request_order(stub_ors):
+    # the main route answers last but is still yielded first
+    stub_ors.directions = serve(delays={"main route": 0.3})
+    results = list(fetch_routes(START, END))
+    assert [r["label"] for r in results] == LABELS
+    assert all(r["error"] is None and r["features"] and not r["cached"] for r in results)
+
+    routes = get_route(START, END)
+    assert len(routes) == 3
+    assert routes[0]["geometry"]["coordinates"][0] == [START[1], START[0]]
+
+
+def test_each_request_has_its_own_timeout(stub_ors, monkeypatch):
+    monkeypatch.setattr(routing, "ROUTE_REQUEST_TIMEOUT", 0.5)
+    stub_ors.directions = serve(delays={"start shifted north": 2.0})
+    started = time.monotonic()
+    results = {r["label"]: r for r in fetch_routes(START, END)}
+    assert time.monotonic() - started < 1.5
+    assert results["start shifted north"]["error"] == "timed out after 0.5s"
+    assert results["main route"]["error"] is None
+    assert results["start shifted east"]["error"] is None
+
+
+def test_failed_alternative_is_reported_and_skipped(stub_ors):
+    stub_ors.directions = serve(failures={"start shifted east"})
+    reported = []
+    routes = get_route(START, END, on_result=reported.append)
+    assert len(routes) == 2
+    errors = {r["label"]: r["error"] for r in reported}
+    assert errors["main route"] is None and errors["start shifted north"] is None
+    assert "404" in errors["start shifted east"]
+
+
+def test_failed_main_route_raises(stub_ors):
+    stub_ors.directions = serve(failures={"main route"})
+    with pytest.raises(RoutingError):
+        get_route(START, END)
+
+
+def test_repeated_query_is_answered_from_cache(stub_ors):
+    stub_ors.directions = serve()
+    first = get_route(START, END)
+    sent = stub_ors.requests
+    assert get_route(START, END) == first
+    assert stub_ors.requests == sent
+
+
+def test_route_cache_is_charged_to_the_store(stub_ors):
+    from navigator.routing import get_route_cache
+    from navigator.store import get_artifact_store
+
+    store = get_artifact_store()
+    stub_ors.directions = serve()
+    before = store.stats()["nbytes"]
+    get_route(START, END, alternatives=False)
+    assert store.stats()["nbytes"] > before
+    assert get_route_cache().stats()["size"] is None